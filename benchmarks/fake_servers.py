@@ -0,0 +1,318 @@
+"""
+Local fakes of the Twitter API v2 and the Telegram Bot API for load tests.
+
+FakeTwitterServer generates tweets for a set of accounts at a configurable
+rate and serves them through the user lookup, user timeline and recent search
+endpoints, with pagination, simulated latency and per-endpoint rate-limit
+windows that answer 429. FakeTelegramServer accepts sendMessage calls and
+records when each generated tweet arrives, so the harness can compute
+delivery latency.
+"""
+import re
+import json
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tweet text embeds the ID so deliveries (even coalesced ones) can be traced back.
+TWEET_TEXT = "benchmark tweet {id}"
+TWEET_ID_PATTERN = re.compile(r"benchmark tweet (\d+)")
+FIRST_TWEET_ID = 10 ** 18
+
+
+class _Server:
+    """
+    Common start/stop and request plumbing for both fakes.
+    """
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, seed=0):
+        """
+        :param latency: Seconds added to every response.
+        :param latency_jitter: Extra uniformly random seconds added on top of `latency`.
+        :param seed: Seed for the jitter (and tweet generation), so runs are comparable.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count_call(self, endpoint, status):
+        with self.lock:
+            key = (endpoint, status)
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def total_calls(self, status=None):
+        with self.lock:
+            return sum(count for (_, code), count in self.calls.items() if status is None or code == status)
+
+    def delay(self):
+        with self.lock:
+            jitter = self.random.uniform(0, self.latency_jitter) if self.latency_jitter else 0
+        if self.latency or jitter:
+            time.sleep(self.latency + jitter)
+
+    def route(self, method, path, query, body):
+        """
+        Returns (endpoint, status, payload, headers) for one request.
+        """
+        raise NotImplementedError
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    body = json.loads(raw or b"{}")
+                else:
+                    body = {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                fake.delay()
+                endpoint, status, payload, headers = fake.route(method, parsed.path, query, body)
+                fake.count_call(endpoint, status)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        return Handler
+
+
+class FakeTwitterServer(_Server):
+    def __init__(self, num_accounts=100, tweets_per_second=10.0, rate_limit=None, rate_limit_window=15.0,
+                 initial_tweets=1, **kwargs):
+        """
+        :param num_accounts: Accounts served, named user0000, user0001, ...
+        :param tweets_per_second: Tweets generated per second across all accounts.
+        :param rate_limit: Requests allowed per endpoint per window; None disables 429s.
+        :param rate_limit_window: Length of a rate-limit window in seconds.
+        :param initial_tweets: Tweets each account already has when the server starts.
+        Other keyword arguments (latency, latency_jitter, seed) go to the base server.
+        """
+        super().__init__(**kwargs)
+        self.usernames = [f"user{i:04d}" for i in range(num_accounts)]
+        self.user_ids = {username: str(1000 + i) for i, username in enumerate(self.usernames)}
+        self.by_id = {user_id: username for username, user_id in self.user_ids.items()}
+        self.tweets_per_second = tweets_per_second
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.windows = {}
+        # Per account, oldest first.
+        self.timelines = {username: [] for username in self.usernames}
+        # Tweet ID -> creation time (epoch seconds) for every generated tweet.
+        self.created = {}
+        self.next_id = FIRST_TWEET_ID
+        self.generating = threading.Event()
+        self.generator = threading.Thread(target=self._generate, daemon=True)
+        for username in self.usernames:
+            for _ in range(initial_tweets):
+                self.add_tweet(username)
+
+    def add_tweet(self, username, created_at=None):
+        created_at = time.time() if created_at is None else created_at
+        with self.lock:
+            self.next_id += 1
+            tweet = {
+                "id": str(self.next_id),
+                "text": TWEET_TEXT.format(id=self.next_id),
+                "author_id": self.user_ids[username],
+                "created_at": datetime.fromtimestamp(created_at, timezone.utc).isoformat(
+                    timespec="milliseconds").replace("+00:00", "Z"),
+            }
+            self.timelines[username].append(tweet)
+            self.created[tweet["id"]] = created_at
+        return tweet
+
+    def start_generating(self):
+        """
+        Starts (or resumes) generating tweets at tweets_per_second.
+        """
+        self.generating.set()
+        if not self.generator.is_alive():
+            self.generator.start()
+
+    def stop_generating(self):
+        self.generating.clear()
+
+    def _generate(self):
+        # Poisson arrivals at tweets_per_second, each from a random account.
+        while True:
+            self.generating.wait()
+            with self.lock:
+                gap = self.random.expovariate(self.tweets_per_second) if self.tweets_per_second else 1
+                username = self.random.choice(self.usernames)
+            time.sleep(gap)
+            if self.generating.is_set() and self.tweets_per_second:
+                self.add_tweet(username)
+
+    def _rate_limit_headers(self, endpoint):
+        """
+        Counts a request against `endpoint`'s window; returns (allowed, headers).
+        """
+        if self.rate_limit is None:
+            return True, {}
+        now = time.time()
+        with self.lock:
+            start, used = self.windows.get(endpoint, (now, 0))
+            if now >= start + self.rate_limit_window:
+                start, used = now, 0
+            allowed = used < self.rate_limit
+            if allowed:
+                used += 1
+            self.windows[endpoint] = (start, used)
+        return allowed, {
+            "x-rate-limit-limit": str(self.rate_limit),
+            "x-rate-limit-remaining": str(self.rate_limit - used),
+            "x-rate-limit-reset": str(int(start + self.rate_limit_window) + 1),
+        }
+
+    def _page(self, tweets, max_results, token):
+        """
+        Paginates newest-first `tweets`; the token is the offset of the next page.
+        """
+        offset = int(token or 0)
+        page = tweets[offset:offset + max_results]
+        meta = {"result_count": len(page)}
+        if page:
+            meta["newest_id"], meta["oldest_id"] = page[0]["id"], page[-1]["id"]
+        if offset + max_results < len(tweets):
+            meta["next_token"] = str(offset + max_results)
+        return page, meta
+
+    def _newer(self, username, since_id):
+        with self.lock:
+            timeline = list(self.timelines.get(username, []))
+        if since_id:
+            timeline = [tweet for tweet in timeline if int(tweet["id"]) > int(since_id)]
+        return timeline[::-1]
+
+    def route(self, method, path, query, body):
+        parts = path.strip("/").split("/")
+        if parts[:1] != ["2"]:
+            return "unknown", 404, {"title": "Not Found"}, {}
+        parts = parts[1:]
+        if parts == ["users", "by"]:
+            endpoint = "users/by"
+        elif parts[:3] == ["users", "by", "username"]:
+            endpoint = "users/by/username"
+        elif len(parts) == 3 and parts[0] == "users" and parts[2] == "tweets":
+            endpoint = "users/tweets"
+        elif parts == ["tweets", "search", "recent"]:
+            endpoint = "tweets/search/recent"
+        else:
+            return "unknown", 404, {"title": "Not Found"}, {}
+
+        allowed, headers = self._rate_limit_headers(endpoint)
+        if not allowed:
+            return endpoint, 429, {"title": "Too Many Requests"}, headers
+
+        if endpoint == "users/by":
+            names = [name for name in query.get("usernames", "").split(",") if name]
+            data = [{"id": self.user_ids[name], "username": name} for name in names if name in self.user_ids]
+            return endpoint, 200, {"data": data}, headers
+        if endpoint == "users/by/username":
+            username = parts[3]
+            if username not in self.user_ids:
+                return endpoint, 200, {"errors": [{"title": "Not Found Error"}]}, headers
+            return endpoint, 200, {"data": {"id": self.user_ids[username], "username": username}}, headers
+        if endpoint == "users/tweets":
+            username = self.by_id.get(parts[1])
+            if username is None:
+                return endpoint, 404, {"title": "Not Found"}, headers
+            tweets = self._newer(username, query.get("since_id"))
+            page, meta = self._page(tweets, int(query.get("max_results", 10)), query.get("pagination_token"))
+            payload = {"meta": meta}
+            if page:
+                payload["data"] = page
+            return endpoint, 200, payload, headers
+
+        usernames = [term[len("from:"):] for term in query.get("query", "").split(" OR ")]
+        tweets = []
+        for username in usernames:
+            if username in self.timelines:
+                tweets.extend(self._newer(username, query.get("since_id")))
+        tweets.sort(key=lambda tweet: int(tweet["id"]), reverse=True)
+        page, meta = self._page(tweets, int(query.get("max_results", 10)), query.get("next_token"))
+        payload = {"meta": meta}
+        if page:
+            payload["data"] = page
+            authors = {tweet["author_id"] for tweet in page}
+            payload["includes"] = {"users": [{"id": user_id, "username": self.by_id[user_id]}
+                                             for user_id in sorted(authors)]}
+        return endpoint, 200, payload, headers
+
+
+class FakeTelegramServer(_Server):
+    def __init__(self, flood_limit=None, retry_after=1, **kwargs):
+        """
+        :param flood_limit: Messages accepted per second before answering 429; None disables.
+        :param retry_after: retry_after returned with a 429.
+        Other keyword arguments (latency, latency_jitter, seed) go to the base server.
+        """
+        super().__init__(**kwargs)
+        self.flood_limit = flood_limit
+        self.retry_after = retry_after
+        self.second = (0, 0)
+        self.messages = 0
+        # Tweet ID -> time its message was accepted (first delivery only).
+        self.delivered = {}
+        self.duplicates = 0
+
+    def route(self, method, path, query, body):
+        if method != "POST" or not path.endswith("/sendMessage"):
+            return "unknown", 404, {"ok": False, "description": "Not Found"}, {}
+        endpoint = "sendMessage"
+        now = time.time()
+        with self.lock:
+            if self.flood_limit is not None:
+                second, count = self.second
+                if int(now) != second:
+                    second, count = int(now), 0
+                if count >= self.flood_limit:
+                    return endpoint, 429, {"ok": False, "error_code": 429,
+                                           "parameters": {"retry_after": self.retry_after}}, {}
+                self.second = (second, count + 1)
+            self.messages += 1
+            for tweet_id in TWEET_ID_PATTERN.findall(body.get("text", "")):
+                if tweet_id in self.delivered:
+                    self.duplicates += 1
+                else:
+                    self.delivered[tweet_id] = now
+        return endpoint, 200, {"ok": True, "result": {"message_id": self.messages}}, {}
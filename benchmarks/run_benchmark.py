@@ -0,0 +1,269 @@
+"""
+Offline load test: drives Streamer (or the single-account loop in
+src/main.py) against the local fake Twitter and Telegram servers and reports
+throughput, delivery latency, threads, memory and API calls per delivered
+tweet.
+
+    python -m benchmarks.run_benchmark --accounts 100 --duration 30
+    python -m benchmarks.run_benchmark --accounts 5000 --tweets-per-second 50 --latency 0.05 --rate-limit 900
+    python -m benchmarks.run_benchmark --target main --tweets-per-second 0.5
+
+Runs are seeded and every result is appended as one JSON line (with its
+full configuration) to --output, so runs can be compared over time.
+"""
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import platform
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.fake_servers import FakeTwitterServer, FakeTelegramServer
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of `values` (0 < fraction <= 1), or None if empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def rss_mb():
+    """
+    Returns (current, peak) resident set size in MB, or None where unavailable.
+    """
+    current = peak = None
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        try:
+            import resource
+            # ru_maxrss is KB on Linux and bytes on macOS.
+            scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+        except ImportError:
+            pass
+    return current, peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class ResourceSampler:
+    """
+    Samples thread count and RSS in the background while the benchmark runs.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss_mb = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def sample(self):
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+        current, _ = rss_mb()
+        if current is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0, current)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.sample()
+
+
+def start_target(target, usernames, poll_interval, streamer_options):
+    """
+    Starts the system under test in a background thread; returns a stop callable.
+    """
+    if target == "main":
+        from src import main
+        from src.adaptive_polling import AdaptivePollPolicy
+        from config.settings import Settings
+        settings = Settings.from_env()
+        settings.target_user = usernames[0]
+        main.poll_policy = AdaptivePollPolicy(min_interval=poll_interval, max_interval=max(poll_interval, 60))
+        stop_event = threading.Event()
+        thread = threading.Thread(target=main.run, args=(stop_event, settings), daemon=True)
+        thread.start()
+
+        def stop():
+            stop_event.set()
+            thread.join(timeout=30)
+        return stop
+
+    if target == "streamer":
+        from src.streamer import Streamer
+        instance = Streamer(usernames, poll_interval=poll_interval, **streamer_options)
+    elif target == "async":
+        from src.async_streamer import AsyncStreamer
+        instance = AsyncStreamer(usernames, poll_interval=poll_interval, **streamer_options)
+    else:
+        raise ValueError(f"Unknown benchmark target: {target}")
+    thread = threading.Thread(target=instance.start_stream, daemon=True)
+    thread.start()
+
+    def stop():
+        if hasattr(instance, "stop"):
+            instance.stop()
+        thread.join(timeout=30)
+    return stop
+
+
+def run_benchmark(target="streamer", accounts=100, duration=30.0, drain=10.0, tweets_per_second=10.0,
+                  latency=0.0, latency_jitter=0.0, rate_limit=None, rate_limit_window=15.0,
+                  telegram_latency=0.0, telegram_flood_limit=None, poll_interval=1, seed=0,
+                  streamer_options=None):
+    """
+    Runs one benchmark and returns its results as a dict.
+
+    Tweets are generated for `duration` seconds; the target then gets up to
+    `drain` more seconds to deliver what is outstanding. Latency is measured
+    from a tweet's creation on the fake server to Telegram accepting it.
+    """
+    if target == "main":
+        # main.py follows a single TARGET_USER.
+        accounts = 1
+    config = {key: value for key, value in locals().items()}
+    twitter = FakeTwitterServer(num_accounts=accounts, tweets_per_second=tweets_per_second, rate_limit=rate_limit,
+                                rate_limit_window=rate_limit_window, latency=latency,
+                                latency_jitter=latency_jitter, seed=seed).start()
+    telegram = FakeTelegramServer(flood_limit=telegram_flood_limit, latency=telegram_latency, seed=seed).start()
+    os.environ.update({
+        "TWITTER_BEARER_TOKEN": "benchmark",
+        "TELEGRAM_BOT_TOKEN": "benchmark",
+        "TELEGRAM_CHAT_ID": "1",
+        "TARGET_USER": twitter.usernames[0],
+        "TWITTER_API_URL": f"{twitter.base_url}/2",
+        "TELEGRAM_API_URL": telegram.base_url,
+    })
+    sampler = ResourceSampler().start()
+    baseline_threads = threading.active_count()
+    try:
+        started = time.time()
+        stop = start_target(target, list(twitter.usernames), poll_interval, streamer_options or {})
+        twitter.start_generating()
+        time.sleep(duration)
+        twitter.stop_generating()
+        with twitter.lock:
+            generated = {tweet_id for tweet_id, created in twitter.created.items() if created >= started}
+        deadline = time.time() + drain
+        while time.time() < deadline and not generated <= set(telegram.delivered):
+            time.sleep(0.1)
+        stop()
+        elapsed = time.time() - started
+    finally:
+        sampler.stop()
+        twitter.stop()
+        telegram.stop()
+
+    latencies = [telegram.delivered[tweet_id] - twitter.created[tweet_id]
+                 for tweet_id in generated if tweet_id in telegram.delivered]
+    twitter_calls = twitter.total_calls()
+    _, peak_rss = rss_mb()
+    return {
+        "target": target,
+        "config": config,
+        "generated": len(generated),
+        "delivered": len(latencies),
+        "missed": len(generated) - len(latencies),
+        "duplicates": telegram.duplicates,
+        "throughput_per_second": round(len(latencies) / elapsed, 3),
+        "latency_p50_seconds": percentile(latencies, 0.50),
+        "latency_p99_seconds": percentile(latencies, 0.99),
+        "latency_max_seconds": max(latencies) if latencies else None,
+        "twitter_calls": twitter_calls,
+        "twitter_calls_by_endpoint": {f"{endpoint} {status}": count
+                                      for (endpoint, status), count in sorted(twitter.calls.items())},
+        "twitter_429s": twitter.total_calls(status=429),
+        "telegram_messages": telegram.messages,
+        "telegram_429s": telegram.total_calls(status=429),
+        "api_calls_per_delivered_tweet": round(twitter_calls / len(latencies), 3) if latencies else None,
+        "peak_threads": sampler.peak_threads,
+        "baseline_threads": baseline_threads,
+        "peak_rss_mb": round(sampler.peak_rss_mb or peak_rss or 0, 1) or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test against fake Twitter and Telegram servers.")
+    parser.add_argument("--target", choices=["streamer", "async", "main"], default="streamer")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of tweet generation.")
+    parser.add_argument("--drain", type=float, default=10, help="Extra seconds allowed for outstanding deliveries.")
+    parser.add_argument("--tweets-per-second", type=float, default=10, help="Across all accounts.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake Twitter response latency in seconds.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None, help="Requests per endpoint per window.")
+    parser.add_argument("--rate-limit-window", type=float, default=15.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.0)
+    parser.add_argument("--telegram-flood-limit", type=int, default=None, help="Messages per second before 429.")
+    parser.add_argument("--poll-interval", type=float, default=1)
+    parser.add_argument("--max-workers", type=int, default=None, help="Streamer poll workers.")
+    parser.add_argument("--batch-search", action="store_true", help="Poll through OR-batched search queries.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "results.jsonl"),
+                        help="JSON-lines file the result is appended to.")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    streamer_options = {}
+    if args.max_workers:
+        streamer_options["max_workers"] = args.max_workers
+    if args.batch_search:
+        streamer_options["batch_search"] = True
+    result = run_benchmark(
+        target=args.target, accounts=args.accounts, duration=args.duration, drain=args.drain,
+        tweets_per_second=args.tweets_per_second, latency=args.latency, latency_jitter=args.latency_jitter,
+        rate_limit=args.rate_limit, rate_limit_window=args.rate_limit_window,
+        telegram_latency=args.telegram_latency, telegram_flood_limit=args.telegram_flood_limit,
+        poll_interval=args.poll_interval, seed=args.seed, streamer_options=streamer_options,
+    )
+    with open(args.output, "a") as output:
+        output.write(json.dumps(result, sort_keys=True, default=str) + "\n")
+    print(json.dumps({key: value for key, value in result.items() if key != "config"}, indent=2, sort_keys=True))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import threading
+
+# Project root is one directory up from config/.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(PROJECT_ROOT, "config", ".env")
+
+_env_loaded = False
+_settings = None
+_lock = threading.Lock()
+
+
+class ConfigError(ValueError):
+    """
+    Raised when a required setting is missing or malformed.
+    """
+
+
+def load_env(path=ENV_PATH):
+    """
+    Loads config/.env into the environment once per process; variables that
+    are already set win. Safe to call from every constructor.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _lock:
+        if _env_loaded:
+            return
+        if os.path.exists(path):
+            # Imported here so processes that never read .env skip the import.
+            from dotenv import load_dotenv
+            load_dotenv(dotenv_path=path)
+        _env_loaded = True
+
+
+def _split(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _flag(environ, name):
+    return environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _number(environ, name, default, cast=float):
+    value = environ.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ConfigError(f"{name} must be a number, got {value!r}")
+
+
+class Settings:
+    """
+    Every setting the app reads from the environment, parsed in one place.
+    """
+
+    def __init__(self, twitter_bearer_tokens=(), telegram_bot_token=None, telegram_chat_id=None,
+                 target_user=None, usernames=(), log_level="INFO", checkpoint_path=None, user_cache_path=None,
+                 dedup_path=None, metrics_port=None, poll_interval=3, twitter_api_url=None,
+                 telegram_api_url=None, watchlist_path=None, control_port=None, forward_media=False,
+                 media_bandwidth=None, file_id_cache_path=None, routes_path=None):
+        self.twitter_bearer_tokens = list(twitter_bearer_tokens)
+        self.telegram_bot_token = telegram_bot_token
+        self.telegram_chat_id = telegram_chat_id
+        self.target_user = target_user
+        self.usernames = list(usernames)
+        self.log_level = log_level
+        self.checkpoint_path = checkpoint_path
+        self.user_cache_path = user_cache_path
+        self.dedup_path = dedup_path
+        self.metrics_port = metrics_port
+        self.poll_interval = poll_interval
+        self.twitter_api_url = twitter_api_url
+        self.telegram_api_url = telegram_api_url
+        self.watchlist_path = watchlist_path
+        self.control_port = control_port
+        self.forward_media = forward_media
+        self.media_bandwidth = media_bandwidth
+        self.file_id_cache_path = file_id_cache_path
+        self.routes_path = routes_path
+
+    @classmethod
+    def from_env(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        tokens = _split(environ.get("TWITTER_BEARER_TOKENS"))
+        if not tokens and environ.get("TWITTER_BEARER_TOKEN"):
+            tokens = [environ["TWITTER_BEARER_TOKEN"]]
+        return cls(
+            twitter_bearer_tokens=tokens,
+            telegram_bot_token=environ.get("TELEGRAM_BOT_TOKEN") or None,
+            telegram_chat_id=environ.get("TELEGRAM_CHAT_ID") or None,
+            target_user=environ.get("TARGET_USER") or None,
+            usernames=_split(environ.get("TWITTER_USERNAMES")),
+            log_level=environ.get("LOG_LEVEL", "INFO"),
+            checkpoint_path=environ.get("CHECKPOINT_PATH") or None,
+            user_cache_path=environ.get("USER_CACHE_PATH") or None,
+            dedup_path=environ.get("DEDUP_PATH") or None,
+            metrics_port=_number(environ, "METRICS_PORT", None, int),
+            poll_interval=_number(environ, "POLL_INTERVAL", 3),
+            twitter_api_url=environ.get("TWITTER_API_URL") or None,
+            telegram_api_url=environ.get("TELEGRAM_API_URL") or None,
+            watchlist_path=environ.get("WATCHLIST_PATH") or None,
+            control_port=_number(environ, "CONTROL_PORT", None, int),
+            forward_media=_flag(environ, "FORWARD_MEDIA"),
+            media_bandwidth=_number(environ, "MEDIA_BANDWIDTH", None),
+            file_id_cache_path=environ.get("FILE_ID_CACHE_PATH") or None,
+            routes_path=environ.get("ROUTES_PATH") or None,
+        )
+
+    def require(self, *groups):
+        """
+        Validates the settings a mode needs: "twitter", "telegram",
+        "target_user" and/or "usernames". Raises ConfigError naming
+        everything missing.
+        """
+        missing = []
+        if "twitter" in groups and not self.twitter_bearer_tokens:
+            missing.append("TWITTER_BEARER_TOKEN (or TWITTER_BEARER_TOKENS)")
+        if "telegram" in groups:
+            missing += [name for name, value in (("TELEGRAM_BOT_TOKEN", self.telegram_bot_token),
+                                                 ("TELEGRAM_CHAT_ID", self.telegram_chat_id)) if not value]
+        if "target_user" in groups and not self.target_user:
+            missing.append("TARGET_USER")
+        if "usernames" in groups and not (self.usernames or self.watchlist_path):
+            missing.append("TWITTER_USERNAMES (or WATCHLIST_PATH)")
+        if missing:
+            raise ConfigError(f"Missing settings: {', '.join(missing)}")
+        return self
+
+
+def get_settings(reload=False):
+    """
+    Returns the process-wide Settings, loading .env and parsing the
+    environment on first use.
+    """
+    global _settings
+    if _settings is None or reload:
+        load_env()
+        settings = Settings.from_env()
+        with _lock:
+            _settings = settings
+    return _settings
@@ -1,8 +1,2 @@
-import logging
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-
-# This __init__ file initializes the package and sets up logging.
+# Importing the package has no side effects; logging is configured by the
+# entry points in src/cli.py.
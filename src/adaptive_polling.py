@@ -0,0 +1,89 @@
+import math
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePollPolicy:
+    """
+    Per-account polling intervals driven by how often each account tweets.
+
+    Activity is tracked as an exponentially weighted moving average of tweets
+    per hour. The interval is chosen so that roughly `target_tweets_per_poll`
+    new tweets are expected per poll, optionally scaled by a 24-hour
+    time-of-day profile, and clamped to [min_interval, max_interval]. Busy
+    accounts are polled often and dormant ones rarely.
+    """
+
+    def __init__(self, min_interval=3, max_interval=300, half_life=6 * 3600,
+                 target_tweets_per_poll=0.25, initial_tweets_per_hour=60,
+                 default_profile=None, profiles=None):
+        """
+        :param min_interval: Shortest interval in seconds.
+        :param max_interval: Longest interval in seconds.
+        :param half_life: Seconds after which past activity counts half as much.
+        :param target_tweets_per_poll: Expected new tweets per poll the interval aims for.
+        :param initial_tweets_per_hour: Activity assumed for accounts not observed yet.
+        :param default_profile: Optional list of 24 hourly activity multipliers (local time).
+        :param profiles: Optional {username: [24 multipliers]} overriding the default profile.
+        """
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("Intervals must satisfy 0 < min_interval <= max_interval")
+        for profile in [default_profile] + list((profiles or {}).values()):
+            if profile is not None and len(profile) != 24:
+                raise ValueError("Time-of-day profiles need 24 hourly multipliers")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.tau = half_life / math.log(2)
+        self.target_tweets_per_poll = target_tweets_per_poll
+        self.initial_rate = initial_tweets_per_hour / 3600.0
+        self.default_profile = default_profile
+        self.profiles = dict(profiles or {})
+        self.lock = threading.Lock()
+        # username -> (tweets per second, time of last observation)
+        self.activity = {}
+
+    def observe(self, username, new_tweets, now=None):
+        """
+        Records the outcome of one poll of `username`.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            rate, last = self.activity.get(username, (self.initial_rate, None))
+            if last is None:
+                # Nothing to measure the first result against yet.
+                self.activity[username] = (rate, now)
+                return
+            elapsed = max(now - last, 1e-3)
+            alpha = 1 - math.exp(-elapsed / self.tau)
+            observed = new_tweets / elapsed
+            self.activity[username] = (rate + alpha * (observed - rate), now)
+
+    def tweets_per_hour(self, username):
+        with self.lock:
+            rate, _ = self.activity.get(username, (self.initial_rate, None))
+        return rate * 3600
+
+    def profile_factor(self, username, now=None):
+        profile = self.profiles.get(username, self.default_profile)
+        if profile is None:
+            return 1.0
+        hour = time.localtime(time.time() if now is None else now).tm_hour
+        return profile[hour]
+
+    def interval(self, username, now=None):
+        """
+        Returns the number of seconds to wait before polling `username` again.
+        """
+        with self.lock:
+            rate, _ = self.activity.get(username, (self.initial_rate, None))
+        rate *= self.profile_factor(username, now)
+        if rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target_tweets_per_poll / rate))
+
+    def forget(self, username):
+        with self.lock:
+            self.activity.pop(username, None)
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class _AsyncWrapper:
+    """
+    Runs the blocking methods of a client on a fixed-size executor so they can
+    be awaited from an event loop. The executor size is the hard upper bound on
+    in-flight HTTP calls, however many coroutines are waiting on it.
+    """
+
+    def __init__(self, client, executor):
+        self.client = client
+        self.executor = executor
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+
+
+class AsyncTwitterClient(_AsyncWrapper):
+    async def get_user_ids(self, usernames):
+        return await self._call(self.client.get_user_ids, usernames)
+
+    async def get_user_tweets(self, user_id, since_id=None, max_results=5):
+        return await self._call(self.client.get_user_tweets, user_id, since_id=since_id,
+                                max_results=max_results)
+
+    async def fetch_user_tweets(self, user_id, since_id=None, page_size=5, max_pages=3):
+        """
+        Collects TwitterClient.iter_user_tweets on the executor; oldest first.
+        """
+        return await self._call(lambda: list(self.client.iter_user_tweets(
+            user_id, since_id=since_id, page_size=page_size, max_pages=max_pages
+        )))
+
+
+class AsyncTelegramBot(_AsyncWrapper):
+    async def send_message(self, message):
+        return await self._call(self.client.send_message, message)
+
+
+def create_async_clients(twitter_client, telegram_bot, max_workers):
+    """
+    Builds async facades over the given clients sharing one bounded executor,
+    so they keep using the pooled keep-alive transport underneath.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-io")
+    return AsyncTwitterClient(twitter_client, executor), AsyncTelegramBot(telegram_bot, executor), executor
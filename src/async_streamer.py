@@ -0,0 +1,118 @@
+import time
+import asyncio
+import logging
+from src.streamer import Streamer
+from src.async_clients import create_async_clients
+from src.metrics import POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStreamer(Streamer):
+    """
+    asyncio variant of Streamer. Every account is a coroutine instead of a
+    thread, and at most `max_concurrency` accounts are checked at once, so one
+    process can track thousands of accounts with flat memory. Each check is
+    Streamer.check_username run on the executor, so since_id tracking, gaps,
+    backoff, deadlines and shard leases behave exactly as in Streamer, and
+    each account sleeps until its own adaptive due time. Batched search and
+    the filtered stream are not supported.
+    """
+
+    def __init__(self, usernames, poll_interval=3, max_concurrency=50, **kwargs):
+        """
+        :param usernames: List of Twitter usernames to track.
+        :param poll_interval: Polling interval in seconds.
+        :param max_concurrency: Maximum number of accounts checked concurrently.
+        Other keyword arguments (user_cache_path, checkpoint_path, dedup_index, ...) go to Streamer.
+        """
+        unsupported = [name for name in ("batch_search", "use_filtered_stream") if kwargs.get(name)]
+        if unsupported:
+            raise ValueError(f"AsyncStreamer does not support {', '.join(unsupported)}")
+        super().__init__(usernames, poll_interval=poll_interval, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.async_twitter_client, self.async_telegram_bot, self.executor = create_async_clients(
+            self.twitter_client, self.telegram_bot, max_workers=max_concurrency
+        )
+
+    async def check_username_async(self, username, semaphore):
+        if self.is_backed_off(username):
+            return
+
+        async with semaphore:
+            # The whole check (user lookup, paging, forwarding) blocks, so it runs on the executor.
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.within_deadline, self.check_username, username)
+
+    async def fetch_and_forward_async(self):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        # The watchlist is an immutable snapshot; accounts added mid-cycle are picked up next cycle.
+        usernames = self.usernames
+        results = await asyncio.gather(
+            *(self.check_username_async(username, semaphore) for username in usernames),
+            return_exceptions=True
+        )
+        for username, result in zip(usernames, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing {username}: {result}")
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.delivery_queue.drain)
+        if self.checkpoint_store:
+            self.checkpoint_store.flush()
+
+    async def poll_forever(self, username, semaphore):
+        """
+        Polls one account on its own adaptive schedule until it is dropped.
+        """
+        while username in self.last_tweet_ids and not self.stop_event.is_set():
+            with POLL_SECONDS.time(mode="account"):
+                await self.check_username_async(username, semaphore)
+            self.save_dedup_if_due()
+            await asyncio.sleep(max(0, self.next_due(username) - time.time()))
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = {}
+        while not self.stop_event.is_set():
+            # Accounts added since the last pass get their own polling task; tasks of
+            # removed accounts finish on their own and are restarted if they come back.
+            for username in self.usernames:
+                if username not in tasks or tasks[username].done():
+                    tasks[username] = asyncio.create_task(self.poll_forever(username, semaphore))
+            await asyncio.sleep(self.poll_interval)
+        for task in tasks.values():
+            task.cancel()
+
+    def start_stream(self):
+        logger.info("Starting async tweet stream...")
+        self.stop_event.clear()
+        self.delivery_queue.start()
+        if self.checkpoint_store:
+            self.checkpoint_store.start()
+        if self.metrics_server:
+            self.metrics_server.start()
+        if self.watchlist_file:
+            self.watchlist_file.check()
+            self.watchlist_file.start()
+        if self.control_server:
+            self.control_server.start()
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            logger.info("Tweet stream stopped by user.")
+        except Exception as e:
+            logger.error(f"Stream encountered an error: {e}")
+        finally:
+            self.delivery_queue.stop()
+            if self.checkpoint_store:
+                self.checkpoint_store.stop()
+            if self.dedup.path:
+                self.dedup.save()
+            if self.media_sender and self.media_sender.file_ids.path:
+                self.media_sender.file_ids.save()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.watchlist_file:
+                self.watchlist_file.stop()
+            if self.control_server:
+                self.control_server.stop()
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,452 @@
+"""
+Historical backfill: pages each account's history into a JSONL file or a
+directory of Parquet files.
+
+    python -m src backfill --usernames alice,bob --output data/history.jsonl
+    python -m src backfill --usernames alice --output data/history --format parquet --source auto
+
+Progress (pagination tokens and how much of the output is committed) is
+kept in a SQLite state file next to the output, so an interrupted run picks
+up where it stopped when started again with the same options.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.exceptions import HTTPError, RequestException
+from src.models import parse_tweets
+from src.rate_limiter import RateLimitError
+from src.resilience import CircuitOpenError
+from src.search_batcher import is_newer
+from src.user_resolver import UserResolver
+
+logger = logging.getLogger(__name__)
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account TEXT PRIMARY KEY,
+    source TEXT,
+    next_token TEXT,
+    newest_id TEXT,
+    fetched INTEGER NOT NULL,
+    done INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Largest pages each endpoint serves.
+MAX_TIMELINE_PAGE = 100
+MAX_ARCHIVE_PAGE = 500
+
+
+class AccountProgress:
+    __slots__ = ("account", "source", "next_token", "newest_id", "fetched", "done")
+
+    def __init__(self, account, source=None, next_token=None, newest_id=None, fetched=0, done=False):
+        self.account = account
+        self.source = source
+        self.next_token = next_token
+        self.newest_id = newest_id
+        self.fetched = fetched
+        self.done = done
+
+    def copy(self):
+        return AccountProgress(self.account, self.source, self.next_token, self.newest_id, self.fetched, self.done)
+
+
+class BackfillState:
+    """
+    SQLite record of per-account pagination progress and of how far the
+    output is committed. Both are updated in one transaction, so after a
+    crash the output can be cut back to exactly the pages the tokens cover.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(STATE_SCHEMA)
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT account, source, next_token, newest_id, fetched, done FROM accounts").fetchall()
+        return {row[0]: AccountProgress(row[0], row[1], row[2], row[3], row[4], bool(row[5])) for row in rows}
+
+    def get_meta(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                              "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def commit(self, progress, marker):
+        """
+        Records `progress` (AccountProgress snapshots, oldest first) together
+        with the sink position that covers them.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO accounts (account, source, next_token, newest_id, fetched, done, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(account) DO UPDATE SET source = excluded.source, "
+                    "next_token = excluded.next_token, newest_id = excluded.newest_id, fetched = excluded.fetched, "
+                    "done = excluded.done, updated_at = excluded.updated_at",
+                    [(p.account, p.source, p.next_token, p.newest_id, p.fetched, int(p.done), now) for p in progress]
+                )
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('marker', ?) "
+                                  "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (marker,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class JsonlSink:
+    """
+    Appends one JSON object per line. Every write is flushed, so everything
+    written is committed; the committed position is the file size.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "ab")
+
+    def restore(self, marker):
+        """
+        Cuts off anything written after the last commit (a page whose token
+        was not recorded, so it will be fetched again).
+        """
+        committed = int(marker or 0)
+        size = self.file.seek(0, os.SEEK_END)
+        if size > committed:
+            logger.warning(f"Discarding {size - committed} uncommitted bytes from {self.path}")
+            self.file.truncate(committed)
+            self.file.seek(committed)
+
+    def write(self, records):
+        self.file.write(b"".join(json.dumps(record, ensure_ascii=False).encode() + b"\n" for record in records))
+        self.file.flush()
+        return True
+
+    def marker(self):
+        return str(self.file.tell())
+
+    def flush(self):
+        return True
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """
+    Writes a directory of Parquet files (readable as one dataset), one file
+    per `rows_per_file` tweets. Rows are buffered only up to one file; each
+    file is written to a temporary name and renamed, so a file is either
+    complete or absent. The committed position is the number of files.
+    Needs pyarrow.
+    """
+
+    COLUMNS = ("account", "id", "author_id", "created_at", "text", "referenced_tweets", "extra")
+
+    def __init__(self, directory, rows_per_file=50000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.rows = []
+        self.files = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def part_path(self, index):
+        return os.path.join(self.directory, f"part-{index:05d}.parquet")
+
+    def restore(self, marker):
+        self.files = int(marker or 0)
+        for name in os.listdir(self.directory):
+            stem = name.split(".")[0]
+            if name.endswith(".tmp") or (stem.startswith("part-") and stem[5:].isdigit()
+                                         and int(stem[5:]) >= self.files):
+                logger.warning(f"Discarding uncommitted {os.path.join(self.directory, name)}")
+                os.remove(os.path.join(self.directory, name))
+
+    def write(self, records):
+        for record in records:
+            row = {column: record.get(column) for column in self.COLUMNS[:5]}
+            row["referenced_tweets"] = json.dumps(record["referenced_tweets"]) \
+                if record.get("referenced_tweets") else None
+            extra = {key: value for key, value in record.items() if key not in self.COLUMNS}
+            row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+            self.rows.append(row)
+        if len(self.rows) >= self.rows_per_file:
+            return self.flush()
+        return False
+
+    def flush(self):
+        if self.rows:
+            table = self.pyarrow.Table.from_pylist(self.rows, schema=self.pyarrow.schema(
+                [(column, self.pyarrow.string()) for column in self.COLUMNS]))
+            path = self.part_path(self.files)
+            self.parquet.write_table(table, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+            self.files += 1
+            self.rows = []
+        return True
+
+    def marker(self):
+        return str(self.files)
+
+    def close(self):
+        self.flush()
+
+
+def open_sink(output, format="jsonl", rows_per_file=50000):
+    if format == "jsonl":
+        return JsonlSink(output)
+    if format == "parquet":
+        return ParquetSink(output, rows_per_file=rows_per_file)
+    raise ValueError(f"Unknown backfill format: {format}")
+
+
+class Backfill:
+    """
+    Pages the history of many accounts in parallel into a sink.
+
+    Each worker follows one account's pagination tokens, newest tweets
+    first, from the user timeline (the latest ~3200 tweets) or, where the
+    API tier has it, full-archive search ("auto" tries search and falls back
+    to the timeline on 403). Requests go through the client's credential
+    pool and rate-limit budgets; when those are exhausted the worker sleeps
+    until the window resets. Pages are handed to the sink as they arrive,
+    so memory is bounded by one page per worker (plus one Parquet file's
+    rows), and every committed page records its account's next token.
+    """
+
+    def __init__(self, twitter_client, usernames, sink, state, source="timeline", page_size=100, max_workers=4,
+                 start_time=None, end_time=None, max_retries=5, user_resolver=None):
+        """
+        :param twitter_client: TwitterClient used for the requests.
+        :param usernames: Accounts to backfill.
+        :param sink: JsonlSink or ParquetSink receiving one record per tweet.
+        :param state: BackfillState recording progress.
+        :param source: "timeline", "search" (full archive) or "auto".
+        :param page_size: Tweets per request (capped at what the endpoint allows).
+        :param max_workers: Accounts fetched in parallel.
+        :param start_time: Optional ISO 8601 lower bound on created_at.
+        :param end_time: Optional ISO 8601 upper bound on created_at.
+        :param max_retries: Consecutive request errors before an account is given up for this run.
+        :param user_resolver: Optional UserResolver; by default one without a cache file.
+        """
+        if source not in ("timeline", "search", "auto"):
+            raise ValueError(f"Unknown backfill source: {source}")
+        self.twitter_client = twitter_client
+        self.usernames = list(dict.fromkeys(name.lstrip("@") for name in usernames))
+        self.sink = sink
+        self.state = state
+        self.source = source
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.start_time = start_time
+        self.end_time = end_time
+        self.max_retries = max_retries
+        self.user_resolver = user_resolver or UserResolver(twitter_client)
+        self.stop_event = threading.Event()
+        self.write_lock = threading.Lock()
+        self.uncommitted = []
+        self.progress = {}
+        self.failed = []
+
+    def options(self):
+        return json.dumps({"source": self.source, "start_time": self.start_time, "end_time": self.end_time})
+
+    def resume(self):
+        """
+        Loads saved progress and cuts the output back to its last commit.
+        Refuses state written with different options, whose tokens would
+        not match this run's queries.
+        """
+        saved = self.state.get_meta("options")
+        if saved is not None and saved != self.options():
+            raise ValueError(f"{self.state.path} belongs to a backfill with options {saved}; "
+                             f"use another state file for {self.options()}")
+        self.state.set_meta("options", self.options())
+        self.sink.restore(self.state.get_meta("marker"))
+        self.progress = self.state.load()
+        resumed = [p for p in self.progress.values() if p.account in self.usernames and (p.fetched or p.done)]
+        if resumed:
+            logger.info(f"Resuming backfill: {sum(p.done for p in resumed)} accounts done, "
+                        f"{sum(p.fetched for p in resumed)} tweets already fetched")
+
+    def commit(self, progress, records):
+        """
+        Hands a page to the sink; once the sink reports it durable, records
+        every pending token together with the sink position.
+        """
+        with self.write_lock:
+            durable = self.sink.write(records)
+            self.uncommitted.append(progress.copy())
+            if durable:
+                self.state.commit(self.uncommitted, self.sink.marker())
+                self.uncommitted = []
+
+    def wait(self, seconds):
+        """
+        Sleeps up to `seconds`; returns False if the backfill was stopped.
+        """
+        return not self.stop_event.wait(seconds)
+
+    def fetch_page(self, progress, user_id, source):
+        if source == "search":
+            return self.twitter_client.search_all_tweets(
+                f"from:{progress.account}", max_results=min(self.page_size, MAX_ARCHIVE_PAGE),
+                next_token=progress.next_token, start_time=self.start_time, end_time=self.end_time)
+        return self.twitter_client.get_user_tweets(
+            user_id, max_results=min(self.page_size, MAX_TIMELINE_PAGE), pagination_token=progress.next_token,
+            start_time=self.start_time, end_time=self.end_time)
+
+    def backfill_account(self, username, user_id):
+        progress = self.progress.setdefault(username, AccountProgress(username))
+        if progress.done:
+            return progress
+        source = progress.source or ("search" if self.source == "auto" else self.source)
+        errors = 0
+        while not self.stop_event.is_set():
+            try:
+                data = self.fetch_page(progress, user_id, source)
+            except RateLimitError as e:
+                logger.info(f"Backfill of {username} waiting {e.retry_after:.0f}s for the rate limit window")
+                if not self.wait(max(e.retry_after, 1)):
+                    break
+                continue
+            except CircuitOpenError as e:
+                if not self.wait(e.retry_after):
+                    break
+                continue
+            except HTTPError as e:
+                status = getattr(e.response, "status_code", None)
+                if status == 403 and source == "search" and self.source == "auto" and progress.next_token is None:
+                    logger.warning("Full-archive search is not available on this API tier; using timelines")
+                    source = "timeline"
+                    continue
+                errors += 1
+                if status is not None and 400 <= status < 500 and status != 429 or errors > self.max_retries:
+                    raise
+                self.wait(min(60, 2 ** errors))
+                continue
+            except RequestException:
+                errors += 1
+                if errors > self.max_retries:
+                    raise
+                self.wait(min(60, 2 ** errors))
+                continue
+            errors = 0
+            tweets = parse_tweets(data)
+            for tweet in tweets:
+                if is_newer(tweet.id, progress.newest_id):
+                    progress.newest_id = tweet.id
+            progress.source = source
+            progress.next_token = (data.get("meta") or {}).get("next_token")
+            progress.fetched += len(tweets)
+            progress.done = progress.next_token is None
+            self.commit(progress, [dict(tweet.to_dict(), account=username) for tweet in tweets])
+            if progress.done:
+                logger.info(f"Backfilled {progress.fetched} tweets from {username}")
+                break
+        return progress
+
+    def run(self):
+        """
+        Backfills every account and returns a summary dict. Safe to call
+        again after an interruption; finished accounts are skipped.
+        """
+        started = time.time()
+        self.resume()
+        pending = [name for name in self.usernames if not self.progress.get(name, AccountProgress(name)).done]
+        needs_ids = self.source != "search"
+        user_ids = self.user_resolver.resolve_many(pending) if needs_ids and pending else {}
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pending) or 1)),
+                                    thread_name_prefix="backfill") as executor:
+                futures = {}
+                for username in pending:
+                    user_id = user_ids.get(username)
+                    if needs_ids and user_id is None:
+                        logger.error(f"Skipping backfill of {username}: user id could not be resolved")
+                        self.failed.append(username)
+                        continue
+                    futures[executor.submit(self.backfill_account, username, user_id)] = username
+                try:
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f"Backfill of {futures[future]} failed: {e}")
+                            self.failed.append(futures[future])
+                except KeyboardInterrupt:
+                    logger.info("Backfill interrupted; finishing pages in flight")
+                    self.stop_event.set()
+                    raise
+        finally:
+            with self.write_lock:
+                self.sink.flush()
+                if self.uncommitted:
+                    self.state.commit(self.uncommitted, self.sink.marker())
+                    self.uncommitted = []
+        progress = [self.progress[name] for name in self.usernames if name in self.progress]
+        return {
+            "accounts": len(self.usernames),
+            "completed": sum(p.done for p in progress),
+            "failed": self.failed,
+            "tweets": sum(p.fetched for p in progress),
+            "elapsed_seconds": round(time.time() - started, 3),
+        }
+
+    def stop(self):
+        self.stop_event.set()
+
+    def seed_watermarks(self, checkpoint_store):
+        """
+        Sets the live poller's since_id for every completed account to the
+        newest tweet backfilled, unless its watermark is already newer.
+        Returns the number of accounts seeded.
+        """
+        done = {p.account: p.newest_id for p in self.progress.values()
+                if p.done and p.newest_id and p.account in self.usernames}
+        existing = checkpoint_store.load_watermarks(done)
+        seeded = 0
+        for account, newest_id in done.items():
+            if is_newer(newest_id, existing.get(account)):
+                checkpoint_store.stage_watermark(account, newest_id)
+                seeded += 1
+        checkpoint_store.flush()
+        logger.info(f"Seeded {seeded} live polling watermarks from the backfill")
+        return seeded
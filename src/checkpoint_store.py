@@ -0,0 +1,234 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    account TEXT PRIMARY KEY,
+    since_id TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    tweet_id TEXT,
+    chat_id TEXT,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class OutboxEntry:
+    __slots__ = ("id", "account", "tweet_id", "chat_id", "message", "created_at")
+
+    def __init__(self, account, tweet_id, message, chat_id=None, created_at=None, id=None):
+        self.id = id
+        self.account = account
+        self.tweet_id = tweet_id
+        self.chat_id = chat_id
+        self.message = message
+        self.created_at = time.time() if created_at is None else created_at
+
+
+class CheckpointStore:
+    """
+    Crash-safe SQLite (WAL mode) store for per-account since_id watermarks and
+    the outbox of Telegram messages not yet delivered.
+
+    Pollers only stage changes in memory; flush() writes everything staged in
+    one transaction, either once per poll cycle or from a background flusher.
+    A watermark and the outbox rows for the tweets it covers are always staged
+    together, so a crash can lose neither half alone: either both are on disk
+    (pending messages are re-sent on startup) or neither is (the tweets are
+    fetched again).
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        """
+        :param path: SQLite database file.
+        :param flush_interval: Seconds between background flushes once start() is called.
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.staged_watermarks = {}
+        self.staged_outbox = []
+        self.staged_deliveries = set()
+        self.stop_event = threading.Event()
+        self.flusher = None
+
+    def load_watermarks(self, accounts=None):
+        """
+        Returns {account: since_id}, limited to `accounts` if given.
+        """
+        with self.db_lock:
+            rows = self.conn.execute("SELECT account, since_id FROM watermarks").fetchall()
+        if accounts is not None:
+            accounts = set(accounts)
+            rows = [row for row in rows if row[0] in accounts]
+        return dict(rows)
+
+    def load_outbox(self, accounts=None):
+        """
+        Returns undelivered messages (of `accounts` if given), oldest first.
+        """
+        with self.db_lock:
+            rows = self.conn.execute(
+                "SELECT id, account, tweet_id, chat_id, message, created_at FROM outbox ORDER BY id"
+            ).fetchall()
+        if accounts is not None:
+            accounts = set(accounts)
+            rows = [row for row in rows if row[1] in accounts]
+        return [OutboxEntry(account, tweet_id, message, chat_id=chat_id, created_at=created_at, id=entry_id)
+                for entry_id, account, tweet_id, chat_id, message, created_at in rows]
+
+    def pending_count(self, account):
+        """
+        Number of messages of `account` staged or written but not yet delivered.
+        """
+        with self.lock:
+            staged = sum(1 for entry in self.staged_outbox if entry.account == account)
+            delivered = sum(1 for entry in self.staged_deliveries if entry.account == account)
+        with self.db_lock:
+            (stored,) = self.conn.execute("SELECT COUNT(*) FROM outbox WHERE account = ?", (account,)).fetchone()
+        return staged + stored - delivered
+
+    def stage_poll(self, account, since_id, messages, chat_id=None):
+        """
+        Stages a new watermark for `account` together with outbox entries for
+        `messages`, a list of (tweet_id, text) or (tweet_id, text, chat_id);
+        `chat_id` is the default destination. Returns the OutboxEntry objects
+        to pass to mark_delivered() once each message is sent.
+        """
+        entries = [OutboxEntry(account, message[0], message[1], chat_id=message[2] if len(message) > 2 else chat_id)
+                   for message in messages]
+        with self.lock:
+            if since_id is not None:
+                self.staged_watermarks[account] = since_id
+            self.staged_outbox.extend(entries)
+        return entries
+
+    def stage_watermark(self, account, since_id):
+        self.stage_poll(account, since_id, [])
+
+    def mark_delivered(self, entry):
+        with self.lock:
+            if entry.id is None:
+                # Delivered before it was ever flushed: just never write it.
+                try:
+                    self.staged_outbox.remove(entry)
+                    return
+                except ValueError:
+                    pass
+            self.staged_deliveries.add(entry)
+
+    def discard_staged(self, account):
+        """
+        Drops the unflushed watermark and messages of `account`, e.g. after
+        another worker took it over, so they cannot overwrite that worker's.
+        """
+        with self.lock:
+            self.staged_watermarks.pop(account, None)
+            self.staged_outbox = [entry for entry in self.staged_outbox if entry.account != account]
+
+    def forget(self, account):
+        """
+        Drops the watermark and pending messages of an account no longer tracked.
+        """
+        with self.lock:
+            self.staged_watermarks.pop(account, None)
+            self.staged_outbox = [entry for entry in self.staged_outbox if entry.account != account]
+        with self.db_lock:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM watermarks WHERE account = ?", (account,))
+            self.conn.execute("DELETE FROM outbox WHERE account = ?", (account,))
+            self.conn.execute("COMMIT")
+
+    def flush(self):
+        """
+        Writes all staged changes in one transaction. Returns False if the
+        write failed (the changes stay staged for the next flush).
+        """
+        with self.lock:
+            watermarks = self.staged_watermarks
+            outbox = self.staged_outbox
+            # Entries delivered while being flushed get their id below; keep them for next time.
+            deliveries = {entry for entry in self.staged_deliveries if entry.id is not None}
+            self.staged_deliveries -= deliveries
+            self.staged_watermarks = {}
+            self.staged_outbox = []
+        if not (watermarks or outbox or deliveries):
+            return True
+        now = time.time()
+        try:
+            with self.db_lock:
+                self.conn.execute("BEGIN")
+                try:
+                    self.conn.executemany(
+                        "INSERT INTO watermarks (account, since_id, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(account) DO UPDATE SET since_id = excluded.since_id, updated_at = excluded.updated_at",
+                        [(account, since_id, now) for account, since_id in watermarks.items()]
+                    )
+                    for entry in outbox:
+                        cursor = self.conn.execute(
+                            "INSERT INTO outbox (account, tweet_id, chat_id, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                            (entry.account, entry.tweet_id, entry.chat_id, entry.message, entry.created_at)
+                        )
+                        entry.id = cursor.lastrowid
+                    self.conn.executemany("DELETE FROM outbox WHERE id = ?", [(entry.id,) for entry in deliveries])
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    for entry in outbox:
+                        entry.id = None
+                    raise
+        except sqlite3.Error as e:
+            logger.error(f"Error flushing checkpoints to {self.path}: {e}")
+            with self.lock:
+                # Put everything back so the next flush retries it.
+                for account, since_id in watermarks.items():
+                    self.staged_watermarks.setdefault(account, since_id)
+                self.staged_outbox[:0] = outbox
+                self.staged_deliveries |= deliveries
+            return False
+        with self.lock:
+            # Deliveries that raced with this flush can now be deleted by id.
+            delivered_now = {entry for entry in self.staged_deliveries if entry.id is not None}
+        if delivered_now:
+            return self.flush()
+        return True
+
+    def _run_flusher(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        if self.flusher is None:
+            self.stop_event.clear()
+            self.flusher = threading.Thread(target=self._run_flusher, name="checkpoint-flusher", daemon=True)
+            self.flusher.start()
+
+    def stop(self):
+        if self.flusher is not None:
+            self.stop_event.set()
+            self.flusher.join()
+            self.flusher = None
+        self.flush()
+
+    def close(self):
+        self.stop()
+        with self.db_lock:
+            self.conn.close()
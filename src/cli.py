@@ -0,0 +1,173 @@
+"""
+Command-line entry point.
+
+    python -m src single                   # follow TARGET_USER (src/main.py)
+    python -m src stream --usernames a,b   # multi-account Streamer
+    python -m src shard --workers 4        # watchlist sharded across processes
+    python -m src backfill --usernames a,b --output history.jsonl
+
+Each mode imports only what it runs, and settings are read and validated
+once, after argument parsing, so a bad .env fails fast with one message.
+"""
+import sys
+import logging
+import argparse
+from config.settings import ConfigError, get_settings
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def run_single(args, settings):
+    from src import main
+    main.run(settings=settings)
+
+
+def run_stream(args, settings):
+    if args.usernames:
+        settings.usernames = [name.strip() for name in args.usernames.split(",") if name.strip()]
+    settings.require("twitter", "telegram", "usernames")
+    if args.use_async and (args.batch_search or args.filtered_stream):
+        raise ConfigError("--async polls each account's timeline; it does not support "
+                          "--batch-search or --filtered-stream")
+    options = {
+        "poll_interval": args.poll_interval if args.poll_interval is not None else settings.poll_interval,
+        "user_cache_path": settings.user_cache_path,
+        "checkpoint_path": args.checkpoint_path or settings.checkpoint_path,
+        "batch_search": args.batch_search,
+        "use_filtered_stream": args.filtered_stream,
+        "metrics_port": args.metrics_port if args.metrics_port is not None else settings.metrics_port,
+        "watchlist_path": args.watchlist_path or settings.watchlist_path,
+        "control_port": args.control_port if args.control_port is not None else settings.control_port,
+        "forward_media": args.media or settings.forward_media,
+        "media_bandwidth": args.media_bandwidth if args.media_bandwidth is not None else settings.media_bandwidth,
+        "file_id_cache_path": settings.file_id_cache_path,
+    }
+    routes_path = args.routes or settings.routes_path
+    if routes_path:
+        from src.routing import Router
+        options["router"] = Router.from_file(routes_path)
+    if settings.dedup_path:
+        from src.dedup import DedupIndex
+        options["dedup_index"] = DedupIndex(path=settings.dedup_path)
+    if args.use_async:
+        from src.async_streamer import AsyncStreamer as streamer_class
+    else:
+        from src.streamer import Streamer as streamer_class
+    streamer = streamer_class(settings.usernames, **options)
+    try:
+        streamer.start_stream()
+    except KeyboardInterrupt:
+        logger.info("Streaming stopped by user.")
+        if hasattr(streamer, "stop"):
+            streamer.stop()
+
+
+def run_shard(args, settings):
+    from src import sharding
+    sharding.main(args.shard_args)
+
+
+def run_backfill(args, settings):
+    if args.usernames:
+        settings.usernames = [name.strip() for name in args.usernames.split(",") if name.strip()]
+    settings.require("twitter", "usernames")
+    from src.backfill import Backfill, BackfillState, open_sink
+    from src.twitter_client import TwitterClient
+    from src.user_resolver import UserResolver
+    usernames = settings.usernames
+    if not usernames:
+        from src.watchlist import WatchlistFile
+        usernames = WatchlistFile(settings.watchlist_path, None).read()
+    twitter_client = TwitterClient()
+    state = BackfillState(args.state_path or f"{args.output.rstrip('/')}.state.db")
+    sink = open_sink(args.output, args.format, rows_per_file=args.rows_per_file)
+    backfill = Backfill(twitter_client, usernames, sink, state, source=args.source, page_size=args.page_size,
+                        max_workers=args.workers, start_time=args.since, end_time=args.until,
+                        user_resolver=UserResolver(twitter_client, cache_path=settings.user_cache_path))
+    try:
+        summary = backfill.run()
+        logger.info(f"Backfill finished: {summary}")
+        checkpoint_path = args.checkpoint_path or settings.checkpoint_path
+        if args.seed_watermarks and checkpoint_path:
+            from src.checkpoint_store import CheckpointStore
+            store = CheckpointStore(checkpoint_path)
+            try:
+                backfill.seed_watermarks(store)
+            finally:
+                store.close()
+    except KeyboardInterrupt:
+        logger.info("Backfill stopped by user; run the same command again to resume.")
+    finally:
+        sink.close()
+        state.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src", description="Forward tweets to Telegram.")
+    parser.add_argument("--log-level", default=None, help="Overrides LOG_LEVEL.")
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    single = modes.add_parser("single", help="Follow TARGET_USER with the single-account loop.")
+    single.set_defaults(handler=run_single)
+
+    stream = modes.add_parser("stream", help="Follow many accounts with the Streamer.")
+    stream.add_argument("--usernames", default=None, help="Comma-separated accounts (default: TWITTER_USERNAMES).")
+    stream.add_argument("--poll-interval", type=float, default=None, help="Default: POLL_INTERVAL or 3.")
+    stream.add_argument("--checkpoint-path", default=None, help="Default: CHECKPOINT_PATH.")
+    stream.add_argument("--metrics-port", type=int, default=None, help="Default: METRICS_PORT (off if unset).")
+    stream.add_argument("--watchlist-path", default=None,
+                        help="File reloaded whenever it changes (default: WATCHLIST_PATH).")
+    stream.add_argument("--control-port", type=int, default=None,
+                        help="Local watchlist control endpoint (default: CONTROL_PORT, off if unset).")
+    stream.add_argument("--routes", default=None, help="JSON routing rules (default: ROUTES_PATH).")
+    stream.add_argument("--media", action="store_true", help="Forward photos and videos (default: FORWARD_MEDIA).")
+    stream.add_argument("--media-bandwidth", type=float, default=None,
+                        help="Bytes per second across media transfers (default: MEDIA_BANDWIDTH, uncapped).")
+    stream.add_argument("--batch-search", action="store_true", help="Poll through OR-batched search queries.")
+    stream.add_argument("--filtered-stream", action="store_true", help="Use the v2 filtered stream.")
+    stream.add_argument("--async", dest="use_async", action="store_true", help="Use the asyncio streamer.")
+    stream.set_defaults(handler=run_stream)
+
+    shard = modes.add_parser("shard", help="Shard the watchlist across worker processes (see src/sharding.py).",
+                             add_help=False)
+    shard.add_argument("shard_args", nargs=argparse.REMAINDER)
+    shard.set_defaults(handler=run_shard)
+
+    backfill = modes.add_parser("backfill", help="Export account history to JSONL or Parquet (resumable).")
+    backfill.add_argument("--usernames", default=None, help="Comma-separated accounts (default: TWITTER_USERNAMES).")
+    backfill.add_argument("--output", required=True, help="JSONL file, or directory for --format parquet.")
+    backfill.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl",
+                          help="Parquet needs pyarrow.")
+    backfill.add_argument("--source", choices=("timeline", "search", "auto"), default="timeline",
+                          help="User timelines (latest ~3200 tweets), full-archive search, or search "
+                               "falling back to timelines when the API tier lacks it.")
+    backfill.add_argument("--since", default=None, help="ISO 8601 start time, e.g. 2023-01-01T00:00:00Z.")
+    backfill.add_argument("--until", default=None, help="ISO 8601 end time.")
+    backfill.add_argument("--workers", type=int, default=4, help="Accounts fetched in parallel.")
+    backfill.add_argument("--page-size", type=int, default=100, help="Tweets per request.")
+    backfill.add_argument("--rows-per-file", type=int, default=50000, help="Tweets per Parquet file.")
+    backfill.add_argument("--state-path", default=None, help="Progress database (default: <output>.state.db).")
+    backfill.add_argument("--seed-watermarks", action="store_true",
+                          help="Start live polling after the newest backfilled tweet of each account.")
+    backfill.add_argument("--checkpoint-path", default=None,
+                          help="Checkpoint store to seed (default: CHECKPOINT_PATH).")
+    backfill.set_defaults(handler=run_backfill)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        settings = get_settings()
+        if args.log_level:
+            settings.log_level = args.log_level
+        logging.basicConfig(level=settings.log_level, format=LOG_FORMAT)
+        args.handler(args, settings)
+    except ConfigError as e:
+        sys.exit(f"Configuration error: {e}")
+
+
+if __name__ == "__main__":
+    main()
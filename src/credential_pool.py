@@ -0,0 +1,125 @@
+import os
+import logging
+import threading
+from src.rate_limiter import RateLimitBudget, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+
+class Credential:
+    __slots__ = ("token", "label", "budget", "headers", "revoked", "requests")
+
+    def __init__(self, token, budget=None):
+        self.token = token
+        # Enough to tell tokens apart in logs without leaking them.
+        self.label = f"...{token[-6:]}"
+        self.budget = budget or RateLimitBudget()
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.revoked = False
+        self.requests = 0
+
+
+class CredentialPool:
+    """
+    Pool of bearer tokens, each with its own per-endpoint RateLimitBudget.
+
+    Every request goes to the token with the most headroom on its endpoint:
+    the one whose next paced slot is soonest, and among those the one with
+    the most requests left in its window. Since each token is paced
+    independently, total throughput grows with the number of tokens. A token
+    that answers 429 is blocked until its window resets while the others keep
+    serving; a token rejected with 401 is taken out of rotation for good.
+    """
+
+    def __init__(self, tokens, max_wait=5, budgets=None):
+        """
+        :param tokens: Bearer tokens (duplicates are ignored).
+        :param max_wait: Longest acquire() sleeps for a slot before raising RateLimitError.
+        :param budgets: Optional RateLimitBudget per token, in the same order.
+        """
+        tokens = list(dict.fromkeys(token for token in tokens if token))
+        if not tokens:
+            raise ValueError("TWITTER_BEARER_TOKEN is not set in the environment")
+        budgets = list(budgets or [])
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.credentials = [Credential(token, budgets[i] if i < len(budgets) else RateLimitBudget(max_wait))
+                            for i, token in enumerate(tokens)]
+
+    @classmethod
+    def from_env(cls, rate_limiter=None, **kwargs):
+        """
+        Builds a pool from TWITTER_BEARER_TOKENS (comma-separated), falling
+        back to the single TWITTER_BEARER_TOKEN.
+        """
+        tokens = [token.strip() for token in os.getenv("TWITTER_BEARER_TOKENS", "").split(",") if token.strip()]
+        if not tokens and os.getenv("TWITTER_BEARER_TOKEN"):
+            tokens = [os.getenv("TWITTER_BEARER_TOKEN")]
+        return cls(tokens, budgets=[rate_limiter] if rate_limiter else None, **kwargs)
+
+    def __len__(self):
+        return len(self.active())
+
+    def active(self):
+        with self.lock:
+            return [credential for credential in self.credentials if not credential.revoked]
+
+    def acquire(self, endpoint, max_wait=None, exclude=()):
+        """
+        Picks the token with the most headroom on `endpoint`, reserves a slot
+        on it (sleeping until the slot if needed) and returns its Credential.
+        Raises RateLimitError, with the earliest reset across the pool, if no
+        token has a slot within `max_wait` seconds.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        candidates = [credential for credential in self.active() if credential not in exclude]
+        ranked = []
+        for credential in candidates:
+            wait, remaining = credential.budget.peek(endpoint)
+            # Unknown budget ranks like a fresh window.
+            ranked.append((wait, -(remaining if remaining is not None else float("inf")), credential.requests,
+                           id(credential), credential))
+        ranked.sort(key=lambda entry: entry[:4])
+        earliest = None
+        for wait, _, _, _, credential in ranked:
+            try:
+                credential.budget.acquire(endpoint, max_wait=max_wait)
+            except RateLimitError as e:
+                earliest = e.reset_at if earliest is None else min(earliest, e.reset_at)
+                continue
+            with self.lock:
+                credential.requests += 1
+            return credential
+        raise RateLimitError(f"Rate limit budget exhausted for {endpoint} on all {len(candidates)} tokens",
+                             endpoint=endpoint, reset_at=earliest)
+
+    def update(self, credential, endpoint, headers):
+        credential.budget.update(endpoint, headers)
+
+    def block_until(self, credential, endpoint, reset_at):
+        credential.budget.block_until(endpoint, reset_at)
+
+    def revoke(self, credential, reason=""):
+        """
+        Takes a rejected token out of rotation. The last active token is kept,
+        so a spurious 401 cannot stop polling for good.
+        """
+        with self.lock:
+            if credential.revoked:
+                return
+            remaining = sum(1 for other in self.credentials if not other.revoked) - 1
+            if remaining == 0:
+                logger.error(f"Bearer token {credential.label} was rejected ({reason}) but is the last one left")
+                return
+            credential.revoked = True
+        logger.error(f"Removed bearer token {credential.label} from rotation ({reason}); {remaining} left")
+
+    def snapshot(self):
+        """
+        Returns {token label: {"revoked", "requests", "endpoints"}} for monitoring.
+        """
+        with self.lock:
+            credentials = list(self.credentials)
+        return {credential.label: {"revoked": credential.revoked, "requests": credential.requests,
+                                   "endpoints": credential.budget.snapshot()}
+                for credential in credentials}
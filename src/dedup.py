@@ -0,0 +1,181 @@
+import os
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys. Memory is set up front from
+    `capacity` and `error_rate` and never grows.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        """
+        :param capacity: Number of keys the filter is sized for.
+        :param error_rate: False positive rate at full capacity.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        # Double hashing: k positions from two independent 64-bit hashes.
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DedupIndex:
+    """
+    Remembers which tweets were already forwarded so the same underlying tweet
+    is delivered once, whichever tracked account surfaced it.
+
+    Recent IDs live in an LRU set of at most `max_recent` entries; with
+    `bloom_capacity` set, every ID also goes into a Bloom filter that covers
+    long history in fixed memory (at the cost of rare false positives).
+    Retweets are keyed by the tweet they retweet, so several accounts
+    retweeting one tweet produce one delivery.
+    """
+
+    def __init__(self, max_recent=100000, bloom_capacity=None, bloom_error_rate=0.001,
+                 collapse_types=("retweeted",), path=None, save_interval=60):
+        """
+        :param max_recent: Maximum IDs kept in the exact LRU set.
+        :param bloom_capacity: Optional Bloom filter size for long history.
+        :param bloom_error_rate: Bloom filter false positive rate at capacity.
+        :param collapse_types: referenced_tweets types keyed by the referenced tweet
+                               (add "quoted" to also collapse quotes).
+        :param path: Optional file to persist the index across restarts.
+        :param save_interval: Minimum seconds between saves from save_if_due().
+        """
+        self.max_recent = max_recent
+        self.collapse_types = tuple(collapse_types)
+        self.path = path
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.recent = OrderedDict()
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self.last_saved = time.time()
+        self.dirty = False
+        if self.path:
+            self.load()
+
+    def canonical_id(self, tweet):
+        for reference in tweet.get("referenced_tweets") or []:
+            if reference.get("type") in self.collapse_types:
+                return reference.get("id")
+        return tweet.get("id")
+
+    def _seen(self, key):
+        if key in self.recent:
+            self.recent.move_to_end(key)
+            return True
+        return self.bloom is not None and key in self.bloom
+
+    def _add(self, key):
+        self.recent[key] = None
+        while len(self.recent) > self.max_recent:
+            self.recent.popitem(last=False)
+        if self.bloom is not None:
+            self.bloom.add(key)
+        self.dirty = True
+
+    def check_and_add(self, tweet):
+        """
+        Returns True and records the tweet if it was not delivered before.
+        Both the tweet's own ID and its canonical ID are recorded.
+        """
+        keys = {str(self.canonical_id(tweet)), str(tweet.get("id"))}
+        with self.lock:
+            if any(self._seen(key) for key in keys):
+                return False
+            for key in keys:
+                self._add(key)
+            return True
+
+    def __contains__(self, tweet_id):
+        with self.lock:
+            return self._seen(str(tweet_id))
+
+    def __len__(self):
+        return len(self.recent)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                recent = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading dedup index from {self.path}: {e}")
+            return
+        with self.lock:
+            for key in recent[-self.max_recent:]:
+                self.recent[key] = None
+            if self.bloom is not None:
+                try:
+                    with open(f"{self.path}.bloom", "rb") as f:
+                        bits = f.read()
+                    if len(bits) == len(self.bloom.bits):
+                        self.bloom.bits = bytearray(bits)
+                    else:
+                        logger.warning("Dedup Bloom filter size changed; starting a new one")
+                        for key in self.recent:
+                            self.bloom.add(key)
+                except FileNotFoundError:
+                    for key in self.recent:
+                        self.bloom.add(key)
+        logger.info(f"Loaded {len(self.recent)} delivered tweet ids from {self.path}")
+
+    def snapshot(self):
+        """
+        Returns the current contents for save(), marking them saved.
+        """
+        with self.lock:
+            self.dirty = False
+            self.last_saved = time.time()
+            return list(self.recent), bytes(self.bloom.bits) if self.bloom is not None else None
+
+    def save(self, snapshot=None):
+        """
+        Atomically writes the LRU set (and Bloom filter bits) to `path`, or
+        a snapshot() taken earlier.
+        """
+        recent, bits = snapshot or self.snapshot()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(recent, f)
+            os.replace(f"{self.path}.tmp", self.path)
+            if bits is not None:
+                with open(f"{self.path}.bloom.tmp", "wb") as f:
+                    f.write(bits)
+                os.replace(f"{self.path}.bloom.tmp", f"{self.path}.bloom")
+        except OSError as e:
+            logger.error(f"Error saving dedup index to {self.path}: {e}")
+
+    def save_due(self):
+        return bool(self.path) and self.dirty and time.time() - self.last_saved >= self.save_interval
+
+    def save_if_due(self):
+        if self.save_due():
+            self.save()
@@ -0,0 +1,279 @@
+import time
+import logging
+import threading
+from collections import deque
+from src.telegram_bot import TelegramRateLimitError
+from src.resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Telegram's message length limit.
+MAX_MESSAGE_LENGTH = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+
+class DeliveryItem:
+    __slots__ = ("text", "chat_id", "on_delivered", "attempts", "media")
+
+    def __init__(self, text, chat_id=None, on_delivered=None, media=None):
+        self.text = text
+        self.chat_id = chat_id
+        self.on_delivered = on_delivered
+        self.attempts = 0
+        self.media = media
+
+
+class DeliveryQueue:
+    """
+    Outbound Telegram dispatcher decoupled from tweet fetching.
+
+    Pollers enqueue() and return immediately; dispatcher threads send messages
+    paced to Telegram's flood limits: a global messages-per-second cap and a
+    minimum gap per chat (longer for groups and channels, whose ids start with
+    '-'). A 429 pauses sending for exactly the `retry_after` Telegram asks for,
+    and an open circuit breaker pauses it until the breaker's next trial.
+    When a chat builds up a backlog, queued messages can be merged into one
+    message up to the 4096 character limit. Messages with media go out
+    through the MediaSender, one tweet per send, and are never merged.
+
+    Each chat has two lanes, text and media, each sending in order with at
+    most one send in flight, so a long upload never holds up a chat's text
+    (a text can overtake an earlier tweet whose media is still uploading).
+    With `media_workers` the media lanes get dispatchers of their own, and
+    uploads to different chats run side by side up to that many.
+    """
+
+    def __init__(self, telegram_bot, global_rate=30, per_chat_interval=1.0, group_interval=3.0,
+                 coalesce=True, coalesce_threshold=5, max_retries=5, num_workers=2, media_sender=None,
+                 media_workers=0):
+        """
+        :param telegram_bot: TelegramBot used to send messages.
+        :param global_rate: Maximum messages per second across all chats.
+        :param per_chat_interval: Minimum seconds between messages to one private chat.
+        :param group_interval: Minimum seconds between messages to one group or channel.
+        :param coalesce: Merge queued messages for a chat once its backlog reaches coalesce_threshold.
+        :param coalesce_threshold: Backlog size per chat that triggers merging.
+        :param max_retries: Attempts per message before it is dropped (429s do not count).
+        :param num_workers: Number of dispatcher threads.
+        :param media_sender: Optional MediaSender for messages queued with media; without
+                             one their text is sent alone.
+        :param media_workers: Extra dispatcher threads that only send media. With none,
+                              every dispatcher sends both.
+        """
+        self.telegram_bot = telegram_bot
+        self.global_interval = 1.0 / global_rate
+        self.per_chat_interval = per_chat_interval
+        self.group_interval = group_interval
+        self.coalesce = coalesce
+        self.coalesce_threshold = coalesce_threshold
+        self.max_retries = max_retries
+        self.num_workers = num_workers
+        self.media_sender = media_sender
+        self.media_workers = media_workers
+        self.condition = threading.Condition()
+        # (chat_id, has_media) lane -> deque of DeliveryItem, in arrival order.
+        self.pending = {}
+        self.depth = 0
+        self.in_flight = set()
+        self.chat_ready_at = {}
+        self.global_ready_at = 0
+        self.workers = []
+        self.media_only = set()
+        self.running = False
+        self.delivered = 0
+        self.dropped = 0
+
+    def enqueue(self, text, chat_id=None, on_delivered=None, media=None):
+        """
+        Queues a message for delivery. `on_delivered` is called with no
+        arguments once Telegram has accepted it. `media` is an optional list
+        of Media sent with the text as caption.
+        """
+        with self.condition:
+            self.pending.setdefault((chat_id, bool(media)), deque()).append(
+                DeliveryItem(text, chat_id, on_delivered, media))
+            self.depth += 1
+            self.condition.notify_all()
+
+    def queue_depth(self):
+        with self.condition:
+            return self.depth
+
+    def queue_depth_by_chat(self):
+        with self.condition:
+            depths = {}
+            for (chat_id, _), items in self.pending.items():
+                if items:
+                    depths[chat_id] = depths.get(chat_id, 0) + len(items)
+            return depths
+
+    def _chat_interval(self, chat_id):
+        return self.group_interval if str(chat_id).startswith("-") else self.per_chat_interval
+
+    def _take(self, now, media=None):
+        """
+        Returns (lane, items, None) for a batch ready to send now, or
+        (None, None, wait) where wait is the seconds until one may be ready
+        (None if nothing is queued). `media` limits it to media (True) or
+        text (False) lanes. Must be called with the condition held.
+        """
+        if now < self.global_ready_at:
+            return None, None, self.global_ready_at - now
+        wait = None
+        for lane, items in self.pending.items():
+            chat_id, has_media = lane
+            if not items or lane in self.in_flight or (media is not None and has_media != media):
+                continue
+            ready_at = self.chat_ready_at.get(chat_id, 0)
+            if ready_at > now:
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+                continue
+            batch = [items.popleft()]
+            if self.coalesce and not batch[0].media and len(items) + 1 >= self.coalesce_threshold:
+                length = len(batch[0].text)
+                while items and not items[0].media and \
+                        length + len(COALESCE_SEPARATOR) + len(items[0].text) <= MAX_MESSAGE_LENGTH:
+                    length += len(COALESCE_SEPARATOR) + len(items[0].text)
+                    batch.append(items.popleft())
+            self.depth -= len(batch)
+            self.in_flight.add(lane)
+            self.global_ready_at = now + self.global_interval
+            self.chat_ready_at[chat_id] = now + self._chat_interval(chat_id)
+            # Rotate so one busy chat does not starve the others.
+            self.pending[lane] = self.pending.pop(lane)
+            return lane, batch, None
+        return None, None, wait
+
+    def _requeue(self, lane, batch):
+        with self.condition:
+            self.pending.setdefault(lane, deque()).extendleft(reversed(batch))
+            self.depth += len(batch)
+            self.condition.notify_all()
+
+    def _send(self, lane, batch):
+        chat_id = lane[0]
+        text = COALESCE_SEPARATOR.join(item.text for item in batch)
+        try:
+            if batch[0].media and self.media_sender:
+                self.media_sender.send(text, batch[0].media, chat_id=chat_id)
+            elif chat_id is None:
+                self.telegram_bot.send_message(text)
+            else:
+                self.telegram_bot.send_message(text, chat_id=chat_id)
+        except (TelegramRateLimitError, CircuitOpenError) as e:
+            with self.condition:
+                # Flood control applies to the whole bot, not just this chat; an open
+                # circuit means Telegram is down, so wait for its trial call instead
+                # of spending this batch's attempts.
+                self.global_ready_at = max(self.global_ready_at, time.time() + e.retry_after)
+            self._requeue(lane, batch)
+            return
+        except Exception as e:
+            retry = [item for item in batch if item.attempts + 1 < self.max_retries]
+            for item in batch:
+                item.attempts += 1
+            if len(retry) < len(batch):
+                with self.condition:
+                    self.dropped += len(batch) - len(retry)
+                logger.error(f"Dropping {len(batch) - len(retry)} Telegram messages after {self.max_retries} attempts: {e}")
+            if retry:
+                with self.condition:
+                    self.chat_ready_at[chat_id] = time.time() + min(60, 2 ** max(item.attempts for item in retry))
+                self._requeue(lane, retry)
+            return
+        with self.condition:
+            self.delivered += len(batch)
+        if len(batch) > 1:
+            logger.info(f"Delivered {len(batch)} coalesced messages to chat {chat_id}")
+        for item in batch:
+            if item.on_delivered:
+                try:
+                    item.on_delivered()
+                except Exception as e:
+                    logger.error(f"Delivery callback failed: {e}")
+
+    def process_next(self, timeout=None):
+        """
+        Sends the next ready message, waiting up to `timeout` seconds for one.
+        Returns False if nothing was sent.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        thread = threading.current_thread()
+        is_worker = thread in self.workers
+        if thread in self.media_only:
+            media = True
+        elif is_worker and self.media_workers:
+            media = False
+        else:
+            media = None
+        with self.condition:
+            while True:
+                now = time.time()
+                lane, batch, wait = self._take(now, media)
+                if batch is not None:
+                    break
+                if is_worker and not self.running:
+                    return False
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self.condition.wait(wait)
+        try:
+            self._send(lane, batch)
+        finally:
+            with self.condition:
+                self.in_flight.discard(lane)
+                self.condition.notify_all()
+        return True
+
+    def drain(self, timeout=None):
+        """
+        Blocks until every queued message has been delivered or dropped. If no
+        dispatcher threads are running the messages are sent from this thread.
+        Returns False if `timeout` expired first.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self.condition:
+                if self.depth == 0 and not self.in_flight:
+                    return True
+                running = self.running
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            if running:
+                with self.condition:
+                    self.condition.wait(remaining if remaining is not None else 0.1)
+            else:
+                self.process_next(timeout=remaining)
+
+    def _worker(self):
+        while self.running:
+            try:
+                self.process_next()
+            except Exception as e:
+                logger.error(f"Delivery worker error: {e}")
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        for i in range(self.num_workers + self.media_workers):
+            media = i >= self.num_workers
+            worker = threading.Thread(target=self._worker, daemon=True,
+                                      name=f"telegram-{'media' if media else 'delivery'}-{i}")
+            self.workers.append(worker)
+            if media:
+                self.media_only.add(worker)
+            worker.start()
+
+    def stop(self, timeout=5):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+        self.media_only = set()
@@ -0,0 +1,198 @@
+import time
+import random
+import logging
+import threading
+from requests.exceptions import HTTPError
+from src.rate_limiter import RateLimitError
+from src.search_batcher import SearchBatch
+from src.models import Tweet, attach_media, loads, parse_media, parse_users
+
+logger = logging.getLogger(__name__)
+
+# Rule length limit for filtered stream rules on the Basic/Pro tiers.
+MAX_RULE_LENGTH = 512
+# Tag marking the rules this app manages, so rules added by hand are left alone.
+RULE_TAG = "x-tweet-fetch"
+
+
+class StreamUnavailableError(Exception):
+    """
+    Raised when the filtered stream cannot be used with our credentials (e.g.
+    the API tier does not include it), so callers should fall back to polling.
+    """
+
+
+def build_rules(usernames, max_rule_length=MAX_RULE_LENGTH):
+    """
+    Packs usernames into as few `from:a OR from:b` rule values as fit the rule length limit.
+    """
+    rules = []
+    batch = SearchBatch(None)
+    for username in sorted({username.lstrip('@') for username in usernames}, key=str.lower):
+        if batch.usernames and not batch.fits(username, max_rule_length):
+            rules.append(batch.query)
+            batch = SearchBatch(None)
+        batch.add(username)
+    if batch.usernames:
+        rules.append(batch.query)
+    return rules
+
+
+class FilteredStream:
+    """
+    Push-based ingestion over the v2 filtered stream.
+
+    Rules are synced from the tracked usernames, the chunked newline-delimited
+    JSON body is parsed incrementally as it arrives, and each matching tweet is
+    handed to `on_tweet(username, tweet)`. Twitter writes a blank keep-alive
+    line every ~20 seconds; a connection silent for longer than
+    `heartbeat_timeout` is treated as stalled and reopened. Reconnects use
+    jittered exponential backoff. A 401/403 raises StreamUnavailableError.
+    """
+
+    def __init__(self, twitter_client, on_tweet, heartbeat_timeout=30, max_rule_length=MAX_RULE_LENGTH,
+                 on_connect=None):
+        """
+        :param twitter_client: TwitterClient used for rules and the stream connection.
+        :param on_tweet: Callable(username, tweet) for every tweet received.
+        :param heartbeat_timeout: Seconds of silence after which the connection is considered dead.
+        :param max_rule_length: Maximum length of a single rule value.
+        :param on_connect: Optional callable(reconnect) invoked after every successful connect.
+        """
+        self.twitter_client = twitter_client
+        self.on_tweet = on_tweet
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_rule_length = max_rule_length
+        self.on_connect = on_connect
+        self.stop_event = threading.Event()
+        self.response = None
+        self.connections = 0
+        self.last_heartbeat = None
+        # Lowercased username -> spelling used by the caller.
+        self.spelling = {}
+
+    def sync_rules(self, usernames):
+        """
+        Makes the installed rules tagged RULE_TAG match `usernames`, touching only the difference.
+        """
+        self.spelling = {username.lstrip('@').lower(): username for username in usernames}
+        wanted = set(build_rules(usernames, self.max_rule_length))
+        installed = [rule for rule in self.twitter_client.get_stream_rules() if rule.get("tag") == RULE_TAG]
+        stale = [rule["id"] for rule in installed if rule["value"] not in wanted]
+        missing = wanted - {rule["value"] for rule in installed}
+        if stale or missing:
+            self.twitter_client.update_stream_rules(
+                add=[{"value": value, "tag": RULE_TAG} for value in sorted(missing)],
+                delete_ids=stale
+            )
+            logger.info(f"Synced stream rules: {len(missing)} added, {len(stale)} removed")
+        return sorted(wanted)
+
+    def iter_lines(self, chunks):
+        """
+        Splits a stream of byte chunks into lines as they arrive. Blank lines
+        are keep-alive heartbeats and are yielded as b"".
+        """
+        buffer = b""
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                yield line.strip(b"\r")
+
+    def handle_line(self, line):
+        self.last_heartbeat = time.time()
+        if not line:
+            return
+        try:
+            message = loads(line)
+        except ValueError:
+            logger.error(f"Skipping malformed stream line: {line[:200]!r}")
+            return
+        if not message.get("data"):
+            if message.get("errors"):
+                logger.error(f"Stream error: {message['errors']}")
+            return
+        tweet = attach_media(Tweet.from_dict(message["data"]), parse_media(message))
+        author = parse_users(message).get(tweet.author_id)
+        if author is None:
+            logger.warning(f"Stream tweet {tweet.id} has no author expansion; skipping")
+            return
+        try:
+            self.on_tweet(self.spelling.get(author.username.lower(), author.username), tweet)
+        except Exception as e:
+            logger.error(f"Error handling stream tweet {tweet.id}: {e}")
+
+    def consume(self):
+        """
+        Opens one stream connection and processes it until it ends or stalls.
+        """
+        response = self.twitter_client.open_filtered_stream(read_timeout=self.heartbeat_timeout)
+        self.response = response
+        self.connections += 1
+        if self.on_connect:
+            self.on_connect(self.connections > 1)
+        try:
+            for line in self.iter_lines(response.iter_content(chunk_size=None)):
+                if self.stop_event.is_set():
+                    break
+                self.handle_line(line)
+        finally:
+            response.close()
+            self.response = None
+
+    def backoff_delay(self, error, attempt):
+        """
+        Seconds to wait before reconnect `attempt`, with full jitter.
+        """
+        if isinstance(error, RateLimitError):
+            base, cap = max(60, error.retry_after), 960
+        elif isinstance(error, HTTPError):
+            base, cap = 5, 320
+        else:
+            base, cap = 0.25, 16
+        delay = min(cap, base * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def run(self, usernames):
+        """
+        Syncs rules and consumes the stream until stop() is called, reconnecting as needed.
+        """
+        self.stop_event.clear()
+        attempt = 0
+        synced = False
+        while not self.stop_event.is_set():
+            try:
+                if not synced:
+                    self.sync_rules(usernames)
+                    synced = True
+                started = time.time()
+                self.consume()
+                # A connection that stayed up for a while resets the backoff.
+                attempt = 0 if time.time() - started > 60 else attempt + 1
+                error = None
+            except (HTTPError, RateLimitError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status in (401, 403):
+                    raise StreamUnavailableError(f"Filtered stream unavailable (HTTP {status})") from e
+                error = e
+                attempt += 1
+            except Exception as e:
+                if self.stop_event.is_set():
+                    # Closing the response from stop() interrupts the read.
+                    break
+                error = e
+                attempt += 1
+            if self.stop_event.is_set():
+                break
+            delay = self.backoff_delay(error, attempt - 1) if attempt else 0
+            logger.warning(f"Stream disconnected ({error or 'closed by server'}); reconnecting in {delay:.1f}s")
+            self.stop_event.wait(delay)
+
+    def stop(self):
+        self.stop_event.set()
+        response = self.response
+        if response is not None:
+            response.close()
@@ -0,0 +1,146 @@
+import os
+import uuid
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+from urllib3.util.retry import Retry
+from src.resilience import current_deadline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10
+
+
+class DeadlineAwareAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that makes a single attempt while a Deadline is applied to
+    the calling thread: each retry would wait the (already shortened)
+    timeout again and overrun the deadline, and the caller retries on its
+    next poll anyway. A read timeout then surfaces as ReadTimeout.
+    """
+
+    @property
+    def max_retries(self):
+        if current_deadline() is None:
+            return self._max_retries
+        return self._max_retries.new(total=0, read=False)
+
+    @max_retries.setter
+    def max_retries(self, retries):
+        self._max_retries = retries
+
+
+class HttpTransport:
+    """
+    Shared HTTP transport backed by a single requests.Session.
+
+    The session keeps a keep-alive connection pool per host, so repeated calls
+    to api.twitter.com and api.telegram.org reuse TCP+TLS connections instead
+    of paying a new handshake on every request. Connection errors and 502/503/504
+    responses are retried at the transport level, except under a Deadline (see
+    DeadlineAwareAdapter); 429s are left to the callers, which know how to back off.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=100, timeout=DEFAULT_TIMEOUT,
+                 max_retries=3, backoff_factor=0.3):
+        """
+        :param pool_connections: Number of per-host pools to keep.
+        :param pool_maxsize: Maximum connections kept alive per host.
+        :param timeout: Default timeout in seconds when a call does not pass one.
+        :param max_retries: Transport-level retries for connection errors and 5xx gateway errors.
+        :param backoff_factor: Exponential backoff factor between retries.
+        """
+        self.timeout = timeout
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            # Only idempotent requests are retried after the request was sent.
+            allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+        adapter = DeadlineAwareAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            reason = e.args[0] if e.args else None
+            if isinstance(reason, MaxRetryError) and isinstance(reason.reason, ReadTimeoutError):
+                # Read timeouts that used up the retries are still timeouts.
+                raise requests.exceptions.ReadTimeout(e, request=e.request, response=e.response) from e
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def multipart_stream(fields, files, boundary=None):
+    """
+    Encodes a multipart/form-data body lazily. `fields` maps names to string
+    values; `files` is a list of (name, filename, content_type, chunks) where
+    `chunks` is an iterable of bytes, consumed only when the body reaches
+    that part. Returns (content_type, body iterator); passed as `data`,
+    requests sends it with chunked encoding, one chunk in memory at a time.
+    """
+    boundary = boundary or uuid.uuid4().hex
+
+    def body():
+        for name, value in fields.items():
+            yield (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                   f"{value}\r\n").encode()
+        for name, filename, content_type, chunks in files:
+            yield (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; "
+                   f"filename=\"{filename}\"\r\nContent-Type: {content_type}\r\n\r\n").encode()
+            yield from chunks
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
+
+    return f"multipart/form-data; boundary={boundary}", body()
+
+
+_shared_transport = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_transport():
+    """
+    Returns the process-wide transport used by TwitterClient and TelegramBot
+    when no explicit transport is passed. Pool size, timeout and retries can be
+    tuned with HTTP_POOL_MAXSIZE, HTTP_TIMEOUT and HTTP_MAX_RETRIES.
+    """
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = HttpTransport(
+                pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "100")),
+                timeout=float(os.getenv("HTTP_TIMEOUT", str(DEFAULT_TIMEOUT))),
+                max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+            )
+        return _shared_transport
+
+
+def set_shared_transport(transport):
+    """
+    Replaces the process-wide transport, e.g. to change pool sizes or timeouts.
+    """
+    global _shared_transport
+    with _shared_lock:
+        _shared_transport = transport
@@ -1,39 +1,37 @@
-import os
 import json
 import time
-import requests
 import logging
+import threading
 from requests.exceptions import RequestException
-from dotenv import load_dotenv
+from config.settings import get_settings
+from src.http_transport import get_shared_transport
+from src.rate_limiter import RateLimitBudget, RateLimitError, parse_rate_limit_headers
+from src.adaptive_polling import AdaptivePollPolicy
+from src.checkpoint_store import CheckpointStore
 
-# Determine current directory (src) and project root (one directory up)
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, ".."))
-
-# Build path to .env file in the config folder and load it
-env_path = os.path.join(project_root, "config", ".env")
-load_dotenv(dotenv_path=env_path)
-print("Loaded .env from:", env_path)
-
-# Setup logging configuration.
-logging.basicConfig(
-    level=os.getenv("LOG_LEVEL", "INFO"),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
-# Retrieve credentials and settings from .env.
-TWITTER_BEARER_TOKEN = os.getenv("TWITTER_BEARER_TOKEN")
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-TARGET_USER = os.getenv("TARGET_USER")
+# Filled in from the settings by configure(); importing this module has no side effects.
+TWITTER_BEARER_TOKEN = None
+TELEGRAM_BOT_TOKEN = None
+TELEGRAM_CHAT_ID = None
+TARGET_USER = None
+# Optional SQLite file keeping last_tweet_id across restarts.
+CHECKPOINT_PATH = None
+# API base URLs, overridable to point at local fakes (see benchmarks/).
+TWITTER_API_URL = "https://api.twitter.com/2"
+TELEGRAM_API_URL = "https://api.telegram.org"
 
-if not TWITTER_BEARER_TOKEN:
-    raise ValueError("TWITTER_BEARER_TOKEN is not set in the environment")
-if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-    raise ValueError("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID is not set in the environment")
-if not TARGET_USER:
-    raise ValueError("TARGET_USER is not set in the environment")
+# Paces search requests using the budget reported in the response headers.
+rate_limiter = RateLimitBudget()
+# Time before which the search endpoint must not be called again.
+rate_limited_until = 0
+# Polls often while the target user is active and backs off to a minute when idle.
+poll_policy = AdaptivePollPolicy(min_interval=3, max_interval=60)
+# Set up by run().
+headers = None
+checkpoint_store = None
+last_tweet_id = None
 
 def create_headers(bearer_token):
     return {"Authorization": f"Bearer {bearer_token}"}
@@ -43,14 +41,22 @@ def poll_recent_tweets(headers, query, since_id=None):
     Polls the Twitter API v2 recent search endpoint for tweets matching the query.
     Uses max_results=10 (the minimum allowed).
     """
-    search_url = "https://api.twitter.com/2/tweets/search/recent"
+    search_url = f"{TWITTER_API_URL}/tweets/search/recent"
     params = {
         "query": query,
         "max_results": "10"
     }
     if since_id:
         params["since_id"] = since_id
-    response = requests.get(search_url, headers=headers, params=params, timeout=10)
+    rate_limiter.acquire("tweets/search/recent")
+    response = get_shared_transport().get(search_url, headers=headers, params=params)
+    rate_limiter.update("tweets/search/recent", response.headers)
+    if response.status_code == 429:
+        _, _, reset_at = parse_rate_limit_headers(response.headers)
+        error = RateLimitError("Cannot get recent tweets (HTTP 429)", endpoint="tweets/search/recent",
+                               reset_at=reset_at)
+        rate_limiter.block_until("tweets/search/recent", error.reset_at)
+        raise error
     if response.status_code != 200:
         raise Exception(f"Cannot get recent tweets (HTTP {response.status_code}): {response.text}")
     return response.json()
@@ -59,10 +65,10 @@ def send_message_to_telegram(message):
     """
     Sends a message to your Telegram chat using the Bot API.
     """
-    api_url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    api_url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {"chat_id": TELEGRAM_CHAT_ID, "text": message}
     try:
-        response = requests.post(api_url, data=payload, timeout=10)
+        response = get_shared_transport().post(api_url, data=payload)
         response.raise_for_status()
         logger.info("Message sent to Telegram successfully.")
         return response.json()
@@ -76,11 +82,13 @@ def process_recent_tweets():
     Returns True if at least one new tweet is processed; otherwise False.
     Implements handling for rate-limit errors.
     """
-    global last_tweet_id
+    global last_tweet_id, rate_limited_until
     query = f"from:{TARGET_USER}"
     try:
         data = poll_recent_tweets(headers, query, since_id=last_tweet_id)
         tweets = data.get("data", [])
+        if last_tweet_id is not None:
+            poll_policy.observe(TARGET_USER, len(tweets))
         if tweets:
             # Twitter returns tweets in reverse chronological order.
             # Reverse to process oldest first.
@@ -89,42 +97,62 @@ def process_recent_tweets():
                 tweet_id = tweet.get("id")
                 tweet_text = tweet.get("text")
                 message = f"New tweet from @{TARGET_USER}: {tweet_text}"
-                send_message_to_telegram(message)
+                if send_message_to_telegram(message) is None:
+                    # Keep the watermark before this tweet so it is retried next poll.
+                    break
                 logger.info(f"Processed tweet id {tweet_id}")
                 last_tweet_id = tweet_id
+            if checkpoint_store and last_tweet_id:
+                checkpoint_store.stage_watermark(TARGET_USER, last_tweet_id)
+                checkpoint_store.flush()
             return True
         else:
             logger.info("No new tweets found.")
             return False
+    except RateLimitError as e:
+        # The main loop waits until the window resets instead of a fixed sleep here.
+        rate_limited_until = e.reset_at
+        logger.error(f"Rate limit hit (HTTP 429). Resuming in {e.retry_after:.0f} seconds.")
+        return False
     except Exception as e:
-        err_str = str(e)
-        if "HTTP 429" in err_str:
-            logger.error("Rate limit hit (HTTP 429). Sleeping for 30 seconds.")
-            time.sleep(30)
-            return False
-        else:
-            logger.error(f"Error polling tweets: {e}")
-            return False
+        logger.error(f"Error polling tweets: {e}")
+        return False
 
-if __name__ == "__main__":
+def configure(settings):
+    """
+    Validates `settings` for single-user mode and applies them to this module.
+    """
+    global TWITTER_BEARER_TOKEN, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, TARGET_USER, CHECKPOINT_PATH
+    global TWITTER_API_URL, TELEGRAM_API_URL
+    settings.require("twitter", "telegram", "target_user")
+    TWITTER_BEARER_TOKEN = settings.twitter_bearer_tokens[0]
+    TELEGRAM_BOT_TOKEN = settings.telegram_bot_token
+    TELEGRAM_CHAT_ID = settings.telegram_chat_id
+    TARGET_USER = settings.target_user
+    CHECKPOINT_PATH = settings.checkpoint_path
+    TWITTER_API_URL = (settings.twitter_api_url or TWITTER_API_URL).rstrip("/")
+    TELEGRAM_API_URL = (settings.telegram_api_url or TELEGRAM_API_URL).rstrip("/")
+
+def run(stop_event=None, settings=None):
+    """
+    Polls for new tweets from TARGET_USER until `stop_event` is set (forever by default).
+    """
+    global headers, checkpoint_store, last_tweet_id
+    configure(settings or get_settings())
+    stop_event = stop_event or threading.Event()
     headers = create_headers(TWITTER_BEARER_TOKEN)
-    last_tweet_id = None  # Cache for the last processed tweet ID
+    checkpoint_store = CheckpointStore(CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+    # Cache for the last processed tweet ID, resumed from the checkpoint if there is one.
+    last_tweet_id = checkpoint_store.load_watermarks().get(TARGET_USER) if checkpoint_store else None
     logger.info(f"Starting to poll tweets from @{TARGET_USER}...")
 
-    # Adaptive polling configuration.
-    base_interval = 3      # Base interval when tweets are found.
-    additional_delay = 0   # Extra delay added if no tweets are found.
-    max_interval = 60      # Maximum interval (in seconds).
+    while not stop_event.is_set():
+        process_recent_tweets()
+        sleep_interval = poll_policy.interval(TARGET_USER)
+        sleep_interval = max(sleep_interval, rate_limited_until - time.time())
+        logger.info(f"Sleeping for {sleep_interval:.0f} seconds before next poll.")
+        stop_event.wait(sleep_interval)
 
-    while True:
-        found_new = process_recent_tweets()
-        if found_new:
-            # Reset delay if new tweet(s) found.
-            additional_delay = 0
-            sleep_interval = base_interval
-        else:
-            # Increase delay by 10 seconds, up to max_interval.
-            additional_delay = min(additional_delay + 30, max_interval - base_interval)
-            sleep_interval = base_interval + additional_delay
-        logger.info(f"Sleeping for {sleep_interval} seconds before next poll.")
-        time.sleep(sleep_interval)
+if __name__ == "__main__":
+    from src.cli import main
+    main(["single"])
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from requests.exceptions import RequestException
+from src.http_transport import get_shared_transport
+
+logger = logging.getLogger(__name__)
+
+# Bot API limits: media per album, caption length and upload sizes.
+MAX_GROUP_SIZE = 10
+MAX_CAPTION_LENGTH = 1024
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Twitter media type -> (single-media method, its field, album type).
+SEND_METHODS = {
+    "photo": ("sendPhoto", "photo", "photo"),
+    "video": ("sendVideo", "video", "video"),
+    # Albums cannot hold animations, so GIFs go in them as (silent) videos.
+    "animated_gif": ("sendAnimation", "animation", "video"),
+}
+
+
+class MediaTooLargeError(Exception):
+    pass
+
+
+class BandwidthLimiter:
+    """
+    Token bucket in bytes shared by every transfer. consume() reserves bytes
+    and sleeps until the reservation is covered, so concurrent transfers
+    together stay under `bytes_per_second` and are served in arrival order.
+    """
+
+    def __init__(self, bytes_per_second, burst=None):
+        """
+        :param bytes_per_second: Sustained cap across all transfers.
+        :param burst: Bytes that may go out at once after an idle period (default one second's worth).
+        """
+        self.rate = float(bytes_per_second)
+        self.burst = float(burst if burst is not None else bytes_per_second)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FileIdCache:
+    """
+    LRU map of Twitter media_key -> Telegram file_id. A file_id can be sent
+    again to any chat without uploading the file, so media forwarded once
+    (a retweet, a quote, the same account in several chats) is uploaded once.
+    When `path` is set the cache is persisted as JSON.
+    """
+
+    def __init__(self, max_size=10000, path=None, save_interval=60):
+        """
+        :param max_size: Entries kept before the least recently used are evicted.
+        :param path: Optional JSON file used to persist the cache.
+        :param save_interval: Minimum seconds between saves from save_if_due().
+        """
+        self.max_size = max_size
+        self.path = path
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.dirty = False
+        self.last_saved = time.time()
+        if self.path:
+            self.load()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def get(self, media_key):
+        with self.lock:
+            file_id = self.entries.get(media_key)
+            if file_id is not None:
+                self.entries.move_to_end(media_key)
+            return file_id
+
+    def put(self, media_key, file_id):
+        with self.lock:
+            self.entries[media_key] = file_id
+            self.entries.move_to_end(media_key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading file_id cache from {self.path}: {e}")
+            return
+        with self.lock:
+            self.entries.update(entries)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        logger.info(f"Loaded {len(entries)} cached Telegram file_ids from {self.path}")
+
+    def save(self):
+        """
+        Atomically writes the cache to `path`.
+        """
+        with self.lock:
+            entries = dict(self.entries)
+            self.dirty = False
+            self.last_saved = time.time()
+        tmp_path = f"{self.path}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Error saving file_id cache to {self.path}: {e}")
+
+    def save_if_due(self):
+        if self.path and self.dirty and time.time() - self.last_saved >= self.save_interval:
+            self.save()
+
+
+class MediaSender:
+    """
+    Forwards a tweet's photos and videos to Telegram as one album (or a
+    single photo/video/animation) captioned with the message text.
+
+    Media already sent once goes by its cached Telegram file_id. Everything
+    else is streamed: each download is opened first (so a missing or
+    oversized file is dropped before anything is uploaded) and its body is
+    then relayed chunk by chunk into a chunked multipart upload, so memory
+    per transfer stays around one chunk whatever the video size. Relayed
+    bytes are paced by an optional BandwidthLimiter shared by all transfers,
+    and at most `max_concurrent` transfers run at once.
+    """
+
+    def __init__(self, telegram_bot, transport=None, file_ids=None, bandwidth=None, max_concurrent=4,
+                 chunk_size=CHUNK_SIZE, download_timeout=(10, 60)):
+        """
+        :param telegram_bot: TelegramBot used to send.
+        :param transport: HTTP transport for downloads; defaults to the shared pooled transport.
+        :param file_ids: FileIdCache; by default an in-memory one.
+        :param bandwidth: Optional cap in bytes per second across all transfers.
+        :param max_concurrent: Maximum transfers in progress at once.
+        :param chunk_size: Bytes relayed per chunk.
+        :param download_timeout: (connect, read) timeout for media downloads.
+        """
+        self.telegram_bot = telegram_bot
+        self.transport = transport or get_shared_transport()
+        self.file_ids = file_ids if file_ids is not None else FileIdCache()
+        self.limiter = BandwidthLimiter(bandwidth) if bandwidth else None
+        self.slots = threading.Semaphore(max_concurrent)
+        self.chunk_size = chunk_size
+        self.download_timeout = download_timeout
+        self.uploads = 0
+        self.reused = 0
+        self.bytes_relayed = 0
+        self.stats_lock = threading.Lock()
+
+    def open_download(self, media):
+        """
+        Starts downloading `media` and returns the streaming response, or None
+        if it cannot be fetched or is over the Bot API upload limit.
+        """
+        url = media.download_url
+        if not url:
+            logger.warning(f"No downloadable URL for {media.type} {media.media_key}")
+            return None
+        limit = MAX_PHOTO_BYTES if media.type == "photo" else MAX_UPLOAD_BYTES
+        try:
+            response = self.transport.get(url, stream=True, timeout=self.download_timeout)
+        except RequestException as e:
+            logger.error(f"Error downloading {media.type} {media.media_key}: {e}")
+            return None
+        if not response.ok:
+            logger.error(f"Error downloading {media.type} {media.media_key}: HTTP {response.status_code}")
+            response.close()
+            return None
+        size = int(response.headers.get("Content-Length") or 0)
+        if size > limit:
+            logger.warning(f"Skipping {media.type} {media.media_key}: {size} bytes is over the {limit} byte limit")
+            response.close()
+            return None
+        return response
+
+    def relay(self, media, response):
+        """
+        Yields the download body in chunks, paced by the bandwidth cap.
+        """
+        limit = MAX_PHOTO_BYTES if media.type == "photo" else MAX_UPLOAD_BYTES
+        relayed = 0
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            if not chunk:
+                continue
+            relayed += len(chunk)
+            if relayed > limit:
+                # No Content-Length up front; abort rather than send an upload Telegram rejects.
+                raise MediaTooLargeError(f"{media.type} {media.media_key} is over the {limit} byte limit")
+            if self.limiter:
+                self.limiter.consume(len(chunk))
+            yield chunk
+        with self.stats_lock:
+            self.bytes_relayed += relayed
+
+    def send(self, text, media, chat_id=None):
+        """
+        Sends `media` (Media objects, at most one album's worth) captioned
+        with `text`. Media that cannot be fetched is left out; if none is
+        left the text goes as a plain message.
+        """
+        caption = text if len(text) <= MAX_CAPTION_LENGTH else text[:MAX_CAPTION_LENGTH - 1] + "…"
+        with self.slots:
+            items, files, responses = [], [], []
+            try:
+                for item in media[:MAX_GROUP_SIZE]:
+                    if item.type not in SEND_METHODS:
+                        continue
+                    file_id = self.file_ids.get(item.media_key)
+                    if file_id:
+                        items.append((item, file_id))
+                        continue
+                    response = self.open_download(item)
+                    if response is None:
+                        continue
+                    responses.append(response)
+                    name = f"file{len(files)}"
+                    content_type = response.headers.get("Content-Type") or (
+                        "image/jpeg" if item.type == "photo" else "video/mp4")
+                    extension = "jpg" if item.type == "photo" else "mp4"
+                    files.append((name, f"{item.media_key}.{extension}", content_type, self.relay(item, response)))
+                    items.append((item, f"attach://{name}"))
+                if not items:
+                    return self.telegram_bot.send_message(text, chat_id=chat_id)
+                try:
+                    result = self._send_items(items, caption, files, chat_id)
+                except MediaTooLargeError as e:
+                    # Retrying would fail the same way; the text links to the tweet's media anyway.
+                    logger.warning(f"{e}; sending the text alone")
+                    return self.telegram_bot.send_message(text, chat_id=chat_id)
+            finally:
+                for response in responses:
+                    response.close()
+        self._remember(items, result)
+        with self.stats_lock:
+            self.uploads += len(files)
+            self.reused += len(items) - len(files)
+        self.file_ids.save_if_due()
+        return result
+
+    def _send_items(self, items, caption, files, chat_id):
+        if len(items) == 1:
+            item, reference = items[0]
+            method, field, _ = SEND_METHODS[item.type]
+            return self.telegram_bot.send_media(method, {field: reference, "caption": caption}, files=files,
+                                                chat_id=chat_id)
+        album = []
+        for index, (item, reference) in enumerate(items):
+            entry = {"type": SEND_METHODS[item.type][2], "media": reference}
+            if index == 0:
+                entry["caption"] = caption
+            album.append(entry)
+        return self.telegram_bot.send_media("sendMediaGroup", {"media": json.dumps(album)}, files=files,
+                                            chat_id=chat_id)
+
+    def _remember(self, items, result):
+        """
+        Caches the file_id Telegram assigned to each newly uploaded item.
+        """
+        messages = (result or {}).get("result")
+        if isinstance(messages, dict):
+            messages = [messages]
+        for (item, reference), message in zip(items, messages or []):
+            if not reference.startswith("attach://"):
+                continue
+            file_id = extract_file_id(message)
+            if file_id:
+                self.file_ids.put(item.media_key, file_id)
+
+
+def extract_file_id(message):
+    """
+    Returns the file_id of the photo, video or animation in a sent Message.
+    """
+    if message.get("photo"):
+        # Sizes are listed smallest first; the largest is the original.
+        return message["photo"][-1].get("file_id")
+    for key in ("video", "animation", "document"):
+        if message.get(key):
+            return message[key].get("file_id")
+    return None
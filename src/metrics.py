@@ -0,0 +1,298 @@
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.models import Tweet, parse_created_at
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers fast API calls up to tweets delivered minutes late.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Base for metrics whose samples live in per-thread shards.
+
+    Every thread writes only to its own dict, so recording never takes a
+    lock; a scrape sums the shards. Shards of threads that have exited are
+    folded into `retired`, on every scrape and whenever a new thread starts
+    recording, so short-lived workers do not accumulate even when nothing
+    scrapes.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.local = threading.local()
+        self.shards = []
+        self.retired = {}
+        self.shards_lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _shard(self):
+        try:
+            return self.local.values
+        except AttributeError:
+            values = self.local.values = {}
+            with self.shards_lock:
+                self._prune()
+                self.shards.append((threading.current_thread(), values))
+            return values
+
+    def _prune(self):
+        # Must be called with shards_lock held.
+        live = []
+        for thread, values in self.shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                # The thread is gone, so nothing writes to this shard any more.
+                self._merge(self.retired, values)
+        self.shards = live
+
+    def _merge(self, total, values):
+        raise NotImplementedError
+
+    def _snapshot(self):
+        """
+        Returns {label values: sample} summed over all threads.
+        """
+        with self.shards_lock:
+            self._prune()
+            total = {}
+            self._merge(total, self.retired)
+            for _, values in self.shards:
+                self._merge(total, dict(values))
+        return total
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, sample in sorted(self._snapshot().items()):
+            lines.extend(self._render_sample(key, sample))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        values = self._shard()
+        key = self._key(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._snapshot().get(self._key(labels), 0)
+
+    def _merge(self, total, values):
+        for key, value in list(values.items()):
+            total[key] = total.get(key, 0) + value
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        values = self._shard()
+        key = self._key(labels)
+        # Per-bucket counts (non-cumulative, last one is +Inf), then sum and count.
+        sample = values.get(key)
+        if sample is None:
+            sample = values[key] = [0] * (len(self.buckets) + 3)
+        sample[bisect.bisect_left(self.buckets, value)] += 1
+        sample[-2] += value
+        sample[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the wall-clock duration of the `with` block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        sample = self._snapshot().get(self._key(labels))
+        return sample[-1] if sample else 0
+
+    def _merge(self, total, values):
+        for key, sample in list(values.items()):
+            sample = list(sample)
+            if key in total:
+                total[key] = [a + b for a, b in zip(total[key], sample)]
+            else:
+                total[key] = sample
+
+    def _render_sample(self, key, sample):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), sample):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(float(sample[-2]))}")
+        lines.append(f"{self.name}_count{labels} {sample[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "xtf_request_duration_seconds", "Latency of Twitter and Telegram API requests.", ("service", "endpoint"))
+REQUESTS_TOTAL = REGISTRY.counter(
+    "xtf_requests_total", "API requests by response status code.", ("service", "endpoint", "status"))
+REQUEST_ERRORS_TOTAL = REGISTRY.counter(
+    "xtf_request_errors_total", "Failed API requests by status code ('error' when no response arrived).",
+    ("service", "endpoint", "status"))
+RATE_LIMIT_BACKOFFS_TOTAL = REGISTRY.counter(
+    "xtf_rate_limit_backoffs_total", "Times an account (or search batch) backed off after a 429.", ("account",))
+POLL_SECONDS = REGISTRY.histogram(
+    "xtf_poll_duration_seconds", "Duration of one poll cycle.", ("mode",))
+DELIVERY_LAG_SECONDS = REGISTRY.histogram(
+    "xtf_delivery_lag_seconds", "Time from a tweet's created_at to its delivery to Telegram.", ("account",))
+HEDGED_REQUESTS_TOTAL = REGISTRY.counter(
+    "xtf_hedged_requests_total", "Second requests sent because the first was slower than the p95.", ("endpoint",))
+CIRCUIT_TRANSITIONS_TOTAL = REGISTRY.counter(
+    "xtf_circuit_transitions_total", "Circuit breaker state changes.", ("service", "endpoint", "state"))
+
+
+def record_request(service, endpoint, status, seconds):
+    """
+    Records one API call; `status` is the HTTP status code, or None when no response arrived.
+    """
+    REQUEST_SECONDS.observe(seconds, service=service, endpoint=endpoint)
+    status = "error" if status is None else str(status)
+    REQUESTS_TOTAL.inc(service=service, endpoint=endpoint, status=status)
+    if status == "error" or int(status) >= 400:
+        REQUEST_ERRORS_TOTAL.inc(service=service, endpoint=endpoint, status=status)
+
+
+def observe_delivery_lag(account, tweet, now=None):
+    if isinstance(tweet, Tweet):
+        created_at = tweet.created_timestamp
+    else:
+        created_at = parse_created_at(tweet.get("created_at"))
+    if created_at is not None:
+        now = time.time() if now is None else now
+        DELIVERY_LAG_SECONDS.observe(max(0.0, now - created_at), account=account)
+
+
+class MetricsServer:
+    """
+    Serves the registry at /metrics from a daemon thread.
+    """
+
+    def __init__(self, registry=REGISTRY, host="0.0.0.0", port=8000):
+        """
+        :param registry: MetricsRegistry to expose.
+        :param host: Interface to bind.
+        :param port: Port to listen on; 0 picks a free one.
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def _handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        logger.info(f"Serving metrics on {self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,230 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+try:
+    # orjson decodes API responses several times faster when it is installed.
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+except ImportError:
+    orjson = None
+
+    def loads(data):
+        return json.loads(data)
+
+# Only what the formatter, dedup and lag metrics read; everything else stays off the wire.
+TWEET_FIELDS = "created_at,referenced_tweets"
+USER_FIELDS = "username"
+# Requested on top of the above only when media is forwarded.
+MEDIA_TWEET_FIELDS = "attachments"
+MEDIA_EXPANSIONS = "attachments.media_keys"
+MEDIA_FIELDS = "type,url,preview_image_url,variants"
+
+
+def parse_created_at(value):
+    """
+    Parses a v2 `created_at` timestamp (e.g. 2024-05-01T12:00:00.000Z) to epoch seconds.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+class Tweet:
+    """
+    Compact tweet with only the fields we request. Optional fields stay in
+    their raw decoded form until first read, and anything else the API sent
+    is kept in `extra`. get() and [] mirror the dict it replaces.
+    """
+    __slots__ = ("id", "text", "author_id", "created_at", "_referenced_tweets", "_created_ts", "extra", "media")
+
+    def __init__(self, id, text="", author_id=None, created_at=None, referenced_tweets=None, extra=None):
+        self.id = id
+        self.text = text
+        self.author_id = author_id
+        self.created_at = created_at
+        self._referenced_tweets = referenced_tweets
+        self._created_ts = None
+        self.extra = extra
+        # Media objects resolved from the response's includes (see parse_tweets).
+        self.media = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        extra = {key: value for key, value in data.items() if key not in _TWEET_KEYS}
+        return cls(data["id"], data.get("text", ""), data.get("author_id"), data.get("created_at"),
+                   data.get("referenced_tweets"), extra or None)
+
+    @property
+    def referenced_tweets(self):
+        return self._referenced_tweets or []
+
+    @property
+    def media_keys(self):
+        return ((self.extra or {}).get("attachments") or {}).get("media_keys") or []
+
+    @property
+    def created_timestamp(self):
+        """
+        created_at as epoch seconds, parsed on first use; None if missing or malformed.
+        """
+        if self._created_ts is None and self.created_at:
+            self._created_ts = parse_created_at(self.created_at)
+            if self._created_ts is None:
+                logger.warning(f"Unparseable created_at {self.created_at!r} on tweet {self.id}")
+        return self._created_ts
+
+    def get(self, key, default=None):
+        if key == "referenced_tweets":
+            return self._referenced_tweets or default
+        if key in _TWEET_KEYS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return (self.extra or {}).get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def to_dict(self):
+        data = {"id": self.id, "text": self.text}
+        if self.author_id is not None:
+            data["author_id"] = self.author_id
+        if self.created_at is not None:
+            data["created_at"] = self.created_at
+        if self._referenced_tweets:
+            data["referenced_tweets"] = self._referenced_tweets
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        if isinstance(other, Tweet):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Tweet(id={self.id!r}, author_id={self.author_id!r}, text={self.text[:40]!r})"
+
+
+class User:
+    __slots__ = ("id", "username", "name")
+
+    def __init__(self, id, username, name=None):
+        self.id = id
+        self.username = username
+        self.name = name
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(data["id"], data["username"], data.get("name"))
+
+    def __repr__(self):
+        return f"User(id={self.id!r}, username={self.username!r})"
+
+
+class Media:
+    """
+    A photo, video or animated GIF from `includes.media`.
+    """
+    __slots__ = ("media_key", "type", "url", "preview_image_url", "variants")
+
+    def __init__(self, media_key, type, url=None, preview_image_url=None, variants=None):
+        self.media_key = media_key
+        self.type = type
+        self.url = url
+        self.preview_image_url = preview_image_url
+        self.variants = variants
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(data["media_key"], data.get("type"), data.get("url"), data.get("preview_image_url"),
+                   data.get("variants"))
+
+    @property
+    def download_url(self):
+        """
+        The photo itself, or the highest bit rate MP4 of a video or GIF.
+        None if the API sent nothing downloadable.
+        """
+        if self.type == "photo":
+            return self.url
+        mp4s = [variant for variant in self.variants or [] if variant.get("content_type") == "video/mp4"]
+        if mp4s:
+            return max(mp4s, key=lambda variant: variant.get("bit_rate") or 0)["url"]
+        return None
+
+    def to_dict(self):
+        data = {"media_key": self.media_key, "type": self.type}
+        for key in ("url", "preview_image_url", "variants"):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        return data
+
+    def __eq__(self, other):
+        if isinstance(other, Media):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Media(media_key={self.media_key!r}, type={self.type!r})"
+
+
+_TWEET_KEYS = frozenset(("id", "text", "author_id", "created_at", "referenced_tweets"))
+_MISSING = object()
+
+
+def parse_tweets(data):
+    """
+    Converts the `data` list of a v2 response to Tweets, attaching any media
+    expanded in `includes.media`.
+    """
+    tweets = [Tweet.from_dict(tweet) for tweet in data.get("data") or []]
+    media = parse_media(data)
+    if media:
+        for tweet in tweets:
+            attach_media(tweet, media)
+    return tweets
+
+
+def attach_media(tweet, media):
+    """
+    Sets `tweet.media` from {media_key: Media}, in attachment order.
+    """
+    found = [media[key] for key in tweet.media_keys if key in media]
+    tweet.media = found or None
+    return tweet
+
+
+def parse_users(data):
+    """
+    Returns {user id: User} from a v2 response's `includes.users`.
+    """
+    return {user["id"]: User.from_dict(user) for user in (data.get("includes") or {}).get("users", [])}
+
+
+def parse_media(data):
+    """
+    Returns {media_key: Media} from a v2 response's `includes.media`.
+    """
+    return {media["media_key"]: Media.from_dict(media) for media in (data.get("includes") or {}).get("media", [])}
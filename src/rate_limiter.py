@@ -0,0 +1,155 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Used when a 429 arrives without an x-rate-limit-reset header.
+DEFAULT_RETRY_AFTER = 30
+
+
+class RateLimitError(Exception):
+    """
+    Raised when an endpoint is rate limited, either by a 429 response or
+    because the local budget would have to wait too long for a free slot.
+    """
+
+    def __init__(self, message, endpoint=None, reset_at=None):
+        super().__init__(message)
+        self.endpoint = endpoint
+        self.reset_at = reset_at if reset_at is not None else time.time() + DEFAULT_RETRY_AFTER
+
+    @property
+    def retry_after(self):
+        return max(0, self.reset_at - time.time())
+
+
+def parse_rate_limit_headers(headers):
+    """
+    Returns (limit, remaining, reset_at) from x-rate-limit-* headers; any of
+    them may be None if missing or malformed.
+    """
+    values = []
+    for name in ("x-rate-limit-limit", "x-rate-limit-remaining", "x-rate-limit-reset"):
+        try:
+            values.append(int(headers.get(name)))
+        except (TypeError, ValueError):
+            values.append(None)
+    return tuple(values)
+
+
+class _Bucket:
+    __slots__ = ("limit", "remaining", "reset_at", "next_slot")
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0
+        self.next_slot = 0
+
+
+class RateLimitBudget:
+    """
+    Per-endpoint request budget driven by the x-rate-limit-remaining and
+    x-rate-limit-reset headers of every response.
+
+    Before each request acquire() reserves a slot: the remaining requests of a
+    window are spread evenly until its reset, so bursts are paced ahead of time
+    instead of running into 429s. When the window is exhausted (or a 429 came
+    back) the next slot is exactly the reset time.
+    """
+
+    def __init__(self, max_wait=5):
+        """
+        :param max_wait: Longest acquire() will sleep for a slot before raising
+                         RateLimitError so the caller can reschedule instead.
+        """
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def _bucket(self, endpoint):
+        bucket = self.buckets.get(endpoint)
+        if bucket is None:
+            bucket = self.buckets[endpoint] = _Bucket()
+        return bucket
+
+    def _slot(self, bucket, now):
+        if bucket.reset_at <= now:
+            return now
+        if bucket.remaining is not None and bucket.remaining <= 0:
+            return bucket.reset_at
+        return max(now, bucket.next_slot)
+
+    def peek(self, endpoint):
+        """
+        Returns (wait, remaining) for `endpoint` without reserving anything:
+        the seconds until the next free slot and the requests left in the
+        window (None if unknown).
+        """
+        with self.lock:
+            bucket = self._bucket(endpoint)
+            now = time.time()
+            remaining = bucket.remaining if bucket.reset_at > now else None
+            return self._slot(bucket, now) - now, remaining
+
+    def acquire(self, endpoint, max_wait=None):
+        """
+        Reserves the next request slot for `endpoint`, sleeping until it is
+        due. Returns the seconds waited. Raises RateLimitError without
+        reserving anything if the slot is more than `max_wait` seconds away.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self.lock:
+            bucket = self._bucket(endpoint)
+            now = time.time()
+            if bucket.reset_at <= now:
+                # Window rolled over (or never seen): the budget is unknown until the next response.
+                bucket.remaining = None
+            slot = self._slot(bucket, now)
+            wait = slot - now
+            if wait > max_wait:
+                raise RateLimitError(f"Rate limit budget exhausted for {endpoint}",
+                                     endpoint=endpoint, reset_at=slot)
+            if bucket.remaining is not None and bucket.remaining > 0 and bucket.reset_at > slot:
+                gap = (bucket.reset_at - slot) / bucket.remaining
+                bucket.remaining -= 1
+            else:
+                gap = 0
+            bucket.next_slot = slot + gap
+        if wait > 0:
+            time.sleep(wait)
+        return max(0, wait)
+
+    def update(self, endpoint, headers):
+        """
+        Records the budget reported by a response's rate-limit headers.
+        """
+        limit, remaining, reset_at = parse_rate_limit_headers(headers)
+        if remaining is None or reset_at is None:
+            return
+        with self.lock:
+            bucket = self._bucket(endpoint)
+            bucket.limit = limit
+            if reset_at != bucket.reset_at or bucket.remaining is None or remaining < bucket.remaining:
+                bucket.remaining = remaining
+            bucket.reset_at = reset_at
+
+    def block_until(self, endpoint, reset_at):
+        """
+        Marks `endpoint` exhausted until `reset_at`, e.g. after a 429.
+        """
+        with self.lock:
+            bucket = self._bucket(endpoint)
+            bucket.remaining = 0
+            bucket.reset_at = max(bucket.reset_at, reset_at)
+            bucket.next_slot = bucket.reset_at
+        logger.warning(f"Rate limit hit for {endpoint}; blocked for {max(0, reset_at - time.time()):.0f} seconds")
+
+    def snapshot(self):
+        """
+        Returns {endpoint: {"limit", "remaining", "reset_at"}} for monitoring.
+        """
+        with self.lock:
+            return {endpoint: {"limit": b.limit, "remaining": b.remaining, "reset_at": b.reset_at}
+                    for endpoint, b in self.buckets.items()}
@@ -0,0 +1,374 @@
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.exceptions import RequestException, Timeout
+from src.metrics import CIRCUIT_TRANSITIONS_TOTAL, HEDGED_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Timeout):
+    """
+    Raised instead of sending a request once the caller's deadline has passed.
+    """
+
+
+class CircuitOpenError(RequestException):
+    """
+    Raised instead of sending a request while the endpoint's circuit is open;
+    `retry_after` is the time until it lets a trial request through.
+    """
+
+    def __init__(self, message, endpoint=None, retry_after=0):
+        super().__init__(message)
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """
+    A point in time by which a unit of work (one poll, one poll cycle) must
+    be done. While applied to a thread, every client request made on it has
+    its timeout cut to the time left, and fails fast once none is left.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    @contextmanager
+    def apply(self):
+        previous = getattr(_local, "deadline", None)
+        _local.deadline = self
+        try:
+            yield self
+        finally:
+            _local.deadline = previous
+
+
+def current_deadline():
+    return getattr(_local, "deadline", None)
+
+
+def request_timeout(timeout):
+    """
+    Returns `timeout` (seconds or a (connect, read) tuple) cut to the current
+    thread's deadline. Raises DeadlineExceeded if it has passed.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return timeout
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline exceeded before the request was sent")
+    if isinstance(timeout, tuple):
+        return tuple(min(value, remaining) for value in timeout)
+    return min(timeout, remaining)
+
+
+class LatencyTracker:
+    """
+    Latencies of the most recent requests per endpoint, for percentiles.
+    """
+
+    def __init__(self, window=200):
+        self.window = window
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def observe(self, endpoint, seconds):
+        with self.lock:
+            samples = self.samples.get(endpoint)
+            if samples is None:
+                samples = self.samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def count(self, endpoint):
+        with self.lock:
+            return len(self.samples.get(endpoint, ()))
+
+    def percentile(self, endpoint, q):
+        """
+        Returns the `q` quantile (0..1) of the endpoint's recent latencies, or None without samples.
+        """
+        with self.lock:
+            samples = sorted(self.samples.get(endpoint, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Hedger:
+    """
+    Hedged requests for idempotent calls: when a request has not answered
+    within the endpoint's recent p95 latency, an identical second request is
+    sent and whichever answers first is used, so one stalled connection costs
+    about the p95 instead of a whole timeout.
+
+    Hedging starts once an endpoint has `min_samples` latencies, never waits
+    less than `min_delay`, and is capped by a budget of `max_ratio` hedges per
+    request (so at most ~10% extra load by default, which also bounds the
+    extra rate-limit budget spent). Errors are not hedged; they are left to
+    the caller's retries and circuit breaker.
+    """
+
+    def __init__(self, quantile=0.95, min_delay=0.1, min_samples=20, max_ratio=0.1, max_workers=32, window=200):
+        """
+        :param quantile: Latency quantile after which a hedge is sent.
+        :param min_delay: Shortest wait before hedging.
+        :param min_samples: Latencies an endpoint needs before it is hedged.
+        :param max_ratio: Hedges allowed per request, on average.
+        :param max_workers: Threads running hedged attempts.
+        :param window: Recent latencies kept per endpoint.
+        """
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.latencies = LatencyTracker(window)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self.lock = threading.Lock()
+        # Starts with room for a few hedges; every request adds max_ratio.
+        self.budget = 1.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self, endpoint):
+        """
+        Returns how long to wait before hedging `endpoint`, or None if it is not hedged yet.
+        """
+        if self.latencies.count(endpoint) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(endpoint, self.quantile))
+
+    def _take_budget(self):
+        with self.lock:
+            if self.budget < 1:
+                return False
+            self.budget -= 1
+            self.hedges += 1
+            return True
+
+    def _timed(self, endpoint, send):
+        started = time.perf_counter()
+        result = send()
+        self.latencies.observe(endpoint, time.perf_counter() - started)
+        return result
+
+    def _timed_within(self, deadline, endpoint, send):
+        # Attempts run on the hedging threads, which must see the caller's deadline.
+        with deadline.apply():
+            return self._timed(endpoint, send)
+
+    def call(self, endpoint, send):
+        """
+        Runs `send()` (which must be safe to repeat), hedging it if it is slow.
+        """
+        with self.lock:
+            self.requests += 1
+            self.budget = min(10.0, self.budget + self.max_ratio)
+        delay = self.delay(endpoint)
+        if delay is None:
+            return self._timed(endpoint, send)
+        deadline = current_deadline()
+        if deadline is not None:
+            attempt = partial(self._timed_within, deadline, endpoint, send)
+        else:
+            attempt = partial(self._timed, endpoint, send)
+        primary = self.executor.submit(attempt)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_budget():
+            return primary.result()
+        hedge = self.executor.submit(attempt)
+        HEDGED_REQUESTS_TOTAL.inc(endpoint=endpoint)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(_close_result)
+                if future is hedge:
+                    with self.lock:
+                        self.hedge_wins += 1
+                return future.result()
+        raise error
+
+    def stats(self):
+        with self.lock:
+            stats = {"requests": self.requests, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+        with self.latencies.lock:
+            endpoints = list(self.latencies.samples)
+        stats["p95"] = {endpoint: self.latencies.percentile(endpoint, self.quantile) for endpoint in endpoints}
+        return stats
+
+
+def _close_result(future):
+    # The losing attempt's connection goes back to the pool.
+    if future.exception() is None and hasattr(future.result(), "close"):
+        future.result().close()
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an endpoint is degraded. After `failure_threshold`
+    consecutive failures (no response, or a 5xx) the circuit opens and calls
+    raise CircuitOpenError without being sent. After `recovery_timeout`
+    seconds one trial call is let through (half-open): success closes the
+    circuit, failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30, on_change=None):
+        """
+        :param name: Endpoint name used in errors and logs.
+        :param failure_threshold: Consecutive failures that open the circuit.
+        :param recovery_timeout: Seconds the circuit stays open before a trial call.
+        :param on_change: Optional callback(name, state) on every transition.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+            logger.warning(f"Circuit for {self.name} opened after {self.failures} failures; "
+                           f"failing fast for {self.recovery_timeout}s")
+        elif state == self.CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        if self.on_change:
+            self.on_change(self.name, state)
+
+    def allow(self):
+        """
+        Called before each request; raises CircuitOpenError if it must not be sent.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            retry_after = self.opened_at + self.recovery_timeout - time.monotonic()
+            if self.state == self.OPEN and retry_after <= 0:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            raise CircuitOpenError(f"Circuit for {self.name} is open", endpoint=self.name,
+                                   retry_after=max(retry_after, 1))
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.trial_in_flight = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and
+                                                self.failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+
+    def release(self):
+        """
+        Ends a call that says nothing about the endpoint's health (e.g. cut short by a deadline).
+        """
+        with self.lock:
+            self.trial_in_flight = False
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {"state": self.state, "failures": self.failures}
+            if self.state != self.CLOSED:
+                snapshot["retry_after"] = max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+            return snapshot
+
+
+class CircuitBreakers:
+    """
+    One CircuitBreaker per endpoint of a service, created on first use.
+    """
+
+    def __init__(self, service, failure_threshold=5, recovery_timeout=30):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def _changed(self, endpoint, state):
+        CIRCUIT_TRANSITIONS_TOTAL.inc(service=self.service, endpoint=endpoint, state=state)
+
+    def get(self, endpoint):
+        with self.lock:
+            breaker = self.breakers.get(endpoint)
+            if breaker is None:
+                breaker = self.breakers[endpoint] = CircuitBreaker(
+                    f"{self.service} {endpoint}", self.failure_threshold, self.recovery_timeout,
+                    on_change=lambda name, state: self._changed(endpoint, state))
+            return breaker
+
+    def states(self):
+        with self.lock:
+            breakers = dict(self.breakers)
+        return {endpoint: breaker.snapshot() for endpoint, breaker in breakers.items()}
+
+
+@contextmanager
+def guarded(breaker, timeout, full_timeout):
+    """
+    Wraps one request: checks the breaker first, then records the outcome.
+    The body sets `outcome["status"]` to the response status. A timeout that
+    was shortened by a deadline is not held against the endpoint.
+    """
+    breaker.allow()
+    outcome = {"status": None}
+    try:
+        yield outcome
+    except Timeout:
+        if _shortened(timeout, full_timeout):
+            breaker.release()
+        else:
+            breaker.record_failure()
+        raise
+    except RequestException:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    if outcome["status"] is not None and outcome["status"] >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def _shortened(timeout, full_timeout):
+    if isinstance(timeout, tuple):
+        return any(a < b for a, b in zip(timeout, full_timeout))
+    return timeout < full_timeout
@@ -0,0 +1,245 @@
+import re
+import json
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+TWEET_URL = "https://twitter.com/{username}/status/{id}"
+
+# A numbered backreference (\1) or group condition ((?(1)...)), outside an escaped backslash.
+NUMBERED_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d")
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over every keyword of every route, so a tweet is
+    scanned once however many keywords there are. Matching is
+    case-insensitive and on whole words: "eth" does not match "method",
+    while "$eth" and "#eth" match as written.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(keyword.lower() for keyword in keywords if keyword))
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(index)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def find(self, text):
+        """
+        Returns the set of keywords found in `text`.
+        """
+        found = set()
+        if not self.keywords or not text:
+            return found
+        text = text.lower()
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for index in self.output[state]:
+                keyword = self.keywords[index]
+                start = end - len(keyword) + 1
+                if _is_word_char(keyword[0]) and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if _is_word_char(keyword[-1]) and end + 1 < len(text) and _is_word_char(text[end + 1]):
+                    continue
+                found.add(keyword)
+        return found
+
+
+class Route:
+    """
+    One routing rule: tweets that match every condition set on it go to
+    `chats`. Within a condition any value may match (any listed account,
+    any keyword, any pattern).
+    """
+    __slots__ = ("name", "chats", "accounts", "keywords", "patterns", "has_media", "is_reply", "format")
+
+    def __init__(self, chats, name=None, accounts=None, keywords=None, patterns=None, has_media=None,
+                 is_reply=None, format=None):
+        """
+        :param chats: Telegram chat IDs the matching tweets go to.
+        :param name: Label used in logs.
+        :param accounts: Usernames the route applies to (all accounts if None).
+        :param keywords: Whole-word, case-insensitive keywords; at least one must appear.
+        :param patterns: Regular expressions (case-insensitive); at least one must match.
+        :param has_media: If set, whether the tweet must (True) or must not (False) carry media.
+        :param is_reply: If set, whether the tweet must (True) or must not (False) be a reply.
+        :param format: Optional message template with {username}, {text}, {id} and {url}.
+        """
+        if not chats:
+            raise ValueError(f"Route {name!r} has no chats")
+        self.name = name
+        self.chats = [str(chat) for chat in chats]
+        self.accounts = {account.lstrip("@").lower() for account in accounts} if accounts else None
+        self.keywords = {keyword.lower() for keyword in keywords or []}
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns or []]
+        self.has_media = has_media
+        self.is_reply = is_reply
+        if format is not None:
+            try:
+                render(format, "username", {"id": "1", "text": "text"})
+            except (KeyError, IndexError, ValueError, AttributeError) as e:
+                raise ValueError(f"Route {name!r} has an invalid format {format!r}: "
+                                 f"use {{username}}, {{text}}, {{id}} and {{url}} ({e!r})")
+        self.format = format
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["chats"], name=data.get("name"), accounts=data.get("accounts"),
+                   keywords=data.get("keywords"), patterns=data.get("patterns"), has_media=data.get("has_media"),
+                   is_reply=data.get("is_reply"), format=data.get("format"))
+
+
+def is_reply(tweet):
+    return any(ref.get("type") == "replied_to" for ref in tweet.get("referenced_tweets") or [])
+
+
+def has_media(tweet):
+    return bool((tweet.get("attachments") or {}).get("media_keys"))
+
+
+class Router:
+    """
+    Maps each tweet to the chats it should be delivered to.
+
+    Every keyword of every route is compiled into one KeywordMatcher and
+    every pattern into one combined regex, so each tweet's text is scanned
+    once for keywords and once for patterns; only when the combined regex
+    matches are the routes' own patterns checked. Routes are indexed by
+    account, so the routes checked per tweet are only those for its author
+    plus those for all accounts. A tweet goes to every chat of every route
+    it matches (once per chat, formatted by the first such route); tweets
+    that match no route go to `default_chats`.
+    """
+
+    def __init__(self, routes, default_chats=(None,)):
+        """
+        :param routes: Route objects.
+        :param default_chats: Chats for tweets no route matches; None stands for
+                              TELEGRAM_CHAT_ID and an empty list drops them.
+        """
+        self.routes = list(routes)
+        self.default_chats = list(default_chats)
+        self.order = {id(route): index for index, route in enumerate(self.routes)}
+        self.by_account = {}
+        self.any_account = []
+        for route in self.routes:
+            if route.accounts is None:
+                self.any_account.append(route)
+            else:
+                for account in route.accounts:
+                    self.by_account.setdefault(account, []).append(route)
+        self.keywords = KeywordMatcher(keyword for route in self.routes for keyword in route.keywords)
+        patterns = [pattern.pattern for route in self.routes for pattern in route.patterns]
+        # Group numbers shift inside the combined regex, so patterns referring to
+        # a group by number are left out of it and searched on their own.
+        self.standalone_patterns = [pattern for route in self.routes for pattern in route.patterns
+                                    if NUMBERED_REFERENCE.search(pattern.pattern)]
+        patterns = [pattern for pattern in patterns if not NUMBERED_REFERENCE.search(pattern)]
+        self.any_pattern = None
+        if patterns:
+            try:
+                self.any_pattern = re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+            except re.error as e:
+                # E.g. two patterns defining the same group name: check them one by one instead.
+                logger.warning(f"Route patterns cannot be combined ({e}); matching them separately")
+        self.needs_media = any(route.has_media is not None for route in self.routes)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a router from {"default": [chat ids] (optional), "routes": [{...}]},
+        each route holding Route's keyword arguments.
+        """
+        default = data.get("default")
+        return cls([Route.from_dict(route) for route in data.get("routes", [])],
+                   default_chats=(None,) if default is None else [str(chat) for chat in default])
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            router = cls.from_dict(json.load(f))
+        logger.info(f"Loaded {len(router.routes)} routes ({len(router.keywords)} keywords) from {path}")
+        return router
+
+    def matches(self, username, tweet):
+        """
+        Returns the routes `tweet` by `username` matches, in file order.
+        """
+        candidates = self.by_account.get(username.lstrip("@").lower(), []) + self.any_account
+        if not candidates:
+            return []
+        text = tweet.get("text") or ""
+        found = None
+        pattern_hit = None
+        matched = []
+        for route in candidates:
+            if route.has_media is not None and has_media(tweet) != route.has_media:
+                continue
+            if route.is_reply is not None and is_reply(tweet) != route.is_reply:
+                continue
+            if route.keywords:
+                if found is None:
+                    found = self.keywords.find(text)
+                if route.keywords.isdisjoint(found):
+                    continue
+            if route.patterns:
+                if pattern_hit is None:
+                    pattern_hit = (self.any_pattern is None or bool(self.any_pattern.search(text))
+                                   or any(pattern.search(text) for pattern in self.standalone_patterns))
+                if not pattern_hit or not any(pattern.search(text) for pattern in route.patterns):
+                    continue
+            matched.append(route)
+        # Account and catch-all routes were checked separately; restore file order.
+        return sorted(matched, key=lambda route: self.order[id(route)])
+
+    def route(self, username, tweet):
+        """
+        Returns [(chat_id, format or None)], one entry per destination chat.
+        """
+        destinations = {}
+        for route in self.matches(username, tweet):
+            for chat in route.chats:
+                destinations.setdefault(chat, route.format)
+        if not destinations:
+            return [(chat, None) for chat in self.default_chats]
+        return list(destinations.items())
+
+
+def render(template, username, tweet):
+    """
+    Fills a route's message template.
+    """
+    tweet_id = tweet.get("id")
+    return template.format(username=username, text=tweet.get("text") or "", id=tweet_id,
+                           url=TWEET_URL.format(username=username.lstrip("@"), id=tweet_id))
@@ -0,0 +1,129 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PollScheduler:
+    """
+    Persistent worker pool fed by a priority queue of per-key due times.
+
+    Each key (e.g. a username) is polled on its own schedule: a worker pops the
+    earliest due key, calls `poll_func(key)` and re-queues the key at the due
+    time it returns. A key is never dispatched twice at once, so a slow or hung
+    poll only occupies its own worker while the rest keep draining the queue.
+    """
+
+    def __init__(self, poll_func, num_workers=8, default_interval=3, name="poller"):
+        """
+        :param poll_func: Callable taking a key and returning its next due time
+                          (time.time() based), or None to use `default_interval`.
+        :param num_workers: Number of persistent worker threads.
+        :param default_interval: Seconds until the next poll when poll_func returns None or raises.
+        :param name: Prefix for worker thread names.
+        """
+        self.poll_func = poll_func
+        self.num_workers = num_workers
+        self.default_interval = default_interval
+        self.name = name
+        self.condition = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        # key -> due time of its live heap entry; keys being polled are absent.
+        self.due = {}
+        self.in_flight = set()
+        self.removed = set()
+        self.workers = []
+        self.running = False
+
+    def schedule(self, key, due=None):
+        """
+        Adds `key` or moves it to a new due time (defaults to now).
+        """
+        due = time.time() if due is None else due
+        with self.condition:
+            self.removed.discard(key)
+            if key in self.in_flight:
+                # The worker polling it re-queues it when done.
+                return
+            self.due[key] = due
+            heapq.heappush(self.heap, (due, next(self.counter), key))
+            self.condition.notify()
+
+    def remove(self, key):
+        with self.condition:
+            self.due.pop(key, None)
+            if key in self.in_flight:
+                self.removed.add(key)
+
+    def __len__(self):
+        with self.condition:
+            return len(self.due) + len(self.in_flight)
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        logger.info(f"Started {self.num_workers} poll workers")
+
+    def stop(self, timeout=None):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+
+    def _next_key(self):
+        """
+        Blocks until a key is due and returns it, or None once stopped.
+        """
+        with self.condition:
+            while self.running:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                due, _, key = self.heap[0]
+                if self.due.get(key) != due:
+                    # Stale entry left behind by a reschedule or removal.
+                    heapq.heappop(self.heap)
+                    continue
+                wait = due - time.time()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                heapq.heappop(self.heap)
+                del self.due[key]
+                self.in_flight.add(key)
+                return key
+            return None
+
+    def _worker(self):
+        while True:
+            key = self._next_key()
+            if key is None:
+                return
+            next_due = None
+            try:
+                next_due = self.poll_func(key)
+            except Exception as e:
+                logger.error(f"Error polling {key}: {e}")
+            if next_due is None:
+                next_due = time.time() + self.default_interval
+            with self.condition:
+                self.in_flight.discard(key)
+                if key in self.removed:
+                    self.removed.discard(key)
+                    continue
+                if key not in self.due:
+                    self.due[key] = next_due
+                    heapq.heappush(self.heap, (next_due, next(self.counter), key))
+                    self.condition.notify()
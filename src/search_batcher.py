@@ -0,0 +1,228 @@
+import logging
+import threading
+import itertools
+from src.models import parse_tweets, parse_users
+
+logger = logging.getLogger(__name__)
+
+# Recent search query length limit on the Basic/self-serve tiers (Pro allows 1024).
+MAX_QUERY_LENGTH = 512
+SEPARATOR = " OR "
+
+
+def is_newer(tweet_id, since_id):
+    """
+    Tweet IDs are snowflakes, so numeric order is chronological order.
+    """
+    return since_id is None or int(tweet_id) > int(since_id)
+
+
+class SearchBatch:
+    def __init__(self, batch_id):
+        self.batch_id = batch_id
+        self.usernames = []
+        self.since_id = None
+        # (until_id, resume_id) while older results than a poll could page
+        # through are still being fetched; see SearchBatcher.fan_out.
+        self.gap = None
+        self.length = 0
+
+    @staticmethod
+    def term(username):
+        return f"from:{username}"
+
+    def fits(self, username, max_query_length):
+        extra = len(self.term(username)) + (len(SEPARATOR) if self.usernames else 0)
+        return self.length + extra <= max_query_length
+
+    def add(self, username):
+        self.length += len(self.term(username)) + (len(SEPARATOR) if self.usernames else 0)
+        self.usernames.append(username)
+
+    @property
+    def query(self):
+        return SEPARATOR.join(self.term(username) for username in self.usernames)
+
+
+class SearchBatcher:
+    """
+    Packs tracked accounts into `from:a OR from:b OR ...` recent search queries
+    so many accounts are polled with one API call. Each batch keeps its own
+    since_id watermark, and results are fanned back out per account.
+    """
+
+    def __init__(self, max_query_length=MAX_QUERY_LENGTH):
+        """
+        :param max_query_length: Maximum length of a search query on our API tier.
+        """
+        self.max_query_length = max_query_length
+        self.lock = threading.Lock()
+        self.batches = {}
+        # Lowercased username -> batch_id, and -> the spelling it was added with.
+        self.membership = {}
+        self.spelling = {}
+        self.ids = itertools.count()
+
+    def _new_batch(self):
+        batch = SearchBatch(f"batch-{next(self.ids)}")
+        self.batches[batch.batch_id] = batch
+        return batch
+
+    def add(self, username):
+        """
+        Places `username` in the first batch with room, opening a new batch if
+        none has any. Returns the batch_id, or None if already tracked.
+        """
+        username = username.lstrip('@')
+        if len(SearchBatch.term(username)) > self.max_query_length:
+            raise ValueError(f"Username {username} does not fit in a search query")
+        with self.lock:
+            if username.lower() in self.membership:
+                return None
+            batch = next((batch for batch in self.batches.values()
+                          if batch.fits(username, self.max_query_length)), None)
+            if batch is None:
+                batch = self._new_batch()
+            batch.add(username)
+            self.membership[username.lower()] = batch.batch_id
+            self.spelling[username.lower()] = username
+            return batch.batch_id
+
+    def remove(self, username):
+        """
+        Drops `username` from its batch. Empty batches are deleted; call
+        rebalance() to re-pack partially emptied ones.
+        """
+        key = username.lstrip('@').lower()
+        with self.lock:
+            batch_id = self.membership.pop(key, None)
+            if batch_id is None:
+                return None
+            del self.spelling[key]
+            batch = self.batches[batch_id]
+            remaining = [name for name in batch.usernames if name.lower() != key]
+            since_id = batch.since_id
+            batch.usernames, batch.length = [], 0
+            for name in remaining:
+                batch.add(name)
+            batch.since_id = since_id
+            if not batch.usernames:
+                del self.batches[batch_id]
+            return batch_id
+
+    def rebalance(self, force=True):
+        """
+        Re-packs all accounts into as few batches as possible. A new batch
+        starts from the oldest watermark among the batches it draws from, so
+        no tweet is skipped; callers filter repeats with per-account watermarks.
+        Every batch gets a new id. With force=False the new packing is only
+        kept if it saves a batch. Returns the new batch ids, or None if the
+        batches were kept.
+        """
+        with self.lock:
+            members = [(name, batch.since_id) for batch in self.batches.values() for name in batch.usernames]
+            members.sort(key=lambda member: len(member[0]), reverse=True)
+            batches, self.batches = self.batches, {}
+            membership = {}
+            for name, since_id in members:
+                batch = next((batch for batch in self.batches.values()
+                              if batch.fits(name, self.max_query_length)), None)
+                if batch is None:
+                    batch = self._new_batch()
+                    batch.since_id = since_id
+                elif batch.since_id is not None and (since_id is None or not is_newer(since_id, batch.since_id)):
+                    batch.since_id = since_id
+                batch.add(name)
+                membership[name.lower()] = batch.batch_id
+            if not force and len(self.batches) >= len(batches):
+                self.batches = batches
+                return None
+            self.membership = membership
+            return list(self.batches)
+
+    def batch_ids(self):
+        with self.lock:
+            return list(self.batches)
+
+    def members(self, batch_id):
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            return list(batch.usernames) if batch else []
+
+    def set_since_id(self, batch_id, since_id):
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch is not None:
+                batch.since_id = since_id
+
+    def query_for(self, batch_id):
+        """
+        Returns (query, since_id) for a batch, or (None, None) if it no longer exists.
+        """
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None, None
+            return batch.query, batch.since_id
+
+    def gap(self, batch_id):
+        """
+        Returns the batch's (until_id, resume_id) while a gap is open, else None.
+        """
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            return batch.gap if batch else None
+
+    def fan_out(self, batch_id, pages):
+        """
+        Splits search response pages for a batch into {username: [tweets]},
+        newest first, and advances the batch watermark to the newest tweet.
+
+        If the last page still has a next_token, older results were left
+        unfetched: the watermark then stays and the batch records a gap
+        (until_id = the oldest tweet fetched, resume_id = the newest), which
+        the next polls page through with until_id before the watermark jumps
+        to resume_id, the way Streamer.fill_gap does for timelines.
+        """
+        results = {}
+        newest_id = None
+        oldest_id = None
+        for data in pages:
+            authors = {user_id: user.username.lower() for user_id, user in parse_users(data).items()}
+            newest = data.get("meta", {}).get("newest_id")
+            if newest and is_newer(newest, newest_id):
+                newest_id = newest
+            for tweet in parse_tweets(data):
+                if is_newer(tweet.id, newest_id):
+                    newest_id = tweet.id
+                if oldest_id is None or is_newer(oldest_id, tweet.id):
+                    oldest_id = tweet.id
+                author = authors.get(tweet.author_id)
+                # Report accounts under the spelling they were added with.
+                username = self.spelling.get(author)
+                if username is None:
+                    continue
+                results.setdefault(username, []).append(tweet)
+
+        truncated = bool(pages) and bool(pages[-1].get("meta", {}).get("next_token"))
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return results
+            if batch.gap is not None:
+                until_id, resume_id = batch.gap
+                if truncated:
+                    batch.gap = (oldest_id or until_id, resume_id)
+                else:
+                    batch.gap = None
+                    newest_id = resume_id
+            elif truncated and batch.since_id is not None and oldest_id:
+                batch.gap = (oldest_id, newest_id)
+                newest_id = None
+            if newest_id and is_newer(newest_id, batch.since_id):
+                batch.since_id = newest_id
+            gap_open = batch.gap is not None
+        if gap_open:
+            logger.warning(f"Search batch {batch_id} has more results than one poll pages through; "
+                           f"fetching the older ones in the next poll")
+        return results
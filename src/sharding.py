@@ -0,0 +1,467 @@
+import os
+import time
+import bisect
+import socket
+import signal
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+import multiprocessing
+from src.streamer import Streamer
+from src.watchlist import WatchlistFile
+from src.routing import Router
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+LEASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    account TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring: each node owns the keys hashing just before its
+    virtual points, so adding or removing a node only moves about 1/N of the
+    keys.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        """
+        :param nodes: Initial node IDs.
+        :param replicas: Virtual points per node; more points give a more even spread.
+        """
+        self.replicas = replicas
+        self.points = []
+        self.owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point not in self.owners:
+                bisect.insort(self.points, point)
+                self.owners[point] = node
+
+    def remove(self, node):
+        self.points = [point for point in self.points if self.owners[point] != node]
+        self.owners = {point: owner for point, owner in self.owners.items() if owner != node}
+
+    @property
+    def nodes(self):
+        return sorted(set(self.owners.values()))
+
+    def owner(self, key):
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, _hash(key)) % len(self.points)
+        return self.owners[self.points[index]]
+
+
+class LeaseStore:
+    """
+    Worker membership and per-account leases in a SQLite file shared by all
+    workers (on one host, or on storage every node can lock).
+
+    Workers heartbeat to stay members; a worker that stops heartbeating drops
+    out once its heartbeat expires, and its account leases can then be
+    claimed by others. An account's lease has a single holder at a time, and
+    only the holder polls it.
+    """
+
+    def __init__(self, path, lease_ttl=15):
+        """
+        :param path: SQLite database file.
+        :param lease_ttl: Seconds a heartbeat (and the leases it renews) stays valid.
+        """
+        self.path = path
+        self.lease_ttl = lease_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(LEASE_SCHEMA)
+        self.lock = threading.Lock()
+
+    def _transaction(self, statements):
+        """
+        Runs `statements` (a callable taking the connection) in one write transaction.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self.conn)
+                self.conn.execute("COMMIT")
+                return result
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, worker_id, now=None):
+        """
+        Renews `worker_id`'s membership and every lease it still holds.
+        Returns those accounts; leases taken over by another worker after
+        ours expired are not among them.
+        """
+        now = time.time() if now is None else now
+        expires_at = now + self.lease_ttl
+
+        def statements(conn):
+            conn.execute(
+                "INSERT INTO workers (worker_id, expires_at, heartbeat_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET expires_at = excluded.expires_at, "
+                "heartbeat_at = excluded.heartbeat_at",
+                (worker_id, expires_at, now)
+            )
+            conn.execute("UPDATE leases SET expires_at = ? WHERE worker_id = ?", (expires_at, worker_id))
+            return {account for (account,) in conn.execute(
+                "SELECT account FROM leases WHERE worker_id = ?", (worker_id,)
+            )}
+        return self._transaction(statements)
+
+    def live_workers(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT worker_id FROM workers WHERE expires_at > ? ORDER BY worker_id", (now,)
+            ).fetchall()
+        return [worker_id for (worker_id,) in rows]
+
+    def claim(self, worker_id, accounts, now=None):
+        """
+        Takes the leases of `accounts` that are free, expired or already ours.
+        Returns the accounts now held.
+        """
+        accounts = list(accounts)
+        if not accounts:
+            return []
+        now = time.time() if now is None else now
+
+        def statements(conn):
+            conn.executemany(
+                "INSERT INTO leases (account, worker_id, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(account) DO UPDATE SET worker_id = excluded.worker_id, "
+                "expires_at = excluded.expires_at "
+                "WHERE leases.expires_at <= ? OR leases.worker_id = excluded.worker_id",
+                [(account, worker_id, now + self.lease_ttl, now) for account in accounts]
+            )
+            held = {account for (account,) in conn.execute(
+                "SELECT account FROM leases WHERE worker_id = ?", (worker_id,)
+            )}
+            return [account for account in accounts if account in held]
+        return self._transaction(statements)
+
+    def release(self, worker_id, accounts):
+        accounts = list(accounts)
+
+        def statements(conn):
+            conn.executemany("DELETE FROM leases WHERE worker_id = ? AND account = ?",
+                             [(worker_id, account) for account in accounts])
+        self._transaction(statements)
+
+    def held_by(self, worker_id):
+        with self.lock:
+            rows = self.conn.execute("SELECT account FROM leases WHERE worker_id = ?", (worker_id,)).fetchall()
+        return {account for (account,) in rows}
+
+    def leave(self, worker_id):
+        """
+        Removes `worker_id` and its leases, so others take over without waiting for expiry.
+        """
+        def statements(conn):
+            conn.execute("DELETE FROM leases WHERE worker_id = ?", (worker_id,))
+            conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+        self._transaction(statements)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class ShardWorker:
+    """
+    Runs a Streamer over the share of the watchlist this worker owns on the
+    consistent hash ring of live workers.
+
+    Every `heartbeat_interval` the worker renews its membership, recomputes
+    the ring and moves accounts:
+
+    - An account that now hashes elsewhere stops being polled at once, but
+      its lease is only released once no poll of it is in flight and its
+      queued messages were delivered (or `handoff_timeout` passed). Until
+      then nobody else can claim it.
+    - An account that hashes here is claimed; once the lease is ours the
+      streamer resumes it from the shared checkpoint store (watermark and
+      undelivered outbox), so nothing is skipped or sent twice.
+
+    A worker that dies stops heartbeating; after `lease_ttl` its accounts
+    are claimed by the workers they now hash to. A worker that only stalled
+    for longer than that finds on its next heartbeat which leases it lost,
+    and stops polling those accounts before its stale watermarks can send
+    their tweets again; polls are also skipped while its leases are expired.
+    """
+
+    def __init__(self, worker_id, usernames, lease_path, checkpoint_path, heartbeat_interval=5, lease_ttl=15,
+                 handoff_timeout=60, replicas=100, watchlist_path=None, watchlist_interval=5, **streamer_kwargs):
+        """
+        :param worker_id: Stable, unique worker ID (reusing it after a restart reclaims its leases at once).
+        :param usernames: The full watchlist shared by all workers.
+        :param lease_path: SQLite file holding worker membership and account leases.
+        :param checkpoint_path: SQLite checkpoint store shared by all workers.
+        :param heartbeat_interval: Seconds between heartbeats and rebalances.
+        :param lease_ttl: Seconds after a missed heartbeat before a worker's accounts move.
+        :param handoff_timeout: Longest wait for queued messages before releasing a moved account.
+        :param replicas: Virtual points per worker on the hash ring.
+        :param watchlist_path: Optional file replacing the full watchlist whenever it changes;
+                               every worker reads it and the next rebalance applies the change.
+        :param watchlist_interval: Seconds between checks of watchlist_path.
+        Other keyword arguments go to Streamer.
+        """
+        if not checkpoint_path:
+            raise ValueError("Sharded mode needs a checkpoint_path shared by all workers")
+        if streamer_kwargs.get("use_filtered_stream"):
+            # Stream rules are global to the app, so shards would overwrite each other's rules.
+            raise ValueError("Sharded mode does not support the filtered stream")
+        if streamer_kwargs.get("control_port") is not None:
+            raise ValueError("Sharded mode takes watchlist changes from watchlist_path, not a control endpoint")
+        self.worker_id = worker_id
+        # Replaced as a whole on reload, never mutated.
+        self.watchlist = tuple(usernames)
+        self.watchlist_file = WatchlistFile(watchlist_path, self.set_watchlist,
+                                            interval=watchlist_interval) if watchlist_path else None
+        self.heartbeat_interval = heartbeat_interval
+        self.handoff_timeout = handoff_timeout
+        self.replicas = replicas
+        self.leases = LeaseStore(lease_path, lease_ttl=lease_ttl)
+        self.streamer = Streamer([], checkpoint_path=checkpoint_path, **streamer_kwargs)
+        self.stop_event = threading.Event()
+        self.lease_ttl = lease_ttl
+        # Account -> time at which it stopped being polled here.
+        self.releasing = {}
+
+    def set_watchlist(self, usernames):
+        self.watchlist = tuple(usernames)
+        logger.info(f"{self.worker_id} reloaded the watchlist ({len(self.watchlist)} accounts)")
+
+    def owned(self, live_workers):
+        ring = HashRing(live_workers, replicas=self.replicas)
+        return {username for username in self.watchlist if ring.owner(username.lstrip('@').lower()) == self.worker_id}
+
+    def rebalance(self):
+        """
+        One heartbeat: renews leases, hands off accounts that moved away and
+        claims those that moved here. Returns the accounts now polled.
+        """
+        now = time.time()
+        held = self.leases.heartbeat(self.worker_id, now)
+        self.streamer.active_until = now + self.lease_ttl
+        stolen = set(self.streamer.usernames) - held
+        if stolen:
+            # Our leases expired (a stall longer than lease_ttl) and another worker
+            # claimed these; its watermarks are newer than ours.
+            logger.warning(f"{self.worker_id} lost the leases of {len(stolen)} accounts to other workers")
+            self.streamer.remove_usernames(sorted(stolen))
+            for account in stolen:
+                self.streamer.checkpoint_store.discard_staged(account)
+        for account in set(self.releasing) - held:
+            del self.releasing[account]
+        live = self.leases.live_workers(now)
+        if self.worker_id not in live:
+            live.append(self.worker_id)
+        wanted = self.owned(live)
+
+        lost = set(self.streamer.usernames) - wanted
+        if lost:
+            self.streamer.remove_usernames(sorted(lost))
+            for account in lost:
+                self.releasing.setdefault(account, now)
+        candidates = []
+        for account, since in list(self.releasing.items()):
+            if account in wanted:
+                # Moved back before it was released: we still hold the lease.
+                del self.releasing[account]
+            elif not self.streamer.is_polling(account):
+                candidates.append((account, since))
+        # Flushed after checking for polls, so whatever they staged is counted below.
+        store = self.streamer.checkpoint_store
+        store.flush()
+        releasable = [account for account, since in candidates
+                      if store.pending_count(account) == 0 or now - since > self.handoff_timeout]
+        for account in releasable:
+            del self.releasing[account]
+        if releasable:
+            self.leases.release(self.worker_id, releasable)
+            logger.info(f"{self.worker_id} handed off {len(releasable)} accounts")
+
+        missing = wanted - set(self.streamer.usernames)
+        claimed = self.leases.claim(self.worker_id, sorted(missing), now)
+        if claimed:
+            self.streamer.add_usernames(claimed)
+            logger.info(f"{self.worker_id} took over {len(claimed)} accounts ({len(live)} live workers)")
+        if len(claimed) < len(missing):
+            logger.info(f"{self.worker_id} waiting for {len(missing) - len(claimed)} leases held elsewhere")
+        return list(self.streamer.usernames)
+
+    def run(self):
+        logger.info(f"Starting shard worker {self.worker_id}")
+        self.stop_event.clear()
+        if self.watchlist_file:
+            self.watchlist_file.check()
+            self.watchlist_file.start()
+        # Claim the first share before polling starts, so it is scheduled right away.
+        self.rebalance()
+        thread = threading.Thread(target=self.streamer.start_stream, name=f"{self.worker_id}-streamer", daemon=True)
+        thread.start()
+        try:
+            while not self.stop_event.wait(self.heartbeat_interval):
+                try:
+                    self.rebalance()
+                except sqlite3.Error as e:
+                    logger.error(f"{self.worker_id} could not rebalance: {e}")
+        finally:
+            if self.watchlist_file:
+                self.watchlist_file.stop()
+            self.streamer.stop()
+            thread.join(timeout=30)
+            self.streamer.checkpoint_store.flush()
+            self.leases.leave(self.worker_id)
+            logger.info(f"Shard worker {self.worker_id} stopped")
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def run_worker(worker_id, usernames, lease_path, checkpoint_path, worker_kwargs):
+    """
+    Process entry point for one shard worker; SIGTERM stops it gracefully.
+    """
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format=f"%(asctime)s - {worker_id} - %(name)s - %(levelname)s - %(message)s")
+    worker = ShardWorker(worker_id, usernames, lease_path, checkpoint_path, **worker_kwargs)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+class Supervisor:
+    """
+    Spawns `num_workers` local shard worker processes and restarts any that exit.
+    """
+
+    def __init__(self, num_workers, usernames, lease_path, checkpoint_path, node_id=None, restart_delay=5,
+                 **worker_kwargs):
+        """
+        :param num_workers: Worker processes to run on this node.
+        :param usernames: The full watchlist.
+        :param lease_path: Shared lease database.
+        :param checkpoint_path: Shared checkpoint database.
+        :param node_id: Prefix making worker IDs unique across nodes; defaults to the hostname.
+        :param restart_delay: Seconds to wait before restarting a worker that exited.
+        Other keyword arguments go to ShardWorker.
+        """
+        self.num_workers = num_workers
+        self.usernames = list(usernames)
+        self.lease_path = lease_path
+        self.checkpoint_path = checkpoint_path
+        self.node_id = node_id or socket.gethostname()
+        self.restart_delay = restart_delay
+        self.worker_kwargs = worker_kwargs
+        self.processes = {}
+        self.stop_event = threading.Event()
+
+    def worker_id(self, index):
+        return f"{self.node_id}-{index}"
+
+    def spawn(self, index):
+        worker_id = self.worker_id(index)
+        process = multiprocessing.Process(
+            target=run_worker, name=worker_id,
+            args=(worker_id, self.usernames, self.lease_path, self.checkpoint_path, self.worker_kwargs)
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(f"Started worker {worker_id} (pid {process.pid})")
+
+    def run(self):
+        for index in range(self.num_workers):
+            self.spawn(index)
+        try:
+            while not self.stop_event.wait(1):
+                for index, process in list(self.processes.items()):
+                    if not process.is_alive():
+                        logger.error(f"Worker {process.name} exited with code {process.exitcode}; "
+                                     f"restarting in {self.restart_delay}s")
+                        if self.stop_event.wait(self.restart_delay):
+                            break
+                        self.spawn(index)
+        except KeyboardInterrupt:
+            logger.info("Supervisor stopped by user.")
+        finally:
+            self.shutdown()
+
+    def shutdown(self, timeout=30):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the watchlist sharded across local worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--usernames", default=",".join(settings.usernames),
+                        help="Comma-separated watchlist (default: TWITTER_USERNAMES).")
+    parser.add_argument("--lease-path", default=os.getenv("LEASE_PATH", "data/leases.db"))
+    parser.add_argument("--watchlist-path", default=settings.watchlist_path,
+                        help="File reloaded whenever it changes (default: WATCHLIST_PATH).")
+    parser.add_argument("--checkpoint-path", default=settings.checkpoint_path or "data/checkpoints.db")
+    parser.add_argument("--node-id", default=None, help="Unique per node when several share the lease file.")
+    parser.add_argument("--poll-interval", type=float, default=3)
+    parser.add_argument("--heartbeat-interval", type=float, default=5)
+    parser.add_argument("--lease-ttl", type=float, default=15)
+    parser.add_argument("--batch-search", action="store_true")
+    parser.add_argument("--routes", default=settings.routes_path, help="JSON routing rules (default: ROUTES_PATH).")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=settings.log_level,
+                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    usernames = [name.strip() for name in args.usernames.split(",") if name.strip()]
+    settings.usernames, settings.watchlist_path = usernames, args.watchlist_path
+    # Fail once here rather than in every worker the supervisor would keep respawning.
+    settings.require("twitter", "telegram", "usernames")
+    supervisor = Supervisor(args.workers, usernames, args.lease_path, args.checkpoint_path, node_id=args.node_id,
+                            heartbeat_interval=args.heartbeat_interval, lease_ttl=args.lease_ttl,
+                            poll_interval=args.poll_interval, batch_search=args.batch_search,
+                            watchlist_path=args.watchlist_path,
+                            router=Router.from_file(args.routes) if args.routes else None)
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stop())
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,140 @@
 import time
 import logging
 import threading
+from functools import partial
+from contextlib import contextmanager
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.twitter_client import TwitterClient
 from src.telegram_bot import TelegramBot
+from src.user_resolver import UserResolver
+from src.scheduler import PollScheduler
+from src.search_batcher import SearchBatcher, is_newer
+from src.rate_limiter import RateLimitError
+from src.adaptive_polling import AdaptivePollPolicy
+from src.delivery_queue import DeliveryQueue
+from src.checkpoint_store import CheckpointStore
+from src.dedup import DedupIndex
+from src.filtered_stream import FilteredStream, StreamUnavailableError
+from src.metrics import MetricsServer, POLL_SECONDS, RATE_LIMIT_BACKOFFS_TOTAL, observe_delivery_lag
+from src.watchlist import WatchlistFile, ControlServer
+from src.media import MediaSender, FileIdCache
+from src.routing import render
+from src.resilience import Deadline
 
 logger = logging.getLogger(__name__)
 
 class Streamer:
-    def __init__(self, usernames, poll_interval=3):  # Updated default poll_interval to 3 seconds
+    def __init__(self, usernames, poll_interval=3, user_cache_path=None, max_workers=8,
+                 batch_search=False, max_query_length=512, max_search_pages=3,
+                 max_poll_interval=60, poll_policy=None, delivery_queue=None, checkpoint_path=None,
+                 page_size=5, max_pages=3, catchup_after=300, catchup_page_size=100, catchup_max_pages=10,
+                 dedup_index=None, use_filtered_stream=False, metrics_port=None,
+                 watchlist_path=None, watchlist_interval=5, control_port=None,
+                 forward_media=False, media_bandwidth=None, media_concurrency=4, file_id_cache_path=None,
+                 router=None, poll_deadline=8):  # Updated default poll_interval to 3 seconds
         """
         :param usernames: List of Twitter usernames to track.
-        :param poll_interval: Polling interval in seconds.
+        :param poll_interval: Shortest polling interval in seconds.
+        :param user_cache_path: Optional file used to persist resolved user IDs across restarts.
+        :param max_workers: Number of persistent poll worker threads.
+        :param batch_search: Poll accounts through OR-batched recent search queries
+                             instead of one timeline call per account.
+        :param max_query_length: Maximum search query length on our API tier.
+        :param max_search_pages: Maximum result pages followed per batch poll.
+        :param max_poll_interval: Longest polling interval for dormant accounts.
+        :param poll_policy: Optional AdaptivePollPolicy; by default intervals adapt
+                            between poll_interval and max_poll_interval.
+        :param delivery_queue: Optional DeliveryQueue; by default one is built around the TelegramBot.
+        :param checkpoint_path: Optional SQLite file persisting since_ids and undelivered messages
+                                so a restart resumes where the last run stopped.
+        :param page_size: Timeline page size for regular polls.
+        :param max_pages: Pages followed per regular poll.
+        :param catchup_after: Seconds without a successful poll after which an account catches up.
+        :param catchup_page_size: Timeline page size while catching up.
+        :param catchup_max_pages: Pages followed per poll while catching up.
+        :param dedup_index: Optional DedupIndex; by default an in-memory LRU of recent tweet IDs.
+        :param use_filtered_stream: Receive tweets from the v2 filtered stream instead of
+                                    polling, falling back to polling if the stream is unavailable.
+        :param metrics_port: Serve Prometheus metrics on this port while streaming (None disables).
+        :param watchlist_path: Optional file whose usernames replace the watchlist whenever it changes.
+        :param watchlist_interval: Seconds between checks of watchlist_path.
+        :param control_port: Serve the local watchlist control endpoint on this port (None disables).
+        :param forward_media: Send attached photos and videos along with the text.
+        :param media_bandwidth: Optional cap in bytes per second across all media transfers.
+        :param media_concurrency: Maximum media transfers in progress at once, to different
+                                  chats (each chat's media goes out in order, one at a time).
+        :param file_id_cache_path: Optional JSON file persisting Telegram file_ids of uploaded media.
+        :param router: Optional Router sending each tweet to the chats its routes select;
+                       by default everything goes to TELEGRAM_CHAT_ID.
+        :param poll_deadline: Seconds one poll (or one fetch_and_forward cycle) may spend on
+                              Twitter requests; their timeouts are cut to fit (None disables).
         """
         self.lock = threading.Lock()
-        self.usernames = usernames[:]  # make a copy
+        # Immutable snapshot: writers swap in a new tuple under self.lock, so
+        # pollers can iterate it without locking while the watchlist changes.
+        self.usernames = tuple(dict.fromkeys(usernames))
         self.poll_interval = poll_interval
         self.twitter_client = TwitterClient()
         self.telegram_bot = TelegramBot()
+        self.forward_media = forward_media
+        self.router = router
+        if router is not None and router.needs_media:
+            # has_media routes need the tweets' attachments.
+            self.twitter_client.include_media = True
+        self.media_sender = None
+        if forward_media:
+            self.twitter_client.include_media = True
+            self.media_sender = MediaSender(self.telegram_bot, file_ids=FileIdCache(path=file_id_cache_path),
+                                            bandwidth=media_bandwidth, max_concurrent=media_concurrency)
+        self.user_resolver = UserResolver(self.twitter_client, cache_path=user_cache_path)
+        # Telegram sends happen on the queue's own threads, never on a poller.
+        # Media goes through its own lane and dispatchers, so uploads do not hold up text.
+        self.delivery_queue = delivery_queue or DeliveryQueue(
+            self.telegram_bot, media_sender=self.media_sender,
+            media_workers=media_concurrency if forward_media else 0)
+        # Shared by every account, so a tweet surfaced by several of them is sent once.
+        self.dedup = dedup_index if dedup_index is not None else DedupIndex()
+        self.use_filtered_stream = use_filtered_stream
+        self.filtered_stream = None
+        self.metrics_server = MetricsServer(port=metrics_port) if metrics_port is not None else None
+        self.watchlist_file = WatchlistFile(watchlist_path, self.set_usernames,
+                                            interval=watchlist_interval) if watchlist_path else None
+        self.control_server = ControlServer(self, port=control_port) if control_port is not None else None
+        self.stop_event = threading.Event()
+        self.max_workers = max_workers
+        self.poll_deadline = poll_deadline
+        self.poll_policy = poll_policy or AdaptivePollPolicy(
+            min_interval=max(poll_interval, 1), max_interval=max(max_poll_interval, poll_interval, 1)
+        )
+        self.batch_search = batch_search
+        self.max_search_pages = max_search_pages
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.catchup_after = catchup_after
+        self.catchup_page_size = catchup_page_size
+        self.catchup_max_pages = catchup_max_pages
+        # Time of the last successful timeline poll per account, and accounts whose
+        # last poll filled every page (so more tweets may be waiting).
+        self.last_polled_at = {}
+        self.catching_up = set()
+        # Accounts with more new tweets than one poll could page through:
+        # username -> (until_id, resume_id). The watermark stays before the gap
+        # while older tweets below until_id are fetched; once it is covered the
+        # watermark jumps to resume_id, the newest tweet already forwarded.
+        self.gaps = {}
+        # Polls running per account, so a handoff can wait for them to finish.
+        self.in_flight = {}
+        # Outbox entries handed to the delivery queue and not delivered yet, so
+        # restoring an account's checkpoints does not queue them a second time.
+        self.queued_entries = set()
+        # Held while a tweet goes into the dedup index and its outbox rows are staged,
+        # so a dedup snapshot never holds a tweet whose rows are not staged yet.
+        self.forward_lock = threading.Lock()
+        # Set by sharding to the expiry of this worker's leases: past it, polls are skipped.
+        self.active_until = None
+        self.search_batcher = SearchBatcher(max_query_length=max_query_length) if batch_search else None
+        self.scheduler = PollScheduler(self.poll_batch if batch_search else self.poll_account,
+                                       num_workers=max_workers, default_interval=poll_interval)
         # Dictionary to store last seen tweet ID per username.
         self.last_tweet_ids = {}
         # Dictionary to store backoff timestamp for accounts that hit rate limits.
@@ -25,66 +142,649 @@ class Streamer:
         for username in self.usernames:
             self.last_tweet_ids[username] = None
             self.backoff_until[username] = 0  # no backoff initially
+            if self.search_batcher:
+                self.search_batcher.add(username)
+        if not self.search_batcher:
+            # Warm the user ID cache in bulk rather than one lookup per account.
+            self.user_resolver.resolve_many(self.usernames)
+        self.checkpoint_store = CheckpointStore(checkpoint_path) if checkpoint_path else None
+        if self.checkpoint_store:
+            self.restore_checkpoints()
+
+    def restore_checkpoints(self, accounts=None):
+        """
+        Resumes since_ids and re-queues messages that were not delivered before
+        the last shutdown, for `accounts` (by default every tracked account).
+        """
+        accounts = list(self.usernames) if accounts is None else list(accounts)
+        watermarks = self.checkpoint_store.load_watermarks(accounts)
+        with self.lock:
+            for username in accounts:
+                if watermarks.get(username):
+                    self.last_tweet_ids[username] = watermarks[username]
+        if self.search_batcher:
+            for batch_id in self.search_batcher.batch_ids():
+                member_ids = [self.last_tweet_ids.get(name) for name in self.search_batcher.members(batch_id)]
+                if member_ids and None not in member_ids:
+                    self.search_batcher.set_since_id(batch_id, min(member_ids, key=int))
+        with self.lock:
+            queued = {entry.id for entry in self.queued_entries}
+        pending = [entry for entry in self.checkpoint_store.load_outbox(accounts) if entry.id not in queued]
+        for entry in pending:
+            self.enqueue_entry(entry, on_delivered=partial(self.checkpoint_store.mark_delivered, entry))
+        logger.info(f"Restored {len(watermarks)} watermarks and {len(pending)} undelivered messages")
+
+    def enqueue_entry(self, entry, on_delivered, media=None):
+        """
+        Queues an outbox entry, remembering it until Telegram accepts it.
+        """
+        def delivered():
+            with self.lock:
+                self.queued_entries.discard(entry)
+            on_delivered()
+
+        with self.lock:
+            self.queued_entries.add(entry)
+        self.delivery_queue.enqueue(entry.message, chat_id=entry.chat_id, media=media, on_delivered=delivered)
 
     def add_username(self, username):
+        self.add_usernames([username])
+
+    def add_usernames(self, usernames):
+        """
+        Starts tracking `usernames` and returns those that were not tracked yet.
+        Usernames are case-insensitive; a name already tracked under another
+        spelling is left as it is.
+        """
+        added = []
+        batch_ids = set()
         with self.lock:
-            if username not in self.usernames:
-                self.usernames.append(username)
-                self.last_tweet_ids[username] = None
-                self.backoff_until[username] = 0
-                logger.info(f"Added new username: {username}")
+            tracked = {name.lower() for name in self.usernames}
+            for username in usernames:
+                if username.lower() not in tracked:
+                    tracked.add(username.lower())
+                    self.last_tweet_ids[username] = None
+                    self.backoff_until[username] = 0
+                    added.append(username)
+                    if self.search_batcher:
+                        batch_ids.add(self.search_batcher.add(username))
+                    logger.info(f"Added new username: {username}")
+            if added:
+                self.usernames = self.usernames + tuple(added)
+        if added and self.checkpoint_store:
+            # Resume accounts tracked before (or by another shard) before their first poll.
+            self.restore_checkpoints(added)
+        if self.search_batcher and self.scheduler.running:
+            for batch_id in batch_ids - {None}:
+                # Poll the account's batch now rather than a full interval later.
+                self.scheduler.schedule(batch_id)
+        if added and self.filtered_stream:
+            try:
+                self.filtered_stream.sync_rules(list(self.usernames))
+            except Exception as e:
+                logger.error(f"Error syncing stream rules for new accounts: {e}")
+        if added and not self.search_batcher:
+            self.user_resolver.resolve_many(added)
+            if self.scheduler.running:
+                for username in added:
+                    self.scheduler.schedule(username)
+        return added
 
-    def check_username(self, username):
-        now = time.time()
+    def remove_username(self, username):
+        self.remove_usernames([username])
+
+    def remove_usernames(self, usernames):
+        """
+        Stops tracking `usernames`. Their checkpoints are kept, so adding them
+        back (here or on another shard) resumes where polling stopped.
+        Usernames match case-insensitively.
+        """
+        removed = []
+        with self.lock:
+            tracked = {name.lower(): name for name in self.usernames}
+            for username in dict.fromkeys(name.lower() for name in usernames):
+                username = tracked.pop(username, None)
+                if username is not None:
+                    self.last_tweet_ids.pop(username, None)
+                    self.backoff_until.pop(username, None)
+                    self.last_polled_at.pop(username, None)
+                    self.catching_up.discard(username)
+                    self.gaps.pop(username, None)
+                    removed.append(username)
+            if removed:
+                gone = set(removed)
+                self.usernames = tuple(name for name in self.usernames if name not in gone)
+        for username in removed:
+            self.poll_policy.forget(username)
+            if self.search_batcher:
+                batch_id = self.search_batcher.remove(username)
+                if batch_id is not None and batch_id not in self.search_batcher.batches:
+                    self.scheduler.remove(batch_id)
+            else:
+                self.scheduler.remove(username)
+            logger.info(f"Removed username: {username}")
+        if removed and self.search_batcher:
+            self.rebalance_batches()
+        if removed and self.filtered_stream:
+            try:
+                self.filtered_stream.sync_rules(list(self.usernames))
+            except Exception as e:
+                logger.error(f"Error syncing stream rules for removed accounts: {e}")
+        return removed
+
+    def set_usernames(self, usernames):
+        """
+        Replaces the watchlist with `usernames`, applying only the difference:
+        new accounts are resolved and scheduled, removed ones dropped, and the
+        rest keep their watermarks and schedules. Returns (added, removed).
+        Usernames compare case-insensitively, so changing only a name's case
+        keeps its state.
+        """
+        wanted = dict.fromkeys(usernames)
+        wanted_keys = {name.lower() for name in wanted}
+        removed = self.remove_usernames([name for name in self.usernames if name.lower() not in wanted_keys])
+        added = self.add_usernames(wanted)
+        if added or removed:
+            logger.info(f"Watchlist reloaded: {len(added)} added, {len(removed)} removed, "
+                        f"{len(self.usernames)} tracked")
+        return added, removed
+
+    def is_backed_off(self, username, now=None):
+        now = time.time() if now is None else now
         # If we are in backoff mode for this user, skip checking.
         if now < self.backoff_until.get(username, 0):
             logger.info(f"Skipping {username} due to backoff until {self.backoff_until[username]}")
+            return True
+        return False
+
+    def format_message(self, username, tweet):
+        return f"New tweet from {username}: {tweet.get('text')}"
+
+    def on_delivered(self, username, tweet, entry=None):
+        """
+        Delivery callback: records the tweet's lag and clears its outbox entry.
+        """
+        observe_delivery_lag(username, tweet)
+        if entry is not None:
+            self.checkpoint_store.mark_delivered(entry)
+
+    def forward(self, username, tweets):
+        """
+        Queues `tweets` for Telegram. With a checkpoint store the messages go to
+        the outbox together with the account's new watermark, and leave it only
+        once Telegram has accepted them.
+        """
+        if tweets and username not in self.last_tweet_ids:
+            # Removed while this poll was in flight (e.g. handed to another shard). Its
+            # watermark was not advanced, so whoever tracks it next fetches these again.
+            logger.info(f"Dropped {len(tweets)} tweets from {username}, which is no longer tracked")
+            return
+        with self.forward_lock:
+            fresh = [tweet for tweet in tweets if self.dedup.check_and_add(tweet)]
+            # One delivery per destination chat; all of them share the queue's dispatchers.
+            deliveries = [(tweet, chat_id, message) for tweet in fresh
+                          for chat_id, message in self.destinations(username, tweet)]
+            if self.checkpoint_store and tweets:
+                # The watermark advances even when every tweet was a duplicate.
+                entries = self.checkpoint_store.stage_poll(
+                    username, self.last_tweet_ids.get(username),
+                    [(tweet.get("id"), message, chat_id) for tweet, chat_id, message in deliveries])
+        if len(fresh) < len(tweets):
+            logger.info(f"Skipped {len(tweets) - len(fresh)} already forwarded tweets from {username}")
+        if self.checkpoint_store and tweets:
+            for (tweet, _, _), entry in zip(deliveries, entries):
+                self.enqueue_entry(entry, partial(self.on_delivered, username, tweet, entry),
+                                   media=self.media_for(tweet))
+        else:
+            for tweet, chat_id, message in deliveries:
+                self.delivery_queue.enqueue(message, chat_id=chat_id, media=self.media_for(tweet),
+                                            on_delivered=partial(self.on_delivered, username, tweet))
+        for tweet, chat_id, _ in deliveries:
+            logger.info(f"Queued tweet id {tweet.get('id')} from {username} for Telegram"
+                        f"{f' chat {chat_id}' if chat_id else ''}.")
+        unrouted = len(fresh) - len({id(tweet) for tweet, _, _ in deliveries})
+        if unrouted:
+            logger.info(f"Dropped {unrouted} tweets from {username} that matched no route")
+
+    def destinations(self, username, tweet):
+        """
+        Returns [(chat_id, message)] for `tweet`: the router's chats, or the
+        default chat (None) when there is no router.
+        """
+        if self.router is None:
+            return [(None, self.format_message(username, tweet))]
+        destinations = []
+        for chat_id, template in self.router.route(username, tweet):
+            message = None
+            if template:
+                try:
+                    message = render(template, username, tweet)
+                except (KeyError, IndexError, ValueError, AttributeError) as e:
+                    # The watermark already moved past this tweet, so never drop it.
+                    logger.error(f"Route template {template!r} failed for tweet {tweet.get('id')}: {e!r}")
+            destinations.append((chat_id, message or self.format_message(username, tweet)))
+        return destinations
+
+    def media_for(self, tweet):
+        return getattr(tweet, "media", None) if self.forward_media else None
+
+    def record_tweets(self, username, tweets, watermark=None):
+        """
+        Advances the since_id watermark for `username` past `tweets` (oldest
+        first), or to `watermark` if given, and returns them.
+        """
+        previous_id = self.last_tweet_ids.get(username)
+        if watermark is None and tweets:
+            watermark = tweets[-1].get("id")
+        if watermark is not None:
+            # Update last_tweet_ids so we do not resend the same tweet.
+            with self.lock:
+                # A poll still in flight when its account was removed leaves no state behind.
+                if username in self.last_tweet_ids:
+                    self.last_tweet_ids[username] = watermark
+        if previous_id is not None:
+            # The first poll returns arbitrary history, so only later ones measure activity.
+            self.poll_policy.observe(username, len(tweets))
+        return tweets
+
+    def fetch_options(self, username, since_id):
+        """
+        Returns (page_size, max_pages) for the next timeline poll. After a long
+        gap (a restart, a backoff) or a poll that filled every page, the
+        account switches to catch-up mode with larger pages.
+        """
+        if since_id is None:
+            # No watermark yet: just the latest page, like before.
+            return self.page_size, 1
+        last_polled = self.last_polled_at.get(username)
+        if username in self.catching_up or last_polled is None or time.time() - last_polled > self.catchup_after:
+            return self.catchup_page_size, self.catchup_max_pages
+        return self.page_size, self.max_pages
+
+    def fetch_new_tweets(self, username, user_id):
+        """
+        Returns (tweets newer than the account's watermark, oldest first, and
+        the watermark to record, or None for the newest of them).
+        """
+        since_id = self.last_tweet_ids.get(username)
+        gap = self.gaps.get(username)
+        if since_id is not None and gap is not None:
+            until_id, resume_id = gap
+            return self.fill_gap(username, user_id, since_id, until_id, resume_id, [])
+        page_size, max_pages = self.fetch_options(username, since_id)
+        tweets = list(self.twitter_client.iter_user_tweets(
+            user_id, since_id=since_id, page_size=page_size, max_pages=max_pages
+        ))
+        self.note_poll(username, len(tweets), page_size * max_pages)
+        if since_id is None or len(tweets) < page_size * max_pages:
+            return tweets, None
+        # Every page was full, so older new tweets may be left: page back from
+        # the oldest one fetched with catch-up pages in this same poll.
+        return self.fill_gap(username, user_id, since_id, tweets[0].get("id"), tweets[-1].get("id"), tweets)
+
+    def fill_gap(self, username, user_id, since_id, until_id, resume_id, newer):
+        """
+        Fetches the tweets between `since_id` and `until_id` and returns them
+        followed by `newer`, with the watermark to record: `resume_id` once
+        the gap is covered, otherwise `since_id`, so the rest of the gap is
+        fetched by the next poll instead of being skipped.
+        """
+        capacity = self.catchup_page_size * self.catchup_max_pages
+        older = list(self.twitter_client.iter_user_tweets(
+            user_id, since_id=since_id, page_size=self.catchup_page_size, max_pages=self.catchup_max_pages,
+            until_id=until_id
+        ))
+        with self.lock:
+            if len(older) < capacity:
+                self.gaps.pop(username, None)
+                watermark = resume_id
+            else:
+                if username in self.last_tweet_ids:
+                    self.gaps[username] = (older[0].get("id"), resume_id)
+                watermark = since_id
+        if watermark == since_id:
+            logger.warning(f"More than {capacity} tweets from {username} are still missing after {since_id}; "
+                           f"fetching them in the next poll")
+        return older + newer, watermark
+
+    def note_poll(self, username, count, capacity):
+        with self.lock:
+            if username not in self.last_tweet_ids:
+                return
+            self.last_polled_at[username] = time.time()
+            if count >= capacity:
+                self.catching_up.add(username)
+            else:
+                self.catching_up.discard(username)
+
+    def handle_error(self, username, e):
+        # Rate limited: back off exactly until the endpoint's window resets.
+        if isinstance(e, RateLimitError):
+            with self.lock:
+                self.backoff_until[username] = e.reset_at
+            RATE_LIMIT_BACKOFFS_TOTAL.inc(account=username)
+            logger.error(f"Rate limit hit for {username}. Backing off for {e.retry_after:.0f} seconds.")
+        else:
+            logger.error(f"Error processing tweets for {username}: {e}")
+
+    @contextmanager
+    def polling(self, usernames):
+        """
+        Marks `usernames` as being polled for the duration of the block.
+        """
+        usernames = list(usernames)
+        with self.lock:
+            for username in usernames:
+                self.in_flight[username] = self.in_flight.get(username, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                for username in usernames:
+                    if self.in_flight[username] <= 1:
+                        del self.in_flight[username]
+                    else:
+                        self.in_flight[username] -= 1
+
+    def is_polling(self, username):
+        with self.lock:
+            return username in self.in_flight
+
+    def may_poll(self, username):
+        """
+        False once `username` was removed or this worker's leases lapsed.
+        """
+        if self.active_until is not None and time.time() >= self.active_until:
+            logger.warning(f"Skipping {username}: leases expired before they could be renewed")
+            return False
+        return username in self.last_tweet_ids
+
+    def check_username(self, username):
+        with self.polling([username]):
+            if self.may_poll(username):
+                self._check_username(username)
+
+    def _check_username(self, username):
+        if self.is_backed_off(username):
             return
 
         try:
-            user_id = self.twitter_client.get_user_id(username)
-            tweets_data = self.twitter_client.get_user_tweets(
-                user_id, 
-                since_id=self.last_tweet_ids.get(username)
-            )
-            tweets = tweets_data.get("data", [])
-            if tweets:
-                # Update last_tweet_ids so we do not resend the same tweet.
-                with self.lock:
-                    self.last_tweet_ids[username] = tweets[0].get("id")
-                for tweet in tweets:
-                    message = f"New tweet from {username}: {tweet.get('text')}"
-                    self.telegram_bot.send_message(message)
-                    logger.info(f"Forwarded tweet id {tweet.get('id')} from {username} to Telegram.")
+            user_id = self.user_resolver.resolve(username)
+            if user_id is None:
+                logger.error(f"Skipping {username}: user id could not be resolved")
+                return
+            tweets, watermark = self.fetch_new_tweets(username, user_id)
+            self.forward(username, self.record_tweets(username, tweets, watermark))
+            if not tweets and watermark is not None and self.checkpoint_store:
+                # A gap closed without older tweets; forward() only stages polls with tweets.
+                self.checkpoint_store.stage_watermark(username, watermark)
         except Exception as e:
-            error_str = str(e)
-            # If error indicates a rate limit (429), set a backoff of, for example, 30 seconds.
-            if "429" in error_str:
-                backoff_time = 30  # seconds
-                with self.lock:
-                    self.backoff_until[username] = time.time() + backoff_time
-                logger.error(f"Rate limit hit for {username}. Backing off for {backoff_time} seconds.")
-            else:
-                logger.error(f"Error processing tweets for {username}: {e}")
+            self.handle_error(username, e)
+
+    def check_batch(self, batch_id):
+        """
+        Polls one OR-batched search query and forwards the results per account.
+        """
+        with self.polling(self.search_batcher.members(batch_id)):
+            if self.active_until is None or time.time() < self.active_until:
+                self._check_batch(batch_id)
+
+    def _check_batch(self, batch_id):
+        if self.is_backed_off(batch_id):
+            return
+
+        try:
+            query, since_id = self.search_batcher.query_for(batch_id)
+            if query is None:
+                return
+            gap = self.search_batcher.gap(batch_id)
+            until_id = gap[0] if gap else None
+            pages = []
+            next_token = None
+            # Without a watermark only take the latest page, not a week of history.
+            max_pages = self.max_search_pages if since_id else 1
+            for _ in range(max_pages):
+                data = self.twitter_client.search_recent_tweets(query, since_id=since_id, next_token=next_token,
+                                                                until_id=until_id)
+                pages.append(data)
+                next_token = data.get("meta", {}).get("next_token")
+                if not next_token:
+                    break
+            results = self.search_batcher.fan_out(batch_id, pages)
+            _, batch_since_id = self.search_batcher.query_for(batch_id)
+            gap_open = self.search_batcher.gap(batch_id) is not None
+            for username in self.search_batcher.members(batch_id):
+                # After a rebalance a batch may start from an older watermark.
+                last_id = self.last_tweet_ids.get(username)
+                tweets = [tweet for tweet in results.get(username, []) if is_newer(tweet["id"], last_id)]
+                if gap_open:
+                    # Older results are still missing: keep the watermark before them.
+                    watermark = last_id if last_id is not None else since_id
+                elif until_id is not None and is_newer(batch_since_id, last_id):
+                    # The gap is covered: jump to the newest result already forwarded.
+                    watermark = batch_since_id
+                else:
+                    watermark = None
+                if not tweets and last_id is None and batch_since_id is not None and watermark is None:
+                    # Quiet accounts inherit the batch watermark so later polls measure their activity.
+                    with self.lock:
+                        if username in self.last_tweet_ids:
+                            self.last_tweet_ids[username] = batch_since_id
+                # Search results are newest first.
+                self.forward(username, self.record_tweets(username, tweets[::-1], watermark))
+                if not tweets and watermark is not None and watermark != last_id and self.checkpoint_store:
+                    self.checkpoint_store.stage_watermark(username, watermark)
+        except Exception as e:
+            self.handle_error(batch_id, e)
+
+    def rebalance_batches(self):
+        """
+        Re-packs search batches left partly empty by removals when that saves
+        a batch, moving the scheduler from the old batch ids to the new ones.
+        """
+        old_ids = set(self.search_batcher.batch_ids())
+        new_ids = self.search_batcher.rebalance(force=False)
+        if new_ids is None:
+            return
+        for batch_id in old_ids - set(new_ids):
+            self.scheduler.remove(batch_id)
+        if self.scheduler.running:
+            for batch_id in new_ids:
+                self.scheduler.schedule(batch_id)
+        logger.info(f"Re-packed {len(old_ids)} search batches into {len(new_ids)}")
+
+    def within_deadline(self, check, key):
+        """
+        Runs check(key) with a poll_deadline that starts now applied to this
+        thread, so its requests give up when it passes.
+        """
+        if self.poll_deadline is None:
+            return check(key)
+        with Deadline(self.poll_deadline).apply():
+            return check(key)
+
+    def poll_batch(self, batch_id):
+        """
+        Scheduler callback for batch_search mode.
+        """
+        with POLL_SECONDS.time(mode="batch"):
+            self.within_deadline(self.check_batch, batch_id)
+        self.save_dedup_if_due()
+        return self.next_due(batch_id)
+
+    def save_dedup_if_due(self):
+        """
+        Saves the dedup index on its interval. With a checkpoint store, the
+        staged watermarks and outbox rows are flushed first: a saved tweet id
+        whose rows were lost in a crash would be skipped as a duplicate on
+        restart and never delivered.
+        """
+        if not self.dedup.save_due():
+            return
+        if self.checkpoint_store is None:
+            self.dedup.save()
+            return
+        with self.forward_lock:
+            snapshot = self.dedup.snapshot()
+        if self.checkpoint_store.flush():
+            self.dedup.save(snapshot)
+        else:
+            self.dedup.dirty = True
+
+    def interval_for(self, key):
+        """
+        Adaptive interval for an account, or for a search batch the interval of
+        its busiest member.
+        """
+        if self.search_batcher and key in self.search_batcher.batches:
+            members = self.search_batcher.members(key)
+            return min((self.poll_policy.interval(name) for name in members), default=self.poll_interval)
+        return self.poll_policy.interval(key)
+
+    def next_due(self, username):
+        """
+        Returns when `username` should next be polled; backoff pushes it forward.
+        """
+        return max(time.time() + self.interval_for(username), self.backoff_until.get(username, 0))
+
+    def poll_account(self, username):
+        """
+        Scheduler callback: checks one account and returns its next due time.
+        """
+        with POLL_SECONDS.time(mode="account"):
+            self.within_deadline(self.check_username, username)
+        self.save_dedup_if_due()
+        return self.next_due(username)
 
-    def fetch_and_forward(self):
-        # Use a thread pool to check all usernames concurrently.
-        with ThreadPoolExecutor(max_workers=len(self.usernames)) as executor:
-            futures = {executor.submit(self.check_username, username): username for username in self.usernames}
+    def fetch_and_forward(self, usernames=None):
+        """
+        Runs a single check of every account (or of `usernames`) and waits for
+        all of them and for the resulting Telegram deliveries. Each check gets
+        its own poll_deadline from the moment it starts, so a stalled request
+        holds up its worker for at most that long and checks queued behind it
+        still run in full.
+        """
+        if usernames is not None:
+            keys, check = list(usernames), self.check_username
+        elif self.search_batcher:
+            keys, check = self.search_batcher.batch_ids(), self.check_batch
+        else:
+            keys, check = self.usernames, self.check_username
+        if not keys:
+            return
+        with POLL_SECONDS.time(mode="cycle"), \
+                ThreadPoolExecutor(max_workers=min(len(keys), self.max_workers)) as executor:
+            futures = {executor.submit(self.within_deadline, check, key): key for key in keys}
             for future in as_completed(futures):
                 try:
                     future.result()
                 except Exception as e:
                     username = futures[future]
                     logger.error(f"Error processing {username}: {e}")
+        if self.checkpoint_store:
+            self.checkpoint_store.flush()
+        self.delivery_queue.drain()
+        if self.checkpoint_store:
+            self.checkpoint_store.flush()
+
+    def handle_stream_tweet(self, username, tweet):
+        """
+        FilteredStream callback: forwards a pushed tweet like a polled one.
+        """
+        if username not in self.last_tweet_ids:
+            logger.info(f"Ignoring stream tweet {tweet.get('id')} from untracked {username}")
+            return
+        if not is_newer(tweet["id"], self.last_tweet_ids.get(username)):
+            return
+        self.forward(username, self.record_tweets(username, [tweet]))
+
+    def recover_stream_gap(self, reconnect):
+        """
+        After a reconnect, polls accounts with a watermark once in the
+        background so tweets posted while disconnected are not missed.
+        """
+        if not reconnect:
+            return
+        usernames = [name for name in self.usernames if self.last_tweet_ids.get(name)]
+        if usernames:
+            threading.Thread(target=self.fetch_and_forward, args=(usernames,),
+                             name="stream-gap-recovery", daemon=True).start()
+
+    def run_filtered_stream(self):
+        """
+        Consumes the filtered stream until stop(). Returns False if the stream
+        is not available on our API tier.
+        """
+        self.filtered_stream = FilteredStream(self.twitter_client, self.handle_stream_tweet,
+                                              on_connect=self.recover_stream_gap)
+        if self.stop_event.is_set():
+            return True
+        try:
+            self.filtered_stream.run(list(self.usernames))
+            return True
+        except StreamUnavailableError as e:
+            logger.warning(f"{e}; falling back to polling")
+            self.filtered_stream = None
+            return False
+
+    def run_polling(self):
+        now = time.time()
+        keys = self.search_batcher.batch_ids() if self.search_batcher else self.usernames
+        # Stagger the first polls across one interval instead of firing all at once.
+        for i, key in enumerate(keys):
+            self.scheduler.schedule(key, now + i * self.poll_interval / len(keys))
+        self.scheduler.start()
+        while not self.stop_event.wait(1):
+            pass
 
     def start_stream(self):
         logger.info("Starting tweet stream...")
+        self.stop_event.clear()
+        self.delivery_queue.start()
+        if self.checkpoint_store:
+            self.checkpoint_store.start()
+        if self.metrics_server:
+            self.metrics_server.start()
+        if self.watchlist_file:
+            # Apply the file once up front so the first polls already use it.
+            self.watchlist_file.check()
+            self.watchlist_file.start()
+        if self.control_server:
+            self.control_server.start()
         try:
-            while True:
-                self.fetch_and_forward()
-                time.sleep(self.poll_interval)
+            if not (self.use_filtered_stream and self.run_filtered_stream()):
+                self.run_polling()
         except KeyboardInterrupt:
             logger.info("Tweet stream stopped by user.")
         except Exception as e:
             logger.error(f"Stream encountered an error: {e}")
+        finally:
+            self.scheduler.stop(timeout=5)
+            self.delivery_queue.stop()
+            if self.checkpoint_store:
+                self.checkpoint_store.stop()
+            if self.dedup.path:
+                self.dedup.save()
+            if self.media_sender and self.media_sender.file_ids.path:
+                self.media_sender.file_ids.save()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.watchlist_file:
+                self.watchlist_file.stop()
+            if self.control_server:
+                self.control_server.stop()
+
+    def stop(self):
+        """
+        Stops start_stream() from another thread.
+        """
+        self.stop_event.set()
+        if self.filtered_stream:
+            self.filtered_stream.stop()
+
+
+if __name__ == "__main__":
+    # `python -m src.streamer` (the Dockerfile's command) is the multi-account mode.
+    import sys
+    from src.cli import main
+    main(["stream", *sys.argv[1:]])
@@ -1,32 +1,110 @@
 import os
+import time
 import logging
-import requests
 from requests.exceptions import RequestException
-from dotenv import load_dotenv
-
-# Load environment variables from the config/.env file
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config/.env'))
+from config.settings import load_env
+from src.http_transport import DEFAULT_TIMEOUT, get_shared_transport, multipart_stream
+from src.metrics import record_request
+from src.resilience import CircuitBreakers, guarded, request_timeout
 
 logger = logging.getLogger(__name__)
 
+class TelegramRateLimitError(Exception):
+    """
+    Raised when Telegram answers 429; `retry_after` is the wait it asks for.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 class TelegramBot:
-    def __init__(self):
+    def __init__(self, transport=None, api_url=None, breakers=None, timeout=None):
+        """
+        :param transport: HTTP transport to use; defaults to the shared pooled transport.
+        :param api_url: Bot API base URL; defaults to TELEGRAM_API_URL or https://api.telegram.org.
+        :param breakers: CircuitBreakers per method; by default 5 failures open a circuit for 30s.
+        :param timeout: Request timeout in seconds; defaults to the transport's (HTTP_TIMEOUT for the
+                        shared one). Media uploads pass their own.
+        """
+        load_env()
+        self.transport = transport or get_shared_transport()
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
         if not self.bot_token or not self.chat_id:
             raise ValueError("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID is not set in the environment")
-        self.api_url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        base_url = (api_url or os.getenv("TELEGRAM_API_URL") or "https://api.telegram.org").rstrip("/")
+        self.method_url = f"{base_url}/bot{self.bot_token}"
+        self.api_url = f"{self.method_url}/sendMessage"
+        self.breakers = breakers or CircuitBreakers("telegram")
+        self.timeout = timeout if timeout is not None else getattr(self.transport, "timeout", DEFAULT_TIMEOUT)
+
+    def health(self):
+        """
+        Returns the state of every method's circuit breaker.
+        """
+        return {"breakers": self.breakers.states()}
+
+    def _call(self, method, timeout=None, **kwargs):
+        """
+        POSTs to a Bot API method, recording metrics and raising
+        TelegramRateLimitError on 429. Returns the decoded response.
+        Sends are not idempotent, so they are never hedged, but the method's
+        circuit breaker fails them fast (CircuitOpenError) while Telegram is
+        down, and the timeout is cut to the calling thread's deadline.
+        """
+        full_timeout = self.timeout if timeout is None else timeout
+        timeout = request_timeout(full_timeout)
+        with guarded(self.breakers.get(method), timeout, full_timeout) as outcome:
+            started = time.perf_counter()
+            try:
+                response = self.transport.post(f"{self.method_url}/{method}", timeout=timeout, **kwargs)
+            except RequestException:
+                record_request("telegram", method, None, time.perf_counter() - started)
+                raise
+            outcome["status"] = response.status_code
+        record_request("telegram", method, response.status_code, time.perf_counter() - started)
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+            except ValueError:
+                retry_after = 1
+            logger.warning(f"Telegram flood control: retry after {retry_after} seconds")
+            raise TelegramRateLimitError(f"Telegram rate limit (HTTP 429), retry after {retry_after}s",
+                                         retry_after=retry_after)
+        response.raise_for_status()
+        return response.json()
 
-    def send_message(self, message):
+    def send_message(self, message, chat_id=None):
         payload = {
-            "chat_id": self.chat_id,
+            "chat_id": chat_id or self.chat_id,
             "text": message
         }
         try:
-            response = requests.post(self.api_url, data=payload, timeout=10)
-            response.raise_for_status()
+            result = self._call("sendMessage", data=payload)
             logger.info("Message sent to Telegram successfully")
-            return response.json()
+            return result
         except RequestException as e:
             logger.error(f"Error sending message to Telegram: {e}")
             raise
+
+    def send_media(self, method, fields, files=None, chat_id=None, timeout=300):
+        """
+        Sends photos or videos with sendMediaGroup, sendPhoto, sendVideo or
+        sendAnimation. `fields` are the method's form fields, with media given
+        as a file_id, a URL or "attach://<name>" for an entry of `files`.
+        Files are (name, filename, content_type, chunks) and are streamed as
+        multipart chunks, so they are never held in memory whole.
+        """
+        fields = {"chat_id": chat_id or self.chat_id, **fields}
+        try:
+            if files:
+                content_type, body = multipart_stream(fields, files)
+                result = self._call(method, data=body, headers={"Content-Type": content_type}, timeout=timeout)
+            else:
+                result = self._call(method, data=fields, timeout=timeout)
+            logger.info(f"Media sent to Telegram successfully ({method})")
+            return result
+        except RequestException as e:
+            logger.error(f"Error sending media to Telegram: {e}")
+            raise
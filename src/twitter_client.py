@@ -1,32 +1,136 @@
 import os
+import time
 import logging
-import requests
-from requests.exceptions import RequestException
-from dotenv import load_dotenv
-
-# Load environment variables from the config/.env file
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config/.env'))
+from functools import partial
+from requests.exceptions import RequestException, HTTPError
+from config.settings import load_env
+from src.http_transport import DEFAULT_TIMEOUT, get_shared_transport
+from src.rate_limiter import RateLimitError, parse_rate_limit_headers
+from src.credential_pool import CredentialPool
+from src.metrics import record_request
+from src.resilience import CircuitBreakers, Hedger, guarded, request_timeout
+from src.models import (TWEET_FIELDS, USER_FIELDS, MEDIA_TWEET_FIELDS, MEDIA_EXPANSIONS, MEDIA_FIELDS, loads,
+                        parse_tweets)
 
 logger = logging.getLogger(__name__)
 
+
 class TwitterClient:
-    def __init__(self):
-        self.bearer_token = os.getenv("TWITTER_BEARER_TOKEN")
-        if not self.bearer_token:
-            raise ValueError("TWITTER_BEARER_TOKEN is not set in the environment")
-        self.api_url = "https://api.twitter.com/2"
-        self.headers = {
-            "Authorization": f"Bearer {self.bearer_token}"
+    def __init__(self, transport=None, rate_limiter=None, api_url=None, credentials=None, include_media=False,
+                 timeout=None, hedger=None, breakers=None):
+        """
+        :param transport: HTTP transport to use; defaults to the shared pooled transport.
+        :param rate_limiter: RateLimitBudget pacing requests per endpoint (single-token setups).
+        :param api_url: API base URL; defaults to TWITTER_API_URL or https://api.twitter.com/2.
+        :param credentials: CredentialPool of bearer tokens; defaults to TWITTER_BEARER_TOKENS
+                            (comma-separated) or TWITTER_BEARER_TOKEN.
+        :param include_media: Expand attached photos and videos into `includes.media`.
+        :param timeout: Request timeout in seconds; defaults to the transport's (HTTP_TIMEOUT for the
+                        shared one). A deadline applied to the calling thread cuts it shorter.
+        :param hedger: Hedger for GET requests; by default one hedging after the endpoint's p95.
+                       Set the `hedger` attribute to None to turn hedging off.
+        :param breakers: CircuitBreakers per endpoint; by default 5 failures open a circuit for 30s.
+        """
+        load_env()
+        self.transport = transport or get_shared_transport()
+        self.credentials = credentials or CredentialPool.from_env(rate_limiter=rate_limiter)
+        self.api_url = (api_url or os.getenv("TWITTER_API_URL") or "https://api.twitter.com/2").rstrip("/")
+        self.include_media = include_media
+        self.timeout = timeout if timeout is not None else getattr(self.transport, "timeout", DEFAULT_TIMEOUT)
+        self.hedger = hedger or Hedger()
+        self.breakers = breakers or CircuitBreakers("twitter")
+
+    def _send(self, method, endpoint, url, **kwargs):
+        send = partial(self.transport.request, method, url, **kwargs)
+        if self.hedger is None or method != "GET" or kwargs.get("stream"):
+            return send()
+        return self.hedger.call(endpoint, send)
+
+    def _request(self, method, endpoint, url, timeout=None, **kwargs):
+        """
+        Sends a request with the bearer token that has the most headroom on
+        `endpoint`, records the budget reported back and raises
+        RateLimitError on 429. A 429 or 401 on one token is retried at once
+        on another token that has a free slot.
+
+        The timeout is cut to the calling thread's deadline, GETs are hedged
+        and the endpoint's circuit breaker may fail the call fast with
+        CircuitOpenError.
+        """
+        full_timeout = self.timeout if timeout is None else timeout
+        breaker = self.breakers.get(endpoint)
+        tried = []
+        last_error = None
+        while True:
+            timeout = request_timeout(full_timeout)
+            with guarded(breaker, timeout, full_timeout) as outcome:
+                try:
+                    credential = self.credentials.acquire(endpoint, max_wait=0 if tried else None, exclude=tried)
+                except RateLimitError:
+                    if last_error is not None:
+                        raise last_error
+                    raise
+                tried.append(credential)
+                started = time.perf_counter()
+                try:
+                    response = self._send(method, endpoint, url, headers=credential.headers, timeout=timeout,
+                                          **kwargs)
+                except RequestException:
+                    record_request("twitter", endpoint, None, time.perf_counter() - started)
+                    raise
+                outcome["status"] = response.status_code
+            record_request("twitter", endpoint, response.status_code, time.perf_counter() - started)
+            self.credentials.update(credential, endpoint, response.headers)
+            last_error = None
+            if response.status_code == 429:
+                _, _, reset_at = parse_rate_limit_headers(response.headers)
+                last_error = RateLimitError(f"Rate limit exceeded (HTTP 429) for {endpoint}",
+                                            endpoint=endpoint, reset_at=reset_at)
+                self.credentials.block_until(credential, endpoint, last_error.reset_at)
+            elif response.status_code == 401:
+                self.credentials.revoke(credential, f"HTTP 401 on {endpoint}")
+                try:
+                    response.raise_for_status()
+                except HTTPError as e:
+                    last_error = e
+            else:
+                response.raise_for_status()
+                return response
+            if len(tried) >= len(self.credentials.credentials):
+                raise last_error
+
+    def health(self):
+        """
+        Returns the state of every endpoint's circuit breaker and the hedging stats.
+        """
+        return {
+            "breakers": self.breakers.states(),
+            "hedging": self.hedger.stats() if self.hedger else None,
         }
-    
+
+    def _tweet_params(self, params):
+        """
+        Adds the media expansion to tweet lookup `params` when include_media is set.
+        """
+        if self.include_media:
+            params["tweet.fields"] = f"{params['tweet.fields']},{MEDIA_TWEET_FIELDS}"
+            params["expansions"] = ",".join(filter(None, [params.get("expansions"), MEDIA_EXPANSIONS]))
+            params["media.fields"] = MEDIA_FIELDS
+        return params
+
+    def _get(self, endpoint, url, params=None):
+        return self._request("GET", endpoint, url, params=params)
+
+    def _get_json(self, endpoint, url, params=None):
+        # Decodes the raw body with the fastest available JSON decoder.
+        return loads(self._get(endpoint, url, params=params).content)
+
     def get_user_id(self, username):
         # Remove leading '@' if present
         username = username.lstrip('@')
         url = f"{self.api_url}/users/by/username/{username}"
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json("users/by/username", url)
             user_id = data.get("data", {}).get("id")
             if not user_id:
                 logger.error(f"User ID not found for username: {username}")
@@ -37,19 +141,177 @@ class TwitterClient:
             logger.error(f"Error fetching user id for {username}: {e}")
             raise
 
-    def get_user_tweets(self, user_id, since_id=None, max_results=5):
-        url = f"{self.api_url}/users/{user_id}/tweets"
+    def get_user_ids(self, usernames):
+        """
+        Resolves up to 100 usernames in a single call to the multi-user lookup
+        endpoint. Returns a dict mapping username (as returned by the API) to
+        user ID; usernames that do not exist are left out.
+        """
+        usernames = [username.lstrip('@') for username in usernames]
+        if not usernames:
+            return {}
+        if len(usernames) > 100:
+            raise ValueError("At most 100 usernames can be looked up per request")
+        url = f"{self.api_url}/users/by"
         params = {
-            "max_results": max_results
+            "usernames": ",".join(usernames)
         }
+        try:
+            data = self._get_json("users/by", url, params=params)
+            user_ids = {user["username"]: user["id"] for user in data.get("data", [])}
+            for error in data.get("errors", []):
+                logger.warning(f"User lookup error for {error.get('value')}: {error.get('detail')}")
+            logger.info(f"Retrieved {len(user_ids)} user ids for {len(usernames)} usernames")
+            return user_ids
+        except RequestException as e:
+            logger.error(f"Error fetching user ids for {len(usernames)} usernames: {e}")
+            raise
+
+    def get_user_tweets(self, user_id, since_id=None, max_results=5, pagination_token=None, start_time=None,
+                        end_time=None, until_id=None):
+        url = f"{self.api_url}/users/{user_id}/tweets"
+        params = self._tweet_params({
+            "max_results": max_results,
+            "tweet.fields": TWEET_FIELDS
+        })
         if since_id:
             params["since_id"] = since_id
+        if until_id:
+            params["until_id"] = until_id
+        if pagination_token:
+            params["pagination_token"] = pagination_token
+        if start_time:
+            params["start_time"] = start_time
+        if end_time:
+            params["end_time"] = end_time
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json("users/tweets", url, params=params)
             logger.info(f"Fetched tweets for user_id {user_id}")
             return data
         except RequestException as e:
             logger.error(f"Error fetching tweets for user_id {user_id}: {e}")
             raise
+
+    def iter_user_tweets(self, user_id, since_id=None, page_size=5, max_pages=3, until_id=None):
+        """
+        Yields the tweets newer than `since_id` (and older than `until_id`, if
+        given), oldest first, following meta.next_token for up to `max_pages`
+        pages of `page_size` tweets.
+
+        The timeline is served newest first, so pages are held until the last
+        one arrives; memory is bounded by page_size * max_pages. If the gap is
+        longer than that, the oldest tweets beyond it are not fetched; callers
+        can page further back with until_id set to the oldest tweet yielded.
+        """
+        pages = []
+        next_token = None
+        for _ in range(max_pages):
+            data = self.get_user_tweets(user_id, since_id=since_id, max_results=page_size,
+                                        pagination_token=next_token, until_id=until_id)
+            page = parse_tweets(data)
+            if page:
+                pages.append(page)
+            next_token = data.get("meta", {}).get("next_token")
+            if not next_token:
+                break
+        if next_token and since_id:
+            logger.warning(f"More than {page_size * max_pages} new tweets for user_id {user_id}; "
+                           f"older ones were not fetched")
+        for page in reversed(pages):
+            yield from reversed(page)
+
+    def search_recent_tweets(self, query, since_id=None, max_results=100, next_token=None, until_id=None):
+        """
+        Calls the recent search endpoint, expanding author_id so results for
+        OR-batched `from:` queries can be attributed to each account.
+        `until_id` limits it to tweets older than that one.
+        """
+        url = f"{self.api_url}/tweets/search/recent"
+        params = self._tweet_params({
+            "query": query,
+            "max_results": max_results,
+            "expansions": "author_id",
+            "tweet.fields": TWEET_FIELDS,
+            "user.fields": USER_FIELDS
+        })
+        if since_id:
+            params["since_id"] = since_id
+        if until_id:
+            params["until_id"] = until_id
+        if next_token:
+            params["next_token"] = next_token
+        try:
+            data = self._get_json("tweets/search/recent", url, params=params)
+            logger.info(f"Fetched {data.get('meta', {}).get('result_count', 0)} search results")
+            return data
+        except RequestException as e:
+            logger.error(f"Error searching recent tweets: {e}")
+            raise
+
+    def search_all_tweets(self, query, max_results=500, next_token=None, start_time=None, end_time=None):
+        """
+        Calls the full-archive search endpoint. Only some API tiers have it;
+        others answer 403.
+        """
+        url = f"{self.api_url}/tweets/search/all"
+        params = self._tweet_params({
+            "query": query,
+            "max_results": max_results,
+            "tweet.fields": TWEET_FIELDS
+        })
+        if next_token:
+            params["next_token"] = next_token
+        if start_time:
+            params["start_time"] = start_time
+        if end_time:
+            params["end_time"] = end_time
+        try:
+            data = self._get_json("tweets/search/all", url, params=params)
+            logger.info(f"Fetched {data.get('meta', {}).get('result_count', 0)} archive search results")
+            return data
+        except RequestException as e:
+            logger.error(f"Error searching the tweet archive: {e}")
+            raise
+
+    def get_stream_rules(self):
+        """
+        Returns the filtered stream rules currently installed for the app.
+        """
+        url = f"{self.api_url}/tweets/search/stream/rules"
+        try:
+            return self._get_json("tweets/search/stream/rules", url).get("data", [])
+        except RequestException as e:
+            logger.error(f"Error fetching filtered stream rules: {e}")
+            raise
+
+    def update_stream_rules(self, add=None, delete_ids=None):
+        """
+        Adds rules (a list of {"value", "tag"} dicts) and/or deletes rules by id.
+        """
+        url = f"{self.api_url}/tweets/search/stream/rules"
+        try:
+            result = {}
+            if delete_ids:
+                result["deleted"] = self._request("POST", "tweets/search/stream/rules", url,
+                                                  json={"delete": {"ids": list(delete_ids)}}).json()
+            if add:
+                result["added"] = self._request("POST", "tweets/search/stream/rules", url,
+                                                json={"add": list(add)}).json()
+            return result
+        except RequestException as e:
+            logger.error(f"Error updating filtered stream rules: {e}")
+            raise
+
+    def open_filtered_stream(self, read_timeout=30):
+        """
+        Connects to the filtered stream and returns the streaming response.
+        `read_timeout` bounds the silence tolerated between keep-alive lines.
+        """
+        url = f"{self.api_url}/tweets/search/stream"
+        params = self._tweet_params({
+            "expansions": "author_id",
+            "tweet.fields": TWEET_FIELDS,
+            "user.fields": USER_FIELDS
+        })
+        return self._request("GET", "tweets/search/stream", url, params=params, stream=True,
+                             timeout=(self.timeout, read_timeout))
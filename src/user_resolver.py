@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# The multi-user lookup endpoint accepts at most 100 usernames per request.
+MAX_LOOKUP_BATCH = 100
+
+
+class UserResolver:
+    """
+    Caches username -> user ID lookups so the poll loop does not hit
+    /users/by/username for IDs that never change.
+
+    Misses are resolved in bulk through TwitterClient.get_user_ids, entries
+    expire after `ttl` seconds and the least recently used entries are
+    evicted once `max_size` is reached. When `cache_path` is set the cache is
+    written to disk after every lookup and reloaded on startup.
+    """
+
+    def __init__(self, twitter_client, ttl=7 * 24 * 3600, max_size=10000, cache_path=None):
+        """
+        :param twitter_client: TwitterClient used to resolve cache misses.
+        :param ttl: Seconds before a cached user ID is looked up again.
+        :param max_size: Maximum number of cached usernames.
+        :param cache_path: Optional JSON file used to persist the cache.
+        """
+        self.twitter_client = twitter_client
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        # normalized username -> (user_id, expires_at), oldest first.
+        self.cache = OrderedDict()
+        if self.cache_path:
+            self.load()
+
+    @staticmethod
+    def normalize(username):
+        return username.lstrip('@').lower()
+
+    def _get_cached(self, key, now):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= now:
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return user_id
+
+    def _put(self, key, user_id, now):
+        self.cache[key] = (user_id, now + self.ttl)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def resolve(self, username):
+        """
+        Returns the user ID for a single username, or None if it cannot be resolved.
+        """
+        return self.resolve_many([username]).get(username)
+
+    def resolve_many(self, usernames):
+        """
+        Resolves a list of usernames, looking up cache misses in batches of
+        up to 100 names. Returns a dict mapping each resolved username (as
+        given) to its user ID; unknown usernames are left out.
+        """
+        now = time.time()
+        resolved = {}
+        missing = {}
+        with self.lock:
+            for username in usernames:
+                key = self.normalize(username)
+                user_id = self._get_cached(key, now)
+                if user_id is not None:
+                    resolved[username] = user_id
+                else:
+                    missing.setdefault(key, []).append(username)
+
+        if not missing:
+            return resolved
+
+        keys = list(missing)
+        fetched = {}
+        for start in range(0, len(keys), MAX_LOOKUP_BATCH):
+            batch = keys[start:start + MAX_LOOKUP_BATCH]
+            try:
+                fetched.update(self.twitter_client.get_user_ids(batch))
+            except Exception as e:
+                logger.error(f"Error resolving user ids for {len(batch)} usernames: {e}")
+
+        found = set()
+        with self.lock:
+            now = time.time()
+            for name, user_id in fetched.items():
+                key = self.normalize(name)
+                found.add(key)
+                self._put(key, user_id, now)
+                for username in missing.get(key, []):
+                    resolved[username] = user_id
+
+        for key in keys:
+            if key not in found:
+                logger.warning(f"Could not resolve user id for username: {key}")
+
+        if fetched and self.cache_path:
+            self.save()
+        return resolved
+
+    def invalidate(self, username):
+        with self.lock:
+            self.cache.pop(self.normalize(username), None)
+
+    def load(self):
+        """
+        Loads non-expired entries from `cache_path`, if the file exists.
+        """
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading user id cache from {self.cache_path}: {e}")
+            return
+        now = time.time()
+        with self.lock:
+            for key, (user_id, expires_at) in entries.items():
+                if expires_at > now:
+                    self.cache[key] = (user_id, expires_at)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        logger.info(f"Loaded {len(self.cache)} cached user ids from {self.cache_path}")
+
+    def save(self):
+        """
+        Atomically writes the cache to `cache_path`.
+        """
+        with self.lock:
+            entries = {key: list(value) for key, value in self.cache.items()}
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.error(f"Error saving user id cache to {self.cache_path}: {e}")
@@ -0,0 +1,209 @@
+import os
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+def parse_watchlist(text):
+    """
+    Parses a watchlist file: usernames separated by newlines, commas or
+    spaces, with optional leading '@' and '#' comments. Duplicates
+    (case-insensitive) are dropped, keeping the first spelling.
+    """
+    usernames = {}
+    for line in text.splitlines():
+        for name in line.split("#", 1)[0].replace(",", " ").split():
+            name = name.lstrip("@")
+            if name:
+                usernames.setdefault(name.lower(), name)
+    return list(usernames.values())
+
+
+class WatchlistFile:
+    """
+    Watches a watchlist file and hands its contents to `on_change` whenever
+    the file changes. Only the file's mtime and size are checked between
+    reloads, so polling it is cheap; a file that fails to read, changes
+    while being read, or reads as empty keeps the previous watchlist.
+    Editors that truncate and rewrite in place are caught by the latter two;
+    writing a temporary file and renaming it over the watchlist avoids them.
+    """
+
+    def __init__(self, path, on_change, interval=5, allow_empty=False):
+        """
+        :param path: Watchlist file (see parse_watchlist for the format).
+        :param on_change: Called with the full list of usernames after each change.
+        :param interval: Seconds between checks.
+        :param allow_empty: Apply a file listing no usernames (stop tracking everyone).
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.allow_empty = allow_empty
+        self.signature = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def read(self):
+        with open(self.path) as f:
+            return parse_watchlist(f.read())
+
+    def check(self):
+        """
+        Reloads the file if it changed since the last check. Returns True if
+        `on_change` was called.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            if self.signature is not None:
+                logger.error(f"Watchlist {self.path} is unreadable, keeping the current one: {e}")
+                self.signature = None
+            return False
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return False
+        try:
+            usernames = self.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Error reading watchlist {self.path}: {e}")
+            return False
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) != signature:
+            # Still being written; read it again on the next check.
+            return False
+        self.signature = signature
+        if not usernames and not self.allow_empty:
+            logger.warning(f"Watchlist {self.path} lists no usernames, keeping the current one")
+            return False
+        self.on_change(usernames)
+        return True
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Error applying watchlist {self.path}: {e}")
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="watchlist-file", daemon=True)
+        self.thread.start()
+        logger.info(f"Watching {self.path} for watchlist changes")
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+
+class ControlServer:
+    """
+    Small local HTTP endpoint for changing the watchlist without a restart:
+
+        GET  /watchlist                                   -> {"usernames": [...]}
+        PUT  /watchlist  {"usernames": [...]}             replace the watchlist
+        POST /watchlist  {"add": [...], "remove": [...]}  incremental change
+
+    Changes answer {"added": [...], "removed": [...], "count": n}. It binds
+    to localhost by default and has no authentication.
+    """
+
+    def __init__(self, streamer, host="127.0.0.1", port=8001):
+        """
+        :param streamer: Streamer whose watchlist is exposed.
+        :param host: Interface to bind.
+        :param port: Port to listen on; 0 picks a free one.
+        """
+        self.streamer = streamer
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def _handler(self):
+        streamer = self.streamer
+
+        def replace(payload):
+            return streamer.set_usernames(parse_watchlist("\n".join(payload["usernames"])))
+
+        def update(payload):
+            added = streamer.add_usernames(parse_watchlist("\n".join(payload.get("add", []))))
+            removed = streamer.remove_usernames(parse_watchlist("\n".join(payload.get("remove", []))))
+            return added, removed
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("expected a JSON object")
+                for key in ("usernames", "add", "remove"):
+                    value = payload.get(key, [])
+                    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+                        raise ValueError(f"{key} must be a list of usernames")
+                return payload
+
+            def change(self, apply):
+                if self.path.split("?")[0] != "/watchlist":
+                    self.send_error(404)
+                    return
+                try:
+                    payload = self.read_json()
+                    if apply is replace and "usernames" not in payload:
+                        raise ValueError("PUT needs the full list as usernames")
+                except ValueError as e:
+                    self.reply(400, {"error": str(e)})
+                    return
+                added, removed = apply(payload)
+                logger.info(f"Watchlist changed over the control endpoint: +{len(added)} -{len(removed)}")
+                self.reply(200, {"added": added, "removed": removed, "count": len(streamer.usernames)})
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/watchlist":
+                    self.send_error(404)
+                    return
+                self.reply(200, {"usernames": list(streamer.usernames)})
+
+            def do_PUT(self):
+                self.change(replace)
+
+            def do_POST(self):
+                self.change(update)
+
+        return Handler
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="control-server", daemon=True)
+        self.thread.start()
+        logger.info(f"Serving the watchlist control endpoint on {self.host}:{self.port}/watchlist")
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,124 @@
+"""
+Local fake of the Twitter v2 filtered stream and its rules endpoint, for tests.
+"""
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeStreamServer:
+    def __init__(self, status=200, heartbeat_interval=0.05, max_connection_seconds=None):
+        """
+        :param status: Status code returned by the stream endpoint (e.g. 403 to simulate an unsupported tier).
+        :param heartbeat_interval: Seconds between blank keep-alive lines.
+        :param max_connection_seconds: Close each stream connection after this long, to exercise reconnects.
+        """
+        self.status = status
+        self.heartbeat_interval = heartbeat_interval
+        self.max_connection_seconds = max_connection_seconds
+        self.rules = []
+        self.rule_ids = 0
+        self.messages = queue.Queue()
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/2"
+
+    def push(self, tweet, username):
+        """
+        Queues a tweet to be written to the open stream connection.
+        """
+        self.messages.put({
+            "data": dict(tweet, author_id=tweet.get("author_id", f"id_{username}")),
+            "includes": {"users": [{"id": tweet.get("author_id", f"id_{username}"), "username": username}]},
+            "matching_rules": [{"id": "1", "tag": "x-tweet-fetch"}],
+        })
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/2/tweets/search/stream/rules"):
+                    with fake.lock:
+                        self._send_json(200, {"data": list(fake.rules)})
+                elif self.path.startswith("/2/tweets/search/stream"):
+                    self._stream()
+                else:
+                    self._send_json(404, {"title": "Not Found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with fake.lock:
+                    for rule in body.get("add", []):
+                        fake.rule_ids += 1
+                        fake.rules.append(dict(rule, id=str(fake.rule_ids)))
+                    deleted = set(body.get("delete", {}).get("ids", []))
+                    fake.rules = [rule for rule in fake.rules if rule["id"] not in deleted]
+                self._send_json(200, {"meta": {"summary": {"created": len(body.get("add", [])),
+                                                           "deleted": len(deleted)}}})
+
+            def _chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self):
+                if fake.status != 200:
+                    self._send_json(fake.status, {"title": "Client Forbidden",
+                                                  "reason": "client-not-enrolled"})
+                    return
+                with fake.lock:
+                    fake.connections += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                elapsed = 0.0
+                try:
+                    while not fake.stopped.is_set():
+                        if fake.max_connection_seconds is not None and elapsed >= fake.max_connection_seconds:
+                            break
+                        try:
+                            message = fake.messages.get(timeout=fake.heartbeat_interval)
+                            # Split each message across two chunks to exercise incremental parsing.
+                            line = json.dumps(message).encode() + b"\r\n"
+                            self._chunk(line[:10])
+                            self._chunk(line[10:])
+                        except queue.Empty:
+                            self._chunk(b"\r\n")
+                        elapsed += fake.heartbeat_interval
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
@@ -0,0 +1,99 @@
+"""
+Offline stand-ins for HttpTransport and requests.Response, for tests.
+"""
+import json
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class FakeResponse:
+    """
+    Minimal stand-in for requests.Response returned by FakeTransport.
+    """
+
+    def __init__(self, status_code=200, json_data=None, headers=None, text=None, url="", body=None):
+        self.status_code = status_code
+        self._json_data = json_data
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.text = text if text is not None else json.dumps(json_data) if json_data is not None else ""
+        self.url = url
+        self._body = body
+        self.closed = False
+
+    @property
+    def content(self):
+        return self._body if self._body is not None else self.text.encode("utf-8")
+
+    def iter_content(self, chunk_size=1):
+        content = self.content
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        if self._json_data is None:
+            raise ValueError("No JSON body")
+        return self._json_data
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+
+class FakeTransport:
+    """
+    Offline transport for tests. Responses are queued per (method, url prefix)
+    and every call is recorded in `calls`.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._routes = []
+        self.lock = threading.Lock()
+
+    def add_response(self, method, url_prefix, response=None, **kwargs):
+        """
+        Queues a response for requests whose URL starts with `url_prefix`.
+        Pass either a FakeResponse, an Exception to raise, or FakeResponse kwargs.
+        The last queued response for a route is reused once the queue drains.
+        """
+        if response is None:
+            response = FakeResponse(**kwargs)
+        with self.lock:
+            for route in self._routes:
+                if route[0] == method and route[1] == url_prefix:
+                    route[2].append(response)
+                    return
+            self._routes.append((method, url_prefix, [response]))
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.calls.append((method, url, kwargs))
+            matches = [route for route in self._routes
+                       if route[0] == method and url.startswith(route[1])]
+            if not matches:
+                raise requests.exceptions.ConnectionError(f"No fake response for {method} {url}")
+            queue = max(matches, key=lambda route: len(route[1]))[2]
+            response = queue.pop(0) if len(queue) > 1 else queue[0]
+        if isinstance(response, Exception):
+            raise response
+        response.url = url
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        pass
@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import unittest
+from src import adaptive_polling
+
+
+class TestAdaptivePollPolicy(unittest.TestCase):
+    def test_busy_accounts_are_polled_more_often(self):
+        policy = adaptive_polling.AdaptivePollPolicy(min_interval=3, max_interval=300, half_life=600)
+        now = 0
+        for _ in range(60):
+            now += 60
+            policy.observe("busy", 10, now=now)
+            policy.observe("dormant", 0, now=now)
+
+        self.assertEqual(policy.interval("busy", now=now), 3)
+        self.assertGreater(policy.interval("dormant", now=now), 100)
+        self.assertGreater(policy.tweets_per_hour("busy"), policy.tweets_per_hour("dormant"))
+
+    def test_intervals_are_clamped(self):
+        policy = adaptive_polling.AdaptivePollPolicy(min_interval=5, max_interval=60)
+        policy.observe("quiet", 0, now=0)
+        policy.observe("quiet", 0, now=10 ** 7)
+        self.assertEqual(policy.interval("quiet"), 60)
+
+    def test_unobserved_accounts_use_initial_rate(self):
+        policy = adaptive_polling.AdaptivePollPolicy(min_interval=1, max_interval=600,
+                                                     initial_tweets_per_hour=36, target_tweets_per_poll=1)
+        self.assertAlmostEqual(policy.interval("new"), 100)
+
+    def test_time_of_day_profile_scales_interval(self):
+        night = [0.0] * 24
+        policy = adaptive_polling.AdaptivePollPolicy(min_interval=1, max_interval=600,
+                                                     profiles={"sleepy": night})
+        self.assertEqual(policy.interval("sleepy"), 600)
+        self.assertLess(policy.interval("other"), 600)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            adaptive_polling.AdaptivePollPolicy(min_interval=10, max_interval=5)
+        with self.assertRaises(ValueError):
+            adaptive_polling.AdaptivePollPolicy(default_profile=[1.0] * 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
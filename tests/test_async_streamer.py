@@ -0,0 +1,101 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Ensure the project root is in the sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import async_streamer
+from src.rate_limiter import RateLimitError
+
+class TestAsyncStreamer(unittest.TestCase):
+    def setUp(self):
+        twitter_patcher = patch('src.streamer.TwitterClient')
+        telegram_patcher = patch('src.streamer.TelegramBot')
+        self.addCleanup(twitter_patcher.stop)
+        self.addCleanup(telegram_patcher.stop)
+        self.mock_twitter_client = MagicMock()
+        self.mock_telegram_bot = MagicMock()
+        twitter_patcher.start().return_value = self.mock_twitter_client
+        telegram_patcher.start().return_value = self.mock_telegram_bot
+        self.mock_twitter_client.get_user_ids.side_effect = lambda names: {name: f"id_{name}" for name in names}
+
+    def test_fetch_and_forward_async(self):
+        self.mock_twitter_client.iter_user_tweets.return_value = [{"id": "111", "text": "Hello World"}]
+        streamer_instance = async_streamer.AsyncStreamer(["testuser"], poll_interval=0)
+
+        asyncio.run(streamer_instance.fetch_and_forward_async())
+
+        self.mock_twitter_client.iter_user_tweets.assert_called_with("id_testuser", since_id=None, page_size=5, max_pages=1)
+        self.mock_telegram_bot.send_message.assert_called_with("New tweet from testuser: Hello World")
+        self.assertEqual(streamer_instance.last_tweet_ids["testuser"], "111")
+
+        asyncio.run(streamer_instance.fetch_and_forward_async())
+        self.mock_twitter_client.iter_user_tweets.assert_called_with("id_testuser", since_id="111", page_size=5, max_pages=3)
+
+    def test_rate_limit_sets_backoff(self):
+        self.mock_twitter_client.iter_user_tweets.side_effect = RateLimitError("Rate limit exceeded (HTTP 429)", reset_at=time.time() + 30)
+        streamer_instance = async_streamer.AsyncStreamer(["testuser"], poll_interval=0)
+
+        asyncio.run(streamer_instance.fetch_and_forward_async())
+        self.assertGreater(streamer_instance.backoff_until["testuser"], time.time())
+
+        asyncio.run(streamer_instance.fetch_and_forward_async())
+        self.assertEqual(self.mock_twitter_client.iter_user_tweets.call_count, 1)
+        self.mock_telegram_bot.send_message.assert_not_called()
+
+    def test_concurrency_is_bounded(self):
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_fetch(user_id, since_id=None, page_size=5, max_pages=3):
+            with lock:
+                in_flight.append(user_id)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(user_id)
+            return []
+
+        self.mock_twitter_client.iter_user_tweets.side_effect = slow_fetch
+        usernames = [f"user{i}" for i in range(20)]
+        streamer_instance = async_streamer.AsyncStreamer(usernames, poll_interval=0, max_concurrency=3)
+
+        asyncio.run(streamer_instance.fetch_and_forward_async())
+        self.assertEqual(self.mock_twitter_client.iter_user_tweets.call_count, 20)
+        self.assertLessEqual(max(peak), 3)
+
+    def test_user_lookup_runs_off_the_event_loop(self):
+        self.mock_twitter_client.iter_user_tweets.return_value = []
+        streamer_instance = async_streamer.AsyncStreamer(["testuser"], poll_interval=0)
+        threads = []
+
+        def resolve(username):
+            threads.append(threading.current_thread())
+            return f"id_{username}"
+
+        streamer_instance.user_resolver.resolve = resolve
+        asyncio.run(streamer_instance.fetch_and_forward_async())
+
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_lost_lease_stops_polling(self):
+        streamer_instance = async_streamer.AsyncStreamer(["testuser"], poll_interval=0)
+        streamer_instance.active_until = time.time() - 1
+
+        asyncio.run(streamer_instance.fetch_and_forward_async())
+
+        self.mock_twitter_client.iter_user_tweets.assert_not_called()
+
+    def test_unsupported_modes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            async_streamer.AsyncStreamer(["testuser"], batch_search=True)
+
+if __name__ == '__main__':
+    unittest.main()
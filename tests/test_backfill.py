@@ -0,0 +1,144 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from requests.exceptions import HTTPError
+from src.backfill import Backfill, BackfillState, JsonlSink
+from src.checkpoint_store import CheckpointStore
+from tests.fake_transport import FakeResponse
+from src.rate_limiter import RateLimitError
+
+# alice's timeline: three pages, newest first.
+PAGES = {
+    None: {"data": [{"id": "30", "text": "c"}, {"id": "29", "text": "b"}], "meta": {"next_token": "t1"}},
+    "t1": {"data": [{"id": "20", "text": "a"}], "meta": {"next_token": "t2"}},
+    "t2": {"data": [{"id": "10", "text": "first"}], "meta": {}},
+}
+
+
+def timeline(user_id, max_results=5, pagination_token=None, start_time=None, end_time=None):
+    return PAGES[pagination_token]
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.dir, "history.jsonl")
+        self.client = MagicMock()
+        self.client.get_user_tweets.side_effect = timeline
+        self.resolver = MagicMock()
+        self.resolver.resolve_many.side_effect = lambda names: {name: f"id-{name}" for name in names}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def backfill(self, usernames=("alice",), **kwargs):
+        state = BackfillState(os.path.join(self.dir, "state.db"))
+        sink = JsonlSink(self.output)
+        self.addCleanup(state.close)
+        self.addCleanup(sink.close)
+        return Backfill(self.client, usernames, sink, state, user_resolver=self.resolver, **kwargs)
+
+    def lines(self):
+        with open(self.output) as f:
+            return [json.loads(line) for line in f]
+
+    def test_pages_every_account_into_jsonl(self):
+        summary = self.backfill().run()
+
+        self.assertEqual([record["id"] for record in self.lines()], ["30", "29", "20", "10"])
+        self.assertTrue(all(record["account"] == "alice" for record in self.lines()))
+        self.assertEqual(summary["completed"], 1)
+        self.assertEqual(summary["tweets"], 4)
+        state = BackfillState(os.path.join(self.dir, "state.db"))
+        self.addCleanup(state.close)
+        progress = state.load()["alice"]
+        self.assertTrue(progress.done)
+        self.assertEqual(progress.newest_id, "30")
+
+    def test_resumes_from_the_last_committed_page_without_duplicates(self):
+        def failing(user_id, pagination_token=None, **kwargs):
+            if pagination_token == "t2":
+                raise HTTPError("400 Client Error", response=FakeResponse(400))
+            return timeline(user_id, pagination_token=pagination_token)
+
+        self.client.get_user_tweets.side_effect = failing
+        first = self.backfill().run()
+        self.assertEqual(first["failed"], ["alice"])
+        with open(self.output, "a") as f:
+            # A page written but not committed when the process died.
+            f.write('{"id": "20", "text": "a"}\n{"id": "1')
+
+        self.client.get_user_tweets.side_effect = timeline
+        self.client.get_user_tweets.reset_mock()
+        self.backfill().run()
+
+        self.assertEqual([record["id"] for record in self.lines()], ["30", "29", "20", "10"])
+        self.assertEqual([call.kwargs["pagination_token"] for call in self.client.get_user_tweets.call_args_list],
+                         ["t2"])
+
+    def test_auto_source_falls_back_to_timeline_on_403(self):
+        self.client.search_all_tweets.side_effect = HTTPError("403 Forbidden", response=FakeResponse(403))
+
+        summary = self.backfill(source="auto").run()
+
+        self.assertEqual(summary["tweets"], 4)
+        self.client.search_all_tweets.assert_called_once()
+
+    def test_search_source_queries_the_archive_by_author(self):
+        self.client.search_all_tweets.return_value = {"data": [{"id": "5", "text": "old"}], "meta": {}}
+
+        self.backfill(source="search", start_time="2020-01-01T00:00:00Z").run()
+
+        kwargs = self.client.search_all_tweets.call_args.kwargs
+        self.assertEqual(self.client.search_all_tweets.call_args.args[0], "from:alice")
+        self.assertEqual(kwargs["start_time"], "2020-01-01T00:00:00Z")
+        self.resolver.resolve_many.assert_not_called()
+
+    def test_waits_out_rate_limits(self):
+        calls = []
+
+        def limited(user_id, pagination_token=None, **kwargs):
+            calls.append(pagination_token)
+            if len(calls) == 2:
+                raise RateLimitError("limited", reset_at=time.time() + 120)
+            return timeline(user_id, pagination_token=pagination_token)
+
+        self.client.get_user_tweets.side_effect = limited
+        backfill = self.backfill()
+        backfill.wait = MagicMock(return_value=True)
+
+        backfill.run()
+
+        self.assertEqual(calls, [None, "t1", "t1", "t2"])
+        self.assertGreater(backfill.wait.call_args.args[0], 100)
+        self.assertEqual(len(self.lines()), 4)
+
+    def test_refuses_state_from_different_options(self):
+        self.backfill().run()
+
+        with self.assertRaises(ValueError):
+            self.backfill(start_time="2020-01-01T00:00:00Z").run()
+
+    def test_seeds_watermarks_only_forward(self):
+        self.client.get_user_tweets.side_effect = lambda user_id, **kwargs: (
+            timeline(user_id, **kwargs) if user_id == "id-alice" else {"data": [{"id": "7", "text": "x"}], "meta": {}})
+        store = CheckpointStore(os.path.join(self.dir, "checkpoints.db"))
+        self.addCleanup(store.close)
+        store.stage_watermark("bob", "99")
+        store.flush()
+        backfill = self.backfill(usernames=["alice", "bob"])
+        backfill.run()
+
+        self.assertEqual(backfill.seed_watermarks(store), 1)
+        self.assertEqual(store.load_watermarks(), {"alice": "30", "bob": "99"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import unittest
+import requests
+from unittest.mock import patch
+from benchmarks.fake_servers import FakeTwitterServer
+from benchmarks.run_benchmark import run_benchmark, percentile
+from src.adaptive_polling import AdaptivePollPolicy
+
+
+class TestFakeTwitterServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTwitterServer(num_accounts=2, tweets_per_second=0, initial_tweets=3,
+                                        rate_limit=2, rate_limit_window=60).start()
+        self.addCleanup(self.server.stop)
+
+    def test_timeline_pages_newest_first_then_rate_limits(self):
+        url = f"{self.server.base_url}/2/users/1000/tweets"
+        first = requests.get(url, params={"max_results": 2}, timeout=5).json()
+        second = requests.get(url, params={"max_results": 2, "pagination_token": first["meta"]["next_token"]},
+                              timeout=5)
+        limited = requests.get(url, params={"max_results": 2}, timeout=5)
+
+        ids = [tweet["id"] for tweet in first["data"] + second.json()["data"]]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(second.headers["x-rate-limit-remaining"], "0")
+        self.assertEqual(limited.status_code, 429)
+
+
+class TestRunBenchmark(unittest.TestCase):
+    def test_percentile(self):
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 0.5), 3)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+        self.assertIsNone(percentile([], 0.5))
+
+    @patch.dict(os.environ, {})
+    def test_streamer_delivers_generated_tweets(self):
+        result = run_benchmark(target="streamer", accounts=5, duration=2, drain=5, tweets_per_second=5,
+                               streamer_options={"poll_policy": AdaptivePollPolicy(min_interval=0.2,
+                                                                                   max_interval=0.5)})
+
+        self.assertGreater(result["generated"], 0)
+        self.assertEqual(result["delivered"], result["generated"])
+        self.assertEqual(result["duplicates"], 0)
+        self.assertIsNotNone(result["latency_p99_seconds"])
+        self.assertGreater(result["api_calls_per_delivered_tweet"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
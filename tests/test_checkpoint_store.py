@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tempfile
+import unittest
+from src import checkpoint_store
+
+
+class TestCheckpointStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "checkpoints.db")
+
+    def reopen(self, store):
+        store.close()
+        return checkpoint_store.CheckpointStore(self.path)
+
+    def test_uses_wal_mode(self):
+        store = checkpoint_store.CheckpointStore(self.path)
+        mode = store.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+        store.close()
+
+    def test_staged_changes_are_only_written_on_flush(self):
+        store = checkpoint_store.CheckpointStore(self.path)
+        store.stage_poll("alice", "20", [("10", "first"), ("20", "second")])
+        self.assertEqual(store.load_watermarks(), {})
+
+        store.flush()
+        self.assertEqual(store.load_watermarks(), {"alice": "20"})
+        self.assertEqual([entry.message for entry in store.load_outbox()], ["first", "second"])
+        store.close()
+
+    def test_pending_deliveries_survive_restart(self):
+        store = checkpoint_store.CheckpointStore(self.path)
+        first, second = store.stage_poll("alice", "20", [("10", "first"), ("20", "second")])
+        store.flush()
+        store.mark_delivered(first)
+        store.flush()
+
+        store = self.reopen(store)
+        self.assertEqual(store.load_watermarks(), {"alice": "20"})
+        pending = store.load_outbox()
+        self.assertEqual([(entry.tweet_id, entry.message) for entry in pending], [("20", "second")])
+        store.close()
+
+    def test_delivered_before_flush_is_never_written(self):
+        store = checkpoint_store.CheckpointStore(self.path)
+        (entry,) = store.stage_poll("alice", "10", [("10", "quick")])
+        store.mark_delivered(entry)
+        store.flush()
+        self.assertEqual(store.load_outbox(), [])
+        self.assertEqual(store.load_watermarks(), {"alice": "10"})
+        store.close()
+
+    def test_forget_drops_account_state(self):
+        store = checkpoint_store.CheckpointStore(self.path)
+        store.stage_poll("alice", "10", [("10", "hi")])
+        store.stage_watermark("bob", "5")
+        store.flush()
+        store.forget("alice")
+        self.assertEqual(store.load_watermarks(), {"bob": "5"})
+        self.assertEqual(store.load_outbox(), [])
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import unittest
+from unittest.mock import patch
+from src import credential_pool
+from src.rate_limiter import RateLimitError
+
+
+def headers(remaining, reset_in=900):
+    return {"x-rate-limit-limit": "900", "x-rate-limit-remaining": str(remaining),
+            "x-rate-limit-reset": str(int(time.time() + reset_in))}
+
+
+class TestCredentialPool(unittest.TestCase):
+    def test_routes_to_token_with_most_headroom(self):
+        pool = credential_pool.CredentialPool(["token-a", "token-b"])
+        first, second = pool.credentials
+        pool.update(first, "users/tweets", headers(10))
+        pool.update(second, "users/tweets", headers(500))
+
+        self.assertIs(pool.acquire("users/tweets"), second)
+
+    def test_exhausted_token_is_skipped_until_all_are_exhausted(self):
+        pool = credential_pool.CredentialPool(["token-a", "token-b"], max_wait=1)
+        first, second = pool.credentials
+        pool.block_until(first, "users/tweets", time.time() + 60)
+
+        self.assertIs(pool.acquire("users/tweets"), second)
+        pool.block_until(second, "users/tweets", time.time() + 30)
+        with self.assertRaises(RateLimitError) as ctx:
+            pool.acquire("users/tweets")
+        # The caller backs off until the first token frees up.
+        self.assertAlmostEqual(ctx.exception.retry_after, 30, delta=2)
+
+    def test_revoked_token_leaves_rotation_but_last_one_stays(self):
+        pool = credential_pool.CredentialPool(["token-a", "token-b"])
+        first, second = pool.credentials
+        pool.revoke(first, "HTTP 401")
+        self.assertEqual(len(pool), 1)
+        self.assertIs(pool.acquire("users/tweets"), second)
+        pool.revoke(second, "HTTP 401")
+        self.assertEqual(len(pool), 1)
+
+    def test_from_env_prefers_token_list(self):
+        with patch.dict(os.environ, {"TWITTER_BEARER_TOKENS": "one, two,one", "TWITTER_BEARER_TOKEN": "single"}):
+            pool = credential_pool.CredentialPool.from_env()
+        self.assertEqual([credential.token for credential in pool.credentials], ["one", "two"])
+        with patch.dict(os.environ, {"TWITTER_BEARER_TOKENS": "", "TWITTER_BEARER_TOKEN": ""}):
+            with self.assertRaises(ValueError):
+                credential_pool.CredentialPool.from_env()
+
+
+if __name__ == '__main__':
+    unittest.main()
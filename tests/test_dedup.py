@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tempfile
+import unittest
+from src import dedup
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_members_are_found(self):
+        bloom = dedup.BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(str(i))
+        self.assertTrue(all(str(i) in bloom for i in range(1000)))
+        false_positives = sum(str(i) in bloom for i in range(1000, 11000))
+        self.assertLess(false_positives, 300)
+
+    def test_size_is_fixed(self):
+        bloom = dedup.BloomFilter(capacity=10000, error_rate=0.001)
+        size = len(bloom.bits)
+        for i in range(50000):
+            bloom.add(str(i))
+        self.assertEqual(len(bloom.bits), size)
+
+
+class TestDedupIndex(unittest.TestCase):
+    def test_same_tweet_is_delivered_once(self):
+        index = dedup.DedupIndex()
+        self.assertTrue(index.check_and_add({"id": "1"}))
+        self.assertFalse(index.check_and_add({"id": "1"}))
+
+    def test_retweets_collapse_to_the_original(self):
+        index = dedup.DedupIndex()
+        original = {"id": "100"}
+        retweet_a = {"id": "200", "referenced_tweets": [{"type": "retweeted", "id": "100"}]}
+        retweet_b = {"id": "300", "referenced_tweets": [{"type": "retweeted", "id": "100"}]}
+        quote = {"id": "400", "referenced_tweets": [{"type": "quoted", "id": "100"}]}
+
+        self.assertTrue(index.check_and_add(retweet_a))
+        self.assertFalse(index.check_and_add(retweet_b))
+        self.assertFalse(index.check_and_add(original))
+        # Quotes carry their own text, so they are kept unless configured otherwise.
+        self.assertTrue(index.check_and_add(quote))
+
+        collapsing = dedup.DedupIndex(collapse_types=("retweeted", "quoted"))
+        self.assertTrue(collapsing.check_and_add(original))
+        self.assertFalse(collapsing.check_and_add(quote))
+
+    def test_lru_is_bounded_and_bloom_keeps_history(self):
+        index = dedup.DedupIndex(max_recent=10, bloom_capacity=1000)
+        for i in range(100):
+            index.check_and_add({"id": str(i)})
+        self.assertEqual(len(index), 10)
+        self.assertIn("0", index)
+
+        exact_only = dedup.DedupIndex(max_recent=10)
+        for i in range(100):
+            exact_only.check_and_add({"id": str(i)})
+        self.assertNotIn("0", exact_only)
+
+    def test_index_persists(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dedup.json")
+            index = dedup.DedupIndex(max_recent=5, bloom_capacity=100, path=path)
+            for i in range(20):
+                index.check_and_add({"id": str(i)})
+            index.save()
+
+            restored = dedup.DedupIndex(max_recent=5, bloom_capacity=100, path=path)
+            self.assertFalse(restored.check_and_add({"id": "19"}))
+            self.assertFalse(restored.check_and_add({"id": "0"}))
+            self.assertTrue(restored.check_and_add({"id": "20"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
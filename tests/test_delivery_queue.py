@@ -0,0 +1,121 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock
+from src import delivery_queue
+from src.telegram_bot import TelegramRateLimitError
+
+
+class TestDeliveryQueue(unittest.TestCase):
+    def setUp(self):
+        self.bot = MagicMock()
+        self.bot.send_message.return_value = {"ok": True}
+
+    def make_queue(self, **kwargs):
+        options = dict(global_rate=1000, per_chat_interval=0, group_interval=0)
+        options.update(kwargs)
+        return delivery_queue.DeliveryQueue(self.bot, **options)
+
+    def test_drain_delivers_in_order_and_runs_callbacks(self):
+        queue = self.make_queue(coalesce=False)
+        delivered = []
+        queue.enqueue("one", on_delivered=lambda: delivered.append("one"))
+        queue.enqueue("two", chat_id="42", on_delivered=lambda: delivered.append("two"))
+        self.assertEqual(queue.queue_depth(), 2)
+
+        self.assertTrue(queue.drain(timeout=2))
+        self.bot.send_message.assert_any_call("one")
+        self.bot.send_message.assert_any_call("two", chat_id="42")
+        self.assertEqual(delivered, ["one", "two"])
+        self.assertEqual(queue.queue_depth(), 0)
+
+    def test_backlog_is_coalesced_within_length_limit(self):
+        queue = self.make_queue(coalesce_threshold=3)
+        for i in range(3):
+            queue.enqueue(f"tweet {i}")
+        queue.enqueue("x" * 4090)
+
+        queue.drain(timeout=2)
+        texts = [call.args[0] for call in self.bot.send_message.call_args_list]
+        self.assertEqual(texts[0], "tweet 0\n\ntweet 1\n\ntweet 2")
+        self.assertEqual(texts[1], "x" * 4090)
+        self.assertTrue(all(len(text) <= delivery_queue.MAX_MESSAGE_LENGTH for text in texts))
+
+    def test_retry_after_is_honored(self):
+        self.bot.send_message.side_effect = [TelegramRateLimitError("429", retry_after=0.2), {"ok": True}]
+        queue = self.make_queue()
+        queue.enqueue("hello")
+
+        started = time.time()
+        queue.drain(timeout=2)
+        self.assertGreaterEqual(time.time() - started, 0.2)
+        self.assertEqual(self.bot.send_message.call_count, 2)
+        self.assertEqual(queue.delivered, 1)
+
+    def test_per_chat_pacing(self):
+        queue = self.make_queue(coalesce=False, per_chat_interval=0.1)
+        queue.enqueue("a", chat_id="1")
+        queue.enqueue("b", chat_id="1")
+        queue.enqueue("c", chat_id="2")
+
+        started = time.time()
+        queue.drain(timeout=2)
+        self.assertGreaterEqual(time.time() - started, 0.1)
+        # The other chat is not held up behind chat 1's pacing.
+        texts = [call.args[0] for call in self.bot.send_message.call_args_list]
+        self.assertEqual(texts, ["a", "c", "b"])
+
+    def test_failed_messages_are_dropped_after_max_retries(self):
+        self.bot.send_message.side_effect = RuntimeError("down")
+        queue = self.make_queue(max_retries=1)
+        queue.enqueue("lost")
+        queue.drain(timeout=2)
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(queue.queue_depth(), 0)
+
+    def test_worker_threads_deliver_in_background(self):
+        queue = self.make_queue()
+        queue.start()
+        try:
+            queue.enqueue("background")
+            self.assertTrue(queue.drain(timeout=2))
+        finally:
+            queue.stop()
+        self.bot.send_message.assert_called_once_with("background")
+
+    def test_media_transfers_run_concurrently_without_holding_up_text(self):
+        media_sender = MagicMock()
+        lock = threading.Lock()
+        active, peak, sent = [0], [0], []
+
+        def upload(text, media, chat_id=None):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.2)
+            with lock:
+                active[0] -= 1
+                sent.append(text)
+
+        media_sender.send.side_effect = upload
+        self.bot.send_message.side_effect = lambda text, chat_id=None: sent.append(text)
+        queue = self.make_queue(media_sender=media_sender, num_workers=1, media_workers=2)
+        queue.enqueue("video 1", chat_id="1", media=["video"])
+        queue.enqueue("video 2", chat_id="2", media=["video"])
+        queue.enqueue("text", chat_id="1")
+        queue.start()
+        try:
+            self.assertTrue(queue.drain(timeout=2))
+        finally:
+            queue.stop()
+
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(sent[0], "text")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from src import filtered_stream
+from src.http_transport import HttpTransport
+from tests.fake_stream_server import FakeStreamServer
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestFilteredStream(unittest.TestCase):
+    def test_build_rules_packs_usernames(self):
+        rules = filtered_stream.build_rules(["carol", "@alice", "bob", "dave"], max_rule_length=40)
+        self.assertEqual(rules, ["from:alice OR from:bob OR from:carol", "from:dave"])
+
+    def test_sync_rules_only_touches_tagged_difference(self):
+        client = MagicMock()
+        client.get_stream_rules.return_value = [
+            {"id": "1", "value": "from:alice", "tag": filtered_stream.RULE_TAG},
+            {"id": "2", "value": "from:old", "tag": filtered_stream.RULE_TAG},
+            {"id": "3", "value": "from:old", "tag": "manual"},
+        ]
+        stream = filtered_stream.FilteredStream(client, MagicMock(), max_rule_length=12)
+
+        stream.sync_rules(["alice", "bob"])
+
+        client.update_stream_rules.assert_called_once_with(
+            add=[{"value": "from:bob", "tag": filtered_stream.RULE_TAG}], delete_ids=["2"])
+
+    def test_iter_lines_handles_split_chunks_and_heartbeats(self):
+        stream = filtered_stream.FilteredStream(MagicMock(), MagicMock())
+        chunks = [b'{"a"', b': 1}\r\n\r\n{"b": 2}', b"\r\n"]
+        self.assertEqual(list(stream.iter_lines(chunks)), [b'{"a": 1}', b"", b'{"b": 2}'])
+
+    def test_handle_line_maps_author_to_tracked_spelling(self):
+        on_tweet = MagicMock()
+        stream = filtered_stream.FilteredStream(MagicMock(), on_tweet)
+        stream.spelling = {"alice": "Alice"}
+        line = json.dumps({
+            "data": {"id": "5", "text": "hi", "author_id": "1"},
+            "includes": {"users": [{"id": "1", "username": "alice"}]},
+        }).encode()
+
+        stream.handle_line(line)
+        stream.handle_line(b"")
+        stream.handle_line(b"not json")
+
+        on_tweet.assert_called_once_with("Alice", {"id": "5", "text": "hi", "author_id": "1"})
+
+    def test_backoff_grows_and_is_capped(self):
+        stream = filtered_stream.FilteredStream(MagicMock(), MagicMock())
+        with patch("src.filtered_stream.random.uniform", side_effect=lambda low, high: high):
+            self.assertEqual(stream.backoff_delay(ConnectionError(), 0), 0.25)
+            self.assertEqual(stream.backoff_delay(ConnectionError(), 3), 2)
+            self.assertEqual(stream.backoff_delay(ConnectionError(), 20), 16)
+
+
+@patch.dict(os.environ, {"TWITTER_BEARER_TOKEN": "test_token"})
+class TestFilteredStreamAgainstFakeServer(unittest.TestCase):
+    def make_client(self, server):
+        from src.twitter_client import TwitterClient
+        return TwitterClient(transport=HttpTransport(max_retries=0), api_url=server.url)
+
+    def test_receives_pushed_tweets_and_reconnects(self):
+        server = FakeStreamServer(max_connection_seconds=0.3).start()
+        self.addCleanup(server.stop)
+        received = []
+        connects = []
+        stream = filtered_stream.FilteredStream(self.make_client(server),
+                                                lambda username, tweet: received.append((username, tweet["id"])),
+                                                heartbeat_timeout=2, on_connect=connects.append)
+        thread = threading.Thread(target=stream.run, args=(["Alice", "bob"],), daemon=True)
+        thread.start()
+
+        server.push({"id": "100", "text": "hello"}, "alice")
+        self.assertTrue(wait_for(lambda: received))
+        self.assertTrue(wait_for(lambda: True in connects))
+        server.push({"id": "101", "text": "again"}, "bob")
+        self.assertTrue(wait_for(lambda: len(received) == 2))
+
+        stream.stop()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(received, [("Alice", "100"), ("bob", "101")])
+        self.assertEqual([rule["value"] for rule in server.rules], ["from:Alice OR from:bob"])
+
+    def test_forbidden_stream_raises_unavailable(self):
+        server = FakeStreamServer(status=403).start()
+        self.addCleanup(server.stop)
+        stream = filtered_stream.FilteredStream(self.make_client(server), MagicMock())
+
+        with self.assertRaises(filtered_stream.StreamUnavailableError):
+            stream.run(["alice"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import unittest
+from requests.exceptions import ConnectionError, HTTPError
+from src import http_transport
+from tests.fake_transport import FakeTransport
+
+
+class TestHttpTransport(unittest.TestCase):
+    def test_session_pools_connections(self):
+        transport = http_transport.HttpTransport(pool_connections=4, pool_maxsize=16, timeout=5, max_retries=2)
+        adapter = transport.session.get_adapter("https://api.twitter.com/2")
+        self.assertEqual(adapter._pool_maxsize, 16)
+        self.assertEqual(adapter._pool_connections, 4)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertNotIn("POST", adapter.max_retries.allowed_methods)
+        self.assertEqual(transport.timeout, 5)
+        transport.close()
+
+    def test_shared_transport_is_reused(self):
+        original = http_transport.get_shared_transport()
+        try:
+            self.assertIs(http_transport.get_shared_transport(), original)
+            replacement = FakeTransport()
+            http_transport.set_shared_transport(replacement)
+            self.assertIs(http_transport.get_shared_transport(), replacement)
+        finally:
+            http_transport.set_shared_transport(original)
+
+
+class TestFakeTransport(unittest.TestCase):
+    def test_queued_responses_and_calls(self):
+        transport = FakeTransport()
+        transport.add_response("GET", "https://example.com/a", json_data={"n": 1})
+        transport.add_response("GET", "https://example.com/a", json_data={"n": 2})
+        transport.add_response("GET", "https://example.com/a/b", status_code=500, json_data={})
+
+        self.assertEqual(transport.get("https://example.com/a?x=1").json(), {"n": 1})
+        self.assertEqual(transport.get("https://example.com/a").json(), {"n": 2})
+        self.assertEqual(transport.get("https://example.com/a").json(), {"n": 2})
+        with self.assertRaises(HTTPError):
+            transport.get("https://example.com/a/b").raise_for_status()
+        self.assertEqual(len(transport.calls), 4)
+
+    def test_missing_route_raises_connection_error(self):
+        transport = FakeTransport()
+        with self.assertRaises(ConnectionError):
+            transport.post("https://example.com/")
+
+    def test_exception_responses_are_raised(self):
+        transport = FakeTransport()
+        transport.add_response("GET", "https://example.com", ConnectionError("boom"))
+        with self.assertRaises(ConnectionError):
+            transport.get("https://example.com")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+from src import media
+from src.models import Media, parse_tweets
+from src.telegram_bot import TelegramBot
+from src.delivery_queue import DeliveryQueue
+from tests.fake_transport import FakeTransport, FakeResponse
+
+TELEGRAM = "https://api.telegram.org/botTOKEN"
+
+
+class UploadingTransport(FakeTransport):
+    """
+    Reads streamed request bodies like requests would, so relayed chunks can be checked.
+    """
+
+    def request(self, method, url, **kwargs):
+        if isinstance(kwargs.get("data"), types.GeneratorType):
+            kwargs["data"] = b"".join(kwargs["data"])
+        return super().request(method, url, **kwargs)
+
+
+def photo(key):
+    return Media(key, "photo", url=f"https://pbs.example/{key}.jpg")
+
+
+class TestMediaModel(unittest.TestCase):
+    def test_download_url_picks_best_mp4(self):
+        video = Media("3_1", "video", preview_image_url="https://pbs.example/p.jpg", variants=[
+            {"content_type": "application/x-mpegURL", "url": "https://video.example/v.m3u8"},
+            {"content_type": "video/mp4", "bit_rate": 256000, "url": "https://video.example/low.mp4"},
+            {"content_type": "video/mp4", "bit_rate": 2176000, "url": "https://video.example/high.mp4"},
+        ])
+
+        self.assertEqual(video.download_url, "https://video.example/high.mp4")
+        self.assertEqual(photo("3_2").download_url, "https://pbs.example/3_2.jpg")
+
+    def test_parse_tweets_attaches_media_in_order(self):
+        tweets = parse_tweets({
+            "data": [{"id": "1", "text": "pics", "attachments": {"media_keys": ["3_b", "3_a"]}},
+                     {"id": "2", "text": "plain"}],
+            "includes": {"media": [{"media_key": "3_a", "type": "photo", "url": "https://pbs.example/a.jpg"},
+                                   {"media_key": "3_b", "type": "photo", "url": "https://pbs.example/b.jpg"}]},
+        })
+
+        self.assertEqual([item.media_key for item in tweets[0].media], ["3_b", "3_a"])
+        self.assertIsNone(tweets[1].media)
+
+
+class TestMediaSender(unittest.TestCase):
+    def setUp(self):
+        os.environ["TELEGRAM_BOT_TOKEN"] = "TOKEN"
+        os.environ["TELEGRAM_CHAT_ID"] = "42"
+        self.transport = UploadingTransport()
+        self.bot = TelegramBot(transport=self.transport)
+        self.sender = media.MediaSender(self.bot, transport=self.transport, chunk_size=4)
+
+    def test_album_is_streamed_once_then_sent_by_file_id(self):
+        self.transport.add_response("GET", "https://pbs.example/3_a.jpg", body=b"aaaaaaaaaa",
+                                    headers={"Content-Type": "image/jpeg"})
+        self.transport.add_response("GET", "https://pbs.example/3_b.jpg", body=b"bbbbbb")
+        self.transport.add_response("POST", f"{TELEGRAM}/sendMediaGroup", json_data={"ok": True, "result": [
+            {"message_id": 1, "photo": [{"file_id": "small-a"}, {"file_id": "FILE_A"}]},
+            {"message_id": 2, "photo": [{"file_id": "FILE_B"}]},
+        ]})
+
+        self.sender.send("two pictures", [photo("3_a"), photo("3_b")])
+
+        method, url, kwargs = self.transport.calls[-1]
+        self.assertTrue(url.endswith("/sendMediaGroup"))
+        self.assertIn("multipart/form-data", kwargs["headers"]["Content-Type"])
+        body = kwargs["data"]
+        self.assertIn(b"aaaaaaaaaa", body)
+        self.assertIn(b"bbbbbb", body)
+        self.assertIn(b'"media": "attach://file0"', body)
+        self.assertIn(b'"caption": "two pictures"', body)
+        self.assertEqual(self.sender.file_ids.get("3_a"), "FILE_A")
+        self.assertEqual(self.sender.file_ids.get("3_b"), "FILE_B")
+
+        self.transport.calls.clear()
+        self.sender.send("again", [photo("3_a"), photo("3_b")])
+
+        self.assertEqual([call[0] for call in self.transport.calls], ["POST"])
+        album = json.loads(self.transport.calls[0][2]["data"]["media"])
+        self.assertEqual([entry["media"] for entry in album], ["FILE_A", "FILE_B"])
+        self.assertEqual(self.sender.uploads, 2)
+        self.assertEqual(self.sender.reused, 2)
+
+    def test_single_video_uses_send_video(self):
+        video = Media("7_1", "video", variants=[{"content_type": "video/mp4", "bit_rate": 1,
+                                                 "url": "https://video.example/v.mp4"}])
+        self.transport.add_response("GET", "https://video.example/v.mp4", body=b"0123456789")
+        self.transport.add_response("POST", f"{TELEGRAM}/sendVideo", json_data={
+            "ok": True, "result": {"message_id": 3, "video": {"file_id": "FILE_V"}}})
+
+        self.sender.send("clip", [video], chat_id="-100")
+
+        body = self.transport.calls[-1][2]["data"]
+        self.assertIn(b'name="video"\r\n\r\nattach://file0', body)
+        self.assertIn(b'name="chat_id"\r\n\r\n-100', body)
+        self.assertEqual(self.sender.file_ids.get("7_1"), "FILE_V")
+
+    def test_oversized_or_missing_media_falls_back_to_text(self):
+        self.transport.add_response("GET", "https://pbs.example/big.jpg", body=b"x",
+                                    headers={"Content-Length": str(media.MAX_PHOTO_BYTES + 1)})
+        self.transport.add_response("GET", "https://pbs.example/gone.jpg", status_code=404)
+        self.transport.add_response("POST", f"{TELEGRAM}/sendMessage", json_data={"ok": True})
+
+        self.sender.send("text only", [photo("big"), photo("gone")])
+
+        method, url, kwargs = self.transport.calls[-1]
+        self.assertTrue(url.endswith("/sendMessage"))
+        self.assertEqual(kwargs["data"]["text"], "text only")
+
+
+class TestBandwidthLimiter(unittest.TestCase):
+    def test_transfers_wait_for_their_share(self):
+        limiter = media.BandwidthLimiter(1000, burst=100)
+
+        with patch.object(media.time, "sleep") as mock_sleep:
+            limiter.consume(100)
+            mock_sleep.assert_not_called()
+            limiter.consume(200)
+
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 0.2, places=2)
+
+
+class TestFileIdCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = media.FileIdCache(max_size=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+
+        self.assertEqual(cache.get("a"), "A")
+        self.assertIsNone(cache.get("b"))
+
+
+class TestDeliveryQueueMedia(unittest.TestCase):
+    def test_media_messages_are_not_coalesced(self):
+        bot = MagicMock()
+        sender = MagicMock()
+        queue = DeliveryQueue(bot, global_rate=1000, per_chat_interval=0, coalesce_threshold=2,
+                              media_sender=sender)
+        album = [photo("3_a")]
+        queue.enqueue("one")
+        queue.enqueue("two", media=album)
+        queue.enqueue("three")
+
+        queue.drain(timeout=5)
+
+        sender.send.assert_called_once_with("two", album, chat_id=None)
+        # Media has its own lane, so the texts around it are merged with each other only.
+        self.assertEqual([call.args[0] for call in bot.send_message.call_args_list], ["one\n\nthree"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import threading
+import unittest
+import requests
+from src import metrics
+from src.models import Tweet
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+    def test_counter_sums_shards_across_threads(self):
+        counter = self.registry.counter("test_total", "Test counter.", ("status",))
+
+        def work():
+            for _ in range(1000):
+                counter.inc(status="200")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(5, status="429")
+
+        self.assertEqual(counter.value(status="200"), 4000)
+        self.assertEqual(counter.value(status="429"), 5)
+        # Shards of finished threads are folded away on the next scrape.
+        self.assertEqual(len(counter.shards), 1)
+        self.assertEqual(counter.value(status="200"), 4000)
+
+    def test_shards_of_finished_threads_are_pruned_without_scrapes(self):
+        counter = self.registry.counter("test_total", "Test counter.", ("status",))
+        for _ in range(20):
+            thread = threading.Thread(target=counter.inc, kwargs={"status": "200"})
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(counter.shards), 1)
+        self.assertEqual(counter.value(status="200"), 20)
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = self.registry.histogram("test_seconds", "Test histogram.", ("endpoint",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, endpoint="users/tweets")
+
+        text = self.registry.render()
+
+        self.assertIn('# TYPE test_seconds histogram', text)
+        self.assertIn('test_seconds_bucket{endpoint="users/tweets",le="0.1"} 2', text)
+        self.assertIn('test_seconds_bucket{endpoint="users/tweets",le="1.0"} 3', text)
+        self.assertIn('test_seconds_bucket{endpoint="users/tweets",le="+Inf"} 4', text)
+        self.assertIn('test_seconds_count{endpoint="users/tweets"} 4', text)
+
+    def test_wrong_labels_are_rejected(self):
+        counter = self.registry.counter("test_total", "Test counter.", ("status",))
+        with self.assertRaises(ValueError):
+            counter.inc(code="200")
+
+    def test_delivery_lag_from_created_at(self):
+        created_at = metrics.parse_created_at("2024-05-01T12:00:00.000Z")
+        before = metrics.DELIVERY_LAG_SECONDS.count(account="lagtest")
+
+        metrics.observe_delivery_lag("lagtest", {"created_at": "2024-05-01T12:00:00.000Z"}, now=created_at + 2)
+        metrics.observe_delivery_lag("lagtest", {"id": "1"})
+        metrics.observe_delivery_lag("lagtest", Tweet("2", "hi", created_at="2024-05-01T12:00:00.000Z"),
+                                     now=created_at + 2)
+
+        self.assertEqual(metrics.DELIVERY_LAG_SECONDS.count(account="lagtest"), before + 2)
+
+    def test_server_exposes_metrics(self):
+        self.registry.counter("test_total", "Test counter.").inc()
+        server = metrics.MetricsServer(self.registry, host="127.0.0.1", port=0).start()
+        self.addCleanup(server.stop)
+
+        response = requests.get(f"http://127.0.0.1:{server.port}/metrics", timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("test_total 1", response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import unittest
+from src import models
+
+
+class TestModels(unittest.TestCase):
+    def test_tweet_behaves_like_the_dict_it_replaces(self):
+        data = {"id": "5", "text": "hi", "author_id": "1", "created_at": "2024-05-01T12:00:00.000Z",
+                "referenced_tweets": [{"type": "retweeted", "id": "3"}], "lang": "en"}
+        tweet = models.Tweet.from_dict(data)
+
+        self.assertEqual(tweet["id"], "5")
+        self.assertEqual(tweet.get("text"), "hi")
+        self.assertEqual(tweet.get("lang"), "en")
+        self.assertEqual(tweet.get("referenced_tweets")[0]["id"], "3")
+        self.assertIsNone(tweet.get("missing"))
+        with self.assertRaises(KeyError):
+            tweet["missing"]
+        self.assertEqual(tweet.to_dict(), data)
+        self.assertEqual(tweet, data)
+
+    def test_optional_fields_default_and_parse_lazily(self):
+        tweet = models.Tweet.from_dict({"id": "7", "text": "plain"})
+        self.assertIsNone(tweet.get("referenced_tweets"))
+        self.assertEqual(tweet.referenced_tweets, [])
+        self.assertIsNone(tweet.created_timestamp)
+        self.assertFalse(hasattr(tweet, "__dict__"))
+
+        dated = models.Tweet("8", created_at="1970-01-01T00:01:00.000Z")
+        self.assertEqual(dated.created_timestamp, 60)
+
+    def test_parse_response(self):
+        data = models.loads(b'{"data": [{"id": "2", "text": "a", "author_id": "9"}],'
+                            b' "includes": {"users": [{"id": "9", "username": "alice"}]}}')
+        tweets = models.parse_tweets(data)
+        users = models.parse_users(data)
+
+        self.assertEqual([tweet.id for tweet in tweets], ["2"])
+        self.assertEqual(users["9"].username, "alice")
+        self.assertEqual(models.parse_tweets({"meta": {}}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
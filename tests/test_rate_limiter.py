@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import unittest
+from unittest.mock import patch
+from src import rate_limiter
+
+
+class TestRateLimitBudget(unittest.TestCase):
+    def test_unknown_endpoint_is_not_delayed(self):
+        budget = rate_limiter.RateLimitBudget()
+        self.assertEqual(budget.acquire("users/tweets"), 0)
+
+    def test_requests_are_paced_across_window(self):
+        budget = rate_limiter.RateLimitBudget(max_wait=100)
+        now = 1000.0
+        budget.update("users/tweets", {"x-rate-limit-limit": "900", "x-rate-limit-remaining": "10",
+                                       "x-rate-limit-reset": str(int(now + 100))})
+        with patch('src.rate_limiter.time.time', return_value=now), \
+             patch('src.rate_limiter.time.sleep') as mock_sleep:
+            budget.acquire("users/tweets")
+            budget.acquire("users/tweets")
+        # Ten requests spread over 100 seconds: the second waits one tenth.
+        mock_sleep.assert_called_once()
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 10.0)
+
+    def test_exhausted_budget_raises_with_reset_time(self):
+        budget = rate_limiter.RateLimitBudget(max_wait=5)
+        reset_at = int(time.time()) + 60
+        budget.update("users/tweets", {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset_at)})
+        with self.assertRaises(rate_limiter.RateLimitError) as ctx:
+            budget.acquire("users/tweets")
+        self.assertEqual(ctx.exception.reset_at, reset_at)
+        self.assertEqual(ctx.exception.endpoint, "users/tweets")
+
+    def test_block_until_after_429(self):
+        budget = rate_limiter.RateLimitBudget(max_wait=5)
+        budget.block_until("users/by", time.time() + 120)
+        with self.assertRaises(rate_limiter.RateLimitError):
+            budget.acquire("users/by")
+        # Other endpoints keep their own budget.
+        self.assertEqual(budget.acquire("users/tweets"), 0)
+
+    def test_window_reset_clears_budget(self):
+        budget = rate_limiter.RateLimitBudget(max_wait=5)
+        budget.update("users/tweets", {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(int(time.time()) - 1)})
+        self.assertEqual(budget.acquire("users/tweets"), 0)
+
+    def test_parse_headers_tolerates_missing_values(self):
+        self.assertEqual(rate_limiter.parse_rate_limit_headers({}), (None, None, None))
+        self.assertEqual(rate_limiter.parse_rate_limit_headers({"x-rate-limit-reset": "5"}), (None, None, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import socket
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from requests.exceptions import HTTPError, Timeout
+from src import resilience
+from src.resilience import (CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, Hedger,
+                            request_timeout)
+from src.twitter_client import TwitterClient
+from src.telegram_bot import TelegramBot
+from src.delivery_queue import DeliveryQueue
+from src.http_transport import HttpTransport
+from tests.fake_transport import FakeTransport
+
+USER_URL = "https://api.twitter.com/2/users/by/username/"
+
+
+class TestDeadline(unittest.TestCase):
+    def test_timeouts_are_cut_to_the_time_left(self):
+        self.assertEqual(request_timeout(10), 10)
+        with Deadline(2).apply():
+            self.assertLessEqual(request_timeout(10), 2)
+            self.assertEqual(request_timeout(1), 1)
+            connect, read = request_timeout((10, 90))
+            self.assertLessEqual(read, 2)
+        self.assertEqual(request_timeout(10), 10)
+
+    def test_expired_deadline_fails_fast(self):
+        with Deadline(0).apply():
+            with self.assertRaises(DeadlineExceeded):
+                request_timeout(10)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures_and_recovers_through_one_trial(self):
+        breaker = CircuitBreaker("twitter users/tweets", failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            breaker.allow()
+        self.assertGreater(raised.exception.retry_after, 25)
+
+        breaker.opened_at -= 31
+        breaker.allow()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()  # only one trial at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker("telegram sendMessage", failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure()
+        breaker.opened_at -= 31
+        breaker.allow()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+class TestHedger(unittest.TestCase):
+    def warm(self, hedger, endpoint, seconds=0.01):
+        for _ in range(hedger.min_samples):
+            hedger.latencies.observe(endpoint, seconds)
+
+    def test_slow_request_is_hedged_and_the_faster_answer_wins(self):
+        hedger = Hedger(min_delay=0.01, min_samples=5)
+        self.warm(hedger, "users/tweets")
+        release = threading.Event()
+        calls = []
+
+        def send():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(2)  # the stalled first attempt
+                return "slow"
+            return "fast"
+
+        started = time.monotonic()
+        self.assertEqual(hedger.call("users/tweets", send), "fast")
+        self.assertLess(time.monotonic() - started, 1)
+        release.set()
+        self.assertEqual(hedger.stats()["hedge_wins"], 1)
+
+    def test_not_hedged_before_enough_samples_or_without_budget(self):
+        hedger = Hedger(min_delay=0.01, min_samples=5, max_ratio=0)
+        send = MagicMock(side_effect=lambda: time.sleep(0.05) or "ok")
+
+        self.assertEqual(hedger.call("users/by", send), "ok")
+        self.warm(hedger, "users/by")
+        hedger.budget = 0
+        self.assertEqual(hedger.call("users/by", send), "ok")
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(hedger.stats()["hedges"], 0)
+
+
+class TestClientResilience(unittest.TestCase):
+    def setUp(self):
+        os.environ["TWITTER_BEARER_TOKEN"] = "TEST_BEARER_TOKEN"
+        os.environ["TELEGRAM_BOT_TOKEN"] = "TOKEN"
+        os.environ["TELEGRAM_CHAT_ID"] = "42"
+        self.transport = FakeTransport()
+
+    def test_twitter_circuit_opens_on_5xx_and_fails_fast(self):
+        client = TwitterClient(transport=self.transport, breakers=resilience.CircuitBreakers(
+            "twitter", failure_threshold=2))
+        self.transport.add_response("GET", USER_URL, status_code=503)
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                client.get_user_id("someone")
+
+        with self.assertRaises(CircuitOpenError):
+            client.get_user_id("someone")
+        self.assertEqual(len(self.transport.calls), 2)
+        self.assertEqual(client.health()["breakers"]["users/by/username"]["state"], "open")
+
+    def test_client_errors_do_not_open_the_circuit(self):
+        client = TwitterClient(transport=self.transport, breakers=resilience.CircuitBreakers(
+            "twitter", failure_threshold=1))
+        self.transport.add_response("GET", USER_URL, status_code=404)
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                client.get_user_id("nobody")
+
+        self.assertEqual(client.health()["breakers"]["users/by/username"]["state"], "closed")
+
+    def test_twitter_request_timeout_follows_the_deadline(self):
+        client = TwitterClient(transport=self.transport)
+        self.transport.add_response("GET", USER_URL, json_data={"data": {"id": "1"}})
+
+        with Deadline(3).apply():
+            client.get_user_id("someone")
+
+        self.assertLessEqual(self.transport.calls[0][2]["timeout"], 3)
+
+    def test_clients_default_to_the_transport_timeout(self):
+        self.transport.timeout = 4
+        self.transport.add_response("GET", USER_URL, json_data={"data": {"id": "1"}})
+        self.transport.add_response("POST", "https://api.telegram.org/botTOKEN/sendMessage", json_data={"ok": True})
+
+        TwitterClient(transport=self.transport).get_user_id("someone")
+        TelegramBot(transport=self.transport).send_message("hello")
+        TwitterClient(transport=self.transport, timeout=2).get_user_id("someone")
+
+        self.assertEqual([call[2]["timeout"] for call in self.transport.calls], [4, 4, 2])
+
+    def test_timeout_cut_short_by_a_deadline_is_not_a_failure(self):
+        bot = TelegramBot(transport=self.transport, breakers=resilience.CircuitBreakers(
+            "telegram", failure_threshold=1))
+        self.transport.add_response("POST", "https://api.telegram.org/botTOKEN/sendMessage",
+                                    resilience.DeadlineExceeded("read timed out"))
+
+        with Deadline(1).apply():
+            with self.assertRaises(DeadlineExceeded):
+                bot.send_message("hello")
+        self.assertEqual(bot.health()["breakers"]["sendMessage"]["state"], "closed")
+
+        with self.assertRaises(DeadlineExceeded):
+            bot.send_message("hello")
+        self.assertEqual(bot.health()["breakers"]["sendMessage"]["state"], "open")
+
+    def test_delivery_waits_out_an_open_circuit_without_spending_attempts(self):
+        bot = MagicMock()
+        bot.send_message.side_effect = [CircuitOpenError("open", retry_after=30), {"ok": True}]
+        queue = DeliveryQueue(bot, max_retries=1)
+        queue.enqueue("hello")
+
+        queue.process_next(timeout=0)
+
+        self.assertEqual(queue.dropped, 0)
+        self.assertGreater(queue.global_ready_at, time.time() + 25)
+        queue.global_ready_at = 0
+        queue.chat_ready_at.clear()
+        queue.process_next(timeout=0)
+        self.assertEqual(queue.delivered, 1)
+
+
+class TestTransportDeadline(unittest.TestCase):
+    def setUp(self):
+        os.environ["TWITTER_BEARER_TOKEN"] = "TEST_BEARER_TOKEN"
+        # Accepts connections (through the backlog) but never answers.
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(16)
+        self.addCleanup(self.server.close)
+        self.transport = HttpTransport()
+        self.addCleanup(self.transport.close)
+
+    def test_stalled_request_gives_up_at_the_deadline_without_opening_the_circuit(self):
+        client = TwitterClient(transport=self.transport, api_url=f"http://127.0.0.1:{self.server.getsockname()[1]}",
+                               breakers=resilience.CircuitBreakers("twitter", failure_threshold=1))
+
+        started = time.monotonic()
+        with Deadline(0.5).apply():
+            with self.assertRaises(Timeout):
+                client.get_user_id("someone")
+
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(client.health()["breakers"]["users/by/username"]["state"], "closed")
+
+
+class TestStreamerDeadline(unittest.TestCase):
+    @patch("src.streamer.TelegramBot")
+    @patch("src.streamer.TwitterClient")
+    def test_fetch_and_forward_gives_each_check_its_own_deadline(self, _client, _bot):
+        from src.streamer import Streamer
+        streamer = Streamer(["alice", "bob"], poll_deadline=5)
+        seen = []
+        streamer.check_username = lambda username: seen.append(resilience.current_deadline())
+
+        streamer.fetch_and_forward()
+
+        self.assertEqual(len(seen), 2)
+        self.assertIsNot(seen[0], seen[1])
+        self.assertLessEqual(seen[0].remaining(), 5)
+
+    @patch("src.streamer.TelegramBot")
+    @patch("src.streamer.TwitterClient")
+    def test_checks_queued_past_the_deadline_still_run(self, _client, _bot):
+        from src.streamer import Streamer
+        usernames = [f"user{i}" for i in range(12)]
+        streamer = Streamer(usernames, max_workers=3, poll_deadline=0.1)
+        left_at_start = {}
+
+        def check(username):
+            left_at_start[username] = resilience.current_deadline().remaining()
+            time.sleep(0.05)
+
+        streamer.check_username = check
+
+        # 12 checks of 0.05s on 3 workers take ~0.2s, twice the deadline.
+        streamer.fetch_and_forward()
+
+        self.assertEqual(set(left_at_start), set(usernames))
+        self.assertTrue(all(left > 0.05 for left in left_at_start.values()))
+
+if __name__ == '__main__':
+    unittest.main()
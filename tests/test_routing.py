@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from src import streamer
+from src.models import Tweet
+from src.routing import KeywordMatcher, Route, Router
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    def test_finds_overlapping_keywords_on_word_boundaries(self):
+        matcher = KeywordMatcher(["coin", "bitcoin", "$ETH", "he", "eth"])
+
+        self.assertEqual(matcher.find("Bitcoin and $eth are up"), {"bitcoin", "$eth", "eth"})
+        self.assertEqual(matcher.find("the method"), set())
+        self.assertEqual(matcher.find("coin, he said"), {"coin", "he"})
+        self.assertEqual(KeywordMatcher([]).find("anything"), set())
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = Router.from_dict({
+            "default": ["general"],
+            "routes": [
+                {"name": "markets", "chats": ["markets", "all"], "keywords": ["bitcoin"]},
+                {"name": "launches", "chats": ["space"], "patterns": [r"launch(es)?\b"], "is_reply": False},
+                {"name": "nasa photos", "chats": ["photos", "all"], "accounts": ["@NASA"], "has_media": True,
+                 "format": "{username}: {text} {url}"},
+            ],
+        })
+
+    def test_routes_by_keyword_pattern_account_and_flags(self):
+        self.assertEqual(self.router.route("alice", {"id": "1", "text": "Bitcoin!"}),
+                         [("markets", None), ("all", None)])
+        self.assertEqual(self.router.route("alice", {"id": "2", "text": "Launches today"}), [("space", None)])
+        reply = {"id": "3", "text": "launch", "referenced_tweets": [{"type": "replied_to", "id": "1"}]}
+        self.assertEqual(self.router.route("alice", reply), [("general", None)])
+
+        photo = Tweet("4", "Bitcoin on the moon", extra={"attachments": {"media_keys": ["3_1"]}})
+        self.assertEqual(self.router.route("nasa", photo),
+                         [("markets", None), ("all", None), ("photos", "{username}: {text} {url}")])
+        self.assertEqual(self.router.route("someone", photo), [("markets", None), ("all", None)])
+        self.assertTrue(self.router.needs_media)
+
+    def test_no_default_drops_unmatched_tweets(self):
+        router = Router([Route(["x"], keywords=["only"])], default_chats=[])
+
+        self.assertEqual(router.route("alice", {"id": "1", "text": "nothing here"}), [])
+
+    def test_from_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "routes.json")
+            with open(path, "w") as f:
+                json.dump({"routes": [{"chats": [-100], "keywords": ["hi"]}]}, f)
+            router = Router.from_file(path)
+
+        self.assertEqual(router.route("alice", {"id": "1", "text": "hi"}), [("-100", None)])
+        self.assertEqual(router.route("alice", {"id": "1", "text": "bye"}), [(None, None)])
+
+    def test_numbered_backreferences_still_match(self):
+        router = Router([Route(["-1"], patterns=[r"(gm)+"]), Route(["-2"], patterns=[r"(\w)\1"])],
+                        default_chats=[])
+
+        self.assertEqual(router.route("alice", {"id": "1", "text": "hello"}), [("-2", None)])
+        self.assertEqual(router.route("alice", {"id": "2", "text": "abc"}), [])
+
+    def test_invalid_format_is_refused_on_load(self):
+        with self.assertRaises(ValueError):
+            Route(["-1"], format="{user}: {text}")
+        with self.assertRaises(ValueError):
+            Route(["-1"], format="{username} {0}")
+
+
+class TestStreamerRouting(unittest.TestCase):
+    def test_tweets_fan_out_to_every_routed_chat(self):
+        router = Router([Route(["-1", "-2"], keywords=["alert"]),
+                         Route(["-2"], accounts=["alice"], format="{username} says {text}")], default_chats=[])
+        delivery_queue = MagicMock()
+        with patch('src.streamer.TwitterClient'), patch('src.streamer.TelegramBot'):
+            streamer_instance = streamer.Streamer(["alice"], poll_interval=0, router=router,
+                                                  delivery_queue=delivery_queue)
+
+        streamer_instance.forward("alice", [{"id": "1", "text": "alert"}, {"id": "2", "text": "quiet"}])
+
+        sent = [(call.args[0], call.kwargs["chat_id"]) for call in delivery_queue.enqueue.call_args_list]
+        self.assertEqual(sent, [("New tweet from alice: alert", "-1"), ("New tweet from alice: alert", "-2"),
+                                ("alice says quiet", "-2")])
+
+    def test_failing_template_falls_back_to_the_default_message(self):
+        route = Route(["-1"])
+        route.format = "{text.missing}"
+        with patch('src.streamer.TwitterClient'), patch('src.streamer.TelegramBot'):
+            streamer_instance = streamer.Streamer(["alice"], poll_interval=0,
+                                                  router=Router([route], default_chats=[]))
+
+        self.assertEqual(streamer_instance.destinations("alice", {"id": "1", "text": "hi"}),
+                         [("-1", "New tweet from alice: hi")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import threading
+import unittest
+from src import scheduler
+
+
+class TestPollScheduler(unittest.TestCase):
+    def wait_for(self, predicate, timeout=2):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.005)
+        return False
+
+    def test_keys_are_polled_on_their_own_schedule(self):
+        polls = {"fast": 0, "slow": 0}
+
+        def poll(key):
+            polls[key] += 1
+            return time.time() + (0.01 if key == "fast" else 10)
+
+        poller = scheduler.PollScheduler(poll, num_workers=2)
+        poller.schedule("fast")
+        poller.schedule("slow")
+        poller.start()
+        try:
+            self.assertTrue(self.wait_for(lambda: polls["fast"] >= 5))
+        finally:
+            poller.stop()
+        self.assertEqual(polls["slow"], 1)
+
+    def test_hung_key_does_not_delay_others(self):
+        release = threading.Event()
+        polls = []
+
+        def poll(key):
+            polls.append(key)
+            if key == "hung":
+                release.wait(5)
+            return time.time() + 0.01
+
+        poller = scheduler.PollScheduler(poll, num_workers=2)
+        poller.schedule("hung")
+        poller.schedule("other", time.time() + 0.01)
+        poller.start()
+        try:
+            self.assertTrue(self.wait_for(lambda: polls.count("other") >= 5))
+            # The hung key is never dispatched a second time while in flight.
+            self.assertEqual(polls.count("hung"), 1)
+        finally:
+            release.set()
+            poller.stop()
+
+    def test_future_due_time_is_respected(self):
+        polls = []
+        poller = scheduler.PollScheduler(lambda key: polls.append(key), num_workers=1)
+        poller.schedule("later", time.time() + 60)
+        poller.start()
+        try:
+            time.sleep(0.05)
+            self.assertEqual(polls, [])
+            poller.schedule("later")
+            self.assertTrue(self.wait_for(lambda: polls == ["later"]))
+        finally:
+            poller.stop()
+
+    def test_removed_keys_are_not_requeued(self):
+        polls = []
+
+        def poll(key):
+            polls.append(key)
+            return time.time() + 0.01
+
+        poller = scheduler.PollScheduler(poll, num_workers=1)
+        poller.schedule("gone")
+        poller.start()
+        try:
+            self.assertTrue(self.wait_for(lambda: len(polls) >= 1))
+            poller.remove("gone")
+            count = len(polls)
+            time.sleep(0.05)
+            self.assertLessEqual(len(polls), count + 1)
+            self.assertEqual(len(poller), 0)
+        finally:
+            poller.stop()
+
+    def test_errors_fall_back_to_default_interval(self):
+        def poll(key):
+            raise RuntimeError("boom")
+
+        poller = scheduler.PollScheduler(poll, num_workers=1, default_interval=30)
+        poller.schedule("broken")
+        poller.start()
+        try:
+            self.assertTrue(self.wait_for(lambda: "broken" in poller.due))
+            self.assertGreater(poller.due["broken"], time.time() + 25)
+        finally:
+            poller.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import unittest
+from src import search_batcher
+
+
+class TestSearchBatcher(unittest.TestCase):
+    def test_packs_accounts_up_to_query_length(self):
+        batcher = search_batcher.SearchBatcher(max_query_length=40)
+        for name in ["alice", "bob", "carol", "dave"]:
+            batcher.add(name)
+
+        queries = [batcher.query_for(batch_id)[0] for batch_id in batcher.batch_ids()]
+        self.assertEqual(queries, ["from:alice OR from:bob OR from:carol", "from:dave"])
+        self.assertTrue(all(len(query) <= 40 for query in queries))
+
+    def test_duplicate_accounts_are_ignored(self):
+        batcher = search_batcher.SearchBatcher()
+        self.assertIsNotNone(batcher.add("alice"))
+        self.assertIsNone(batcher.add("@Alice"))
+
+    def test_fan_out_splits_by_author_and_advances_watermark(self):
+        batcher = search_batcher.SearchBatcher()
+        batch_id = batcher.add("Alice")
+        batcher.add("bob")
+        page = {
+            "data": [
+                {"id": "30", "text": "b2", "author_id": "2"},
+                {"id": "20", "text": "a1", "author_id": "1"},
+                {"id": "10", "text": "b1", "author_id": "2"},
+                {"id": "5", "text": "x", "author_id": "9"},
+            ],
+            "includes": {"users": [
+                {"id": "1", "username": "alice"},
+                {"id": "2", "username": "bob"},
+                {"id": "9", "username": "someone"},
+            ]},
+            "meta": {"newest_id": "30", "result_count": 4},
+        }
+
+        results = batcher.fan_out(batch_id, [page])
+        self.assertEqual([t["id"] for t in results["Alice"]], ["20"])
+        self.assertEqual([t["id"] for t in results["bob"]], ["30", "10"])
+        self.assertNotIn("someone", results)
+        self.assertEqual(batcher.query_for(batch_id)[1], "30")
+
+    def test_rebalance_repacks_and_keeps_oldest_watermark(self):
+        batcher = search_batcher.SearchBatcher(max_query_length=30)
+        first = batcher.add("alice")
+        batcher.add("bob")
+        second = batcher.add("carol")
+        batcher.batches[first].since_id = "500"
+        batcher.batches[second].since_id = "200"
+
+        batcher.remove("bob")
+        batch_ids = batcher.rebalance()
+
+        self.assertEqual(len(batch_ids), 1)
+        query, since_id = batcher.query_for(batch_ids[0])
+        self.assertEqual(query, "from:alice OR from:carol")
+        self.assertEqual(since_id, "200")
+
+    def test_rebalance_without_force_keeps_batches_that_cannot_shrink(self):
+        batcher = search_batcher.SearchBatcher(max_query_length=30)
+        first = batcher.add("alice")
+        batcher.add("bob")
+        second = batcher.add("carol")
+
+        self.assertIsNone(batcher.rebalance(force=False))
+        self.assertEqual(batcher.batch_ids(), [first, second])
+        self.assertEqual(batcher.query_for(first)[0], "from:alice OR from:bob")
+
+    def test_remove_drops_empty_batches(self):
+        batcher = search_batcher.SearchBatcher()
+        batch_id = batcher.add("alice")
+        self.assertEqual(batcher.remove("alice"), batch_id)
+        self.assertEqual(batcher.batch_ids(), [])
+        self.assertIsNone(batcher.remove("alice"))
+
+    def test_is_newer_compares_numerically(self):
+        self.assertTrue(search_batcher.is_newer("100", "99"))
+        self.assertFalse(search_batcher.is_newer("99", "100"))
+        self.assertTrue(search_batcher.is_newer("1", None))
+
+
+if __name__ == '__main__':
+    unittest.main()
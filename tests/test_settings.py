@@ -0,0 +1,109 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import importlib
+import unittest
+from unittest.mock import MagicMock, patch
+from config import settings as settings_module
+from config.settings import ConfigError, Settings
+from src import cli
+
+
+class TestSettings(unittest.TestCase):
+    def test_from_env_parses_lists_and_numbers(self):
+        settings = Settings.from_env({
+            "TWITTER_BEARER_TOKENS": "a, b,,c",
+            "TWITTER_USERNAMES": "alice,bob",
+            "METRICS_PORT": "9100",
+            "POLL_INTERVAL": "1.5",
+        })
+
+        self.assertEqual(settings.twitter_bearer_tokens, ["a", "b", "c"])
+        self.assertEqual(settings.usernames, ["alice", "bob"])
+        self.assertEqual(settings.metrics_port, 9100)
+        self.assertEqual(settings.poll_interval, 1.5)
+        self.assertEqual(settings.log_level, "INFO")
+
+    def test_single_bearer_token_is_a_fallback(self):
+        settings = Settings.from_env({"TWITTER_BEARER_TOKEN": "only"})
+
+        self.assertEqual(settings.twitter_bearer_tokens, ["only"])
+
+    def test_malformed_number_raises_config_error(self):
+        with self.assertRaises(ConfigError) as context:
+            Settings.from_env({"METRICS_PORT": "eighty"})
+        self.assertIn("METRICS_PORT", str(context.exception))
+
+    def test_require_names_everything_missing(self):
+        settings = Settings(telegram_bot_token="bot")
+
+        with self.assertRaises(ConfigError) as context:
+            settings.require("twitter", "telegram", "target_user")
+        message = str(context.exception)
+        self.assertIn("TWITTER_BEARER_TOKEN", message)
+        self.assertIn("TELEGRAM_CHAT_ID", message)
+        self.assertIn("TARGET_USER", message)
+        self.assertNotIn("TELEGRAM_BOT_TOKEN", message)
+
+    def test_get_settings_is_cached_until_reload(self):
+        with patch.object(settings_module, "load_env"), \
+                patch.dict(os.environ, {"TARGET_USER": "first"}):
+            first = settings_module.get_settings(reload=True)
+            os.environ["TARGET_USER"] = "second"
+            self.assertIs(settings_module.get_settings(), first)
+            self.assertEqual(settings_module.get_settings(reload=True).target_user, "second")
+        settings_module.get_settings(reload=True)
+
+    def test_importing_main_has_no_side_effects(self):
+        with patch.dict(os.environ, {}, clear=True), patch("builtins.print") as mock_print:
+            main = importlib.reload(importlib.import_module("src.main"))
+
+        mock_print.assert_not_called()
+        self.assertIsNone(main.TARGET_USER)
+
+    def test_main_run_rejects_incomplete_settings(self):
+        from src import main
+
+        with self.assertRaises(ConfigError):
+            main.run(settings=Settings(twitter_bearer_tokens=["token"]))
+
+
+class TestCli(unittest.TestCase):
+    def test_stream_mode_builds_streamer_from_settings_and_flags(self):
+        settings = Settings(twitter_bearer_tokens=["token"], telegram_bot_token="bot", telegram_chat_id="1",
+                            usernames=["alice"], checkpoint_path="data/checkpoints.db", poll_interval=5)
+        streamer_class = MagicMock()
+
+        with patch.object(cli, "get_settings", return_value=settings), \
+                patch("src.streamer.Streamer", streamer_class), \
+                patch.object(cli.logging, "basicConfig"):
+            cli.main(["stream", "--usernames", "bob,carol", "--batch-search", "--metrics-port", "9100"])
+
+        args, kwargs = streamer_class.call_args
+        self.assertEqual(args[0], ["bob", "carol"])
+        self.assertEqual(kwargs["poll_interval"], 5)
+        self.assertEqual(kwargs["checkpoint_path"], "data/checkpoints.db")
+        self.assertEqual(kwargs["metrics_port"], 9100)
+        self.assertTrue(kwargs["batch_search"])
+        streamer_class.return_value.start_stream.assert_called_once()
+
+    def test_async_mode_rejects_batch_search_and_filtered_stream(self):
+        settings = Settings(twitter_bearer_tokens=["token"], telegram_bot_token="bot", telegram_chat_id="1",
+                            usernames=["alice"])
+        with patch.object(cli, "get_settings", return_value=settings), \
+                patch.object(cli.logging, "basicConfig"):
+            with self.assertRaises(SystemExit) as context:
+                cli.main(["stream", "--async", "--batch-search"])
+        self.assertIn("--batch-search", str(context.exception.code))
+
+    def test_missing_settings_exit_with_one_message(self):
+        with patch.object(cli, "get_settings", return_value=Settings()), \
+                patch.object(cli.logging, "basicConfig"):
+            with self.assertRaises(SystemExit) as context:
+                cli.main(["stream"])
+        self.assertIn("TWITTER_USERNAMES", str(context.exception.code))
+
+
+if __name__ == '__main__':
+    unittest.main()
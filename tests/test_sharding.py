@@ -0,0 +1,162 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from src import sharding
+from config.settings import ConfigError, Settings
+
+
+class TestHashRing(unittest.TestCase):
+    def test_adding_a_node_moves_only_its_share(self):
+        keys = [f"user{i}" for i in range(2000)]
+        ring = sharding.HashRing(["a", "b", "c"])
+        before = {key: ring.owner(key) for key in keys}
+        ring.add("d")
+        after = {key: ring.owner(key) for key in keys}
+
+        moved = [key for key in keys if before[key] != after[key]]
+        self.assertTrue(all(after[key] == "d" for key in moved))
+        self.assertTrue(300 < len(moved) < 700)
+        self.assertEqual(ring.nodes, ["a", "b", "c", "d"])
+
+    def test_empty_ring_has_no_owner(self):
+        self.assertIsNone(sharding.HashRing().owner("alice"))
+
+
+class TestLeaseStore(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = sharding.LeaseStore(os.path.join(tmp.name, "leases.db"), lease_ttl=10)
+        self.addCleanup(self.store.close)
+
+    def test_lease_has_one_holder_until_expiry(self):
+        now = 1000
+        self.assertEqual(self.store.claim("w1", ["alice", "bob"], now), ["alice", "bob"])
+        self.assertEqual(self.store.claim("w2", ["bob", "carol"], now + 5), ["carol"])
+        # w1 renews its leases with a heartbeat; w2 still cannot take bob.
+        self.store.heartbeat("w1", now + 5)
+        self.assertEqual(self.store.claim("w2", ["bob"], now + 12), [])
+        # Once w1 stops heartbeating, the lease expires and moves.
+        self.assertEqual(self.store.claim("w2", ["bob"], now + 16), ["bob"])
+        self.assertEqual(self.store.held_by("w1"), {"alice"})
+
+    def test_release_and_leave_free_leases(self):
+        self.store.heartbeat("w1")
+        self.store.claim("w1", ["alice", "bob"])
+        self.store.release("w1", ["alice"])
+        self.assertEqual(self.store.claim("w2", ["alice"]), ["alice"])
+        self.store.leave("w1")
+        self.assertEqual(self.store.live_workers(), [])
+        self.assertEqual(self.store.claim("w2", ["bob"]), ["bob"])
+
+
+class TestShardWorker(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.lease_path = os.path.join(tmp.name, "leases.db")
+        self.checkpoint_path = os.path.join(tmp.name, "checkpoints.db")
+        self.usernames = [f"user{i}" for i in range(20)]
+        patchers = [patch('src.streamer.TwitterClient'), patch('src.streamer.TelegramBot')]
+        for patcher in patchers:
+            mock_cls = patcher.start()
+            self.addCleanup(patcher.stop)
+            mock_cls.return_value = MagicMock()
+
+    def make_worker(self, worker_id, lease_ttl=15):
+        worker = sharding.ShardWorker(worker_id, self.usernames, self.lease_path, self.checkpoint_path,
+                                      lease_ttl=lease_ttl)
+        worker.streamer.twitter_client.get_user_ids.side_effect = lambda names: {name: f"id_{name}" for name in names}
+        return worker
+
+    def test_joining_worker_takes_over_its_share_without_overlap(self):
+        first = self.make_worker("w1")
+        self.assertEqual(sorted(first.rebalance()), sorted(self.usernames))
+        first.streamer.last_tweet_ids["user3"] = "300"
+        first.streamer.checkpoint_store.stage_watermark("user3", "300")
+
+        second = self.make_worker("w2")
+        # w1 still holds every lease, so w2 has to wait for the handoff.
+        self.assertEqual(second.rebalance(), [])
+        first.rebalance()  # stops polling w2's share and, with nothing in flight, releases it
+        second.rebalance()
+
+        one, two = set(first.streamer.usernames), set(second.streamer.usernames)
+        self.assertFalse(one & two)
+        self.assertEqual(one | two, set(self.usernames))
+        self.assertTrue(two)
+        owner = second if "user3" in two else first
+        self.assertEqual(owner.streamer.last_tweet_ids["user3"], "300")
+
+    def test_dead_worker_accounts_move_after_lease_expiry(self):
+        first = self.make_worker("w1", lease_ttl=0.2)
+        second = self.make_worker("w2", lease_ttl=0.2)
+        first.rebalance()
+        time.sleep(0.3)  # w1 dies without heartbeating again
+
+        self.assertEqual(sorted(second.rebalance()), sorted(self.usernames))
+
+    def test_release_waits_for_polls_in_flight(self):
+        first = self.make_worker("w1")
+        first.rebalance()
+        second = self.make_worker("w2")
+        second.rebalance()
+        moving = sorted(first.owned(["w1", "w2"]) ^ set(self.usernames))
+        polling = first.streamer.polling([moving[0]])
+        polling.__enter__()
+
+        first.rebalance()
+        self.assertIn(moving[0], first.leases.held_by("w1"))
+        self.assertNotIn(moving[1], first.leases.held_by("w1"))
+
+        polling.__exit__(None, None, None)
+        first.rebalance()
+        self.assertNotIn(moving[0], first.leases.held_by("w1"))
+
+    def test_stalled_worker_drops_accounts_claimed_by_others(self):
+        first = self.make_worker("w1", lease_ttl=0.2)
+        first.rebalance()
+        first.streamer.checkpoint_store.flush()
+        first.streamer.checkpoint_store.stage_watermark("user3", "stale")
+        time.sleep(0.3)  # w1 stalls past its lease
+        self.assertFalse(first.streamer.may_poll("user3"))
+        second = self.make_worker("w2", lease_ttl=0.2)
+        second.leases.claim("w2", ["user3"])
+        second.streamer.checkpoint_store.stage_watermark("user3", "500")
+        second.streamer.checkpoint_store.flush()
+
+        first.rebalance()
+
+        self.assertNotIn("user3", first.streamer.usernames)
+        first.streamer.checkpoint_store.flush()
+        self.assertEqual(first.streamer.checkpoint_store.load_watermarks(["user3"]), {"user3": "500"})
+
+    def test_reloaded_watchlist_is_applied_on_next_rebalance(self):
+        worker = self.make_worker("w1")
+        worker.rebalance()
+
+        worker.set_watchlist(self.usernames[:5] + ["newcomer"])
+
+        self.assertEqual(sorted(worker.rebalance()), sorted(self.usernames[:5] + ["newcomer"]))
+        self.assertNotIn("user10", worker.streamer.last_tweet_ids)
+
+
+
+class TestShardMain(unittest.TestCase):
+    def test_missing_credentials_fail_before_any_worker_starts(self):
+        with patch.object(sharding, "get_settings", return_value=Settings(usernames=["alice"])), \
+                patch.object(sharding, "Supervisor") as supervisor, \
+                patch.object(sharding.logging, "basicConfig"):
+            with self.assertRaises(ConfigError) as raised:
+                sharding.main(["--workers", "2"])
+
+        self.assertIn("TELEGRAM_BOT_TOKEN", str(raised.exception))
+        supervisor.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
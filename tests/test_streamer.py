@@ -1,5 +1,7 @@
 import sys
 import os
+import time
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 
@@ -7,6 +9,10 @@ from unittest.mock import patch, MagicMock
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src import streamer
+from src.rate_limiter import RateLimitError
+from src.adaptive_polling import AdaptivePollPolicy
+from src.checkpoint_store import CheckpointStore
+from src.dedup import DedupIndex
 
 class TestStreamer(unittest.TestCase):
     def setUp(self):
@@ -22,11 +28,11 @@ class TestStreamer(unittest.TestCase):
             mock_twitter_client_cls.return_value = mock_twitter_client
             mock_telegram_bot_cls.return_value = mock_telegram_bot
 
-            # Prepare dummy responses for get_user_id and get_user_tweets.
+            # Prepare dummy responses for get_user_ids and iter_user_tweets.
             dummy_user_id = "12345"
             dummy_tweet = {"id": "111", "text": "Hello World"}
-            mock_twitter_client.get_user_id.return_value = dummy_user_id
-            mock_twitter_client.get_user_tweets.return_value = {"data": [dummy_tweet]}
+            mock_twitter_client.get_user_ids.return_value = {"testuser": dummy_user_id}
+            mock_twitter_client.iter_user_tweets.return_value = [dummy_tweet]
 
             # Create a new instance of Streamer after patching.
             streamer_instance = streamer.Streamer(self.usernames, poll_interval=0)
@@ -34,9 +40,10 @@ class TestStreamer(unittest.TestCase):
             # Execute fetch_and_forward
             streamer_instance.fetch_and_forward()
 
-            # Check that get_user_id and get_user_tweets were called with the correct parameters.
-            mock_twitter_client.get_user_id.assert_called_with("testuser")
-            mock_twitter_client.get_user_tweets.assert_called_with(dummy_user_id, since_id=None)
+            # Check that the user ID was resolved once in bulk and the tweets fetched with it.
+            mock_twitter_client.get_user_ids.assert_called_once_with(["testuser"])
+            mock_twitter_client.get_user_id.assert_not_called()
+            mock_twitter_client.iter_user_tweets.assert_called_with(dummy_user_id, since_id=None, page_size=5, max_pages=1)
 
             # Check that TelegramBot's send_message was called with the correct message.
             expected_message = f"New tweet from testuser: {dummy_tweet.get('text')}"
@@ -54,8 +61,8 @@ class TestStreamer(unittest.TestCase):
 
             # Prepare dummy responses: no new tweets.
             dummy_user_id = "12345"
-            mock_twitter_client.get_user_id.return_value = dummy_user_id
-            mock_twitter_client.get_user_tweets.return_value = {"data": []}
+            mock_twitter_client.get_user_ids.return_value = {"testuser": dummy_user_id}
+            mock_twitter_client.iter_user_tweets.return_value = []
 
             # Create a new instance of Streamer after patching.
             streamer_instance = streamer.Streamer(self.usernames, poll_interval=0)
@@ -66,5 +73,317 @@ class TestStreamer(unittest.TestCase):
             # Verify that send_message was not called when no tweets are returned.
             mock_telegram_bot.send_message.assert_not_called()
 
+    def test_add_usernames_resolves_in_batch(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot'):
+
+            mock_twitter_client = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_twitter_client.get_user_ids.side_effect = lambda names: {name: f"id_{name}" for name in names}
+
+            streamer_instance = streamer.Streamer(self.usernames, poll_interval=0)
+            streamer_instance.add_usernames(["alice", "bob", "testuser"])
+
+            mock_twitter_client.get_user_ids.assert_called_with(["alice", "bob"])
+            self.assertEqual(mock_twitter_client.get_user_ids.call_count, 2)
+            self.assertEqual(streamer_instance.usernames, ("testuser", "alice", "bob"))
+
+    def test_poll_account_pushes_due_time_on_backoff(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot'):
+
+            mock_twitter_client = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_twitter_client.get_user_ids.return_value = {"testuser": "12345"}
+            mock_twitter_client.iter_user_tweets.side_effect = RateLimitError("Rate limit exceeded (HTTP 429)", reset_at=time.time() + 30)
+
+            streamer_instance = streamer.Streamer(self.usernames, poll_interval=3)
+            due = streamer_instance.poll_account("testuser")
+
+            self.assertEqual(due, streamer_instance.backoff_until["testuser"])
+            self.assertGreater(due, time.time() + 20)
+
+    def test_batch_search_fans_out_results(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot') as mock_telegram_bot_cls:
+
+            mock_twitter_client = MagicMock()
+            mock_telegram_bot = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_telegram_bot_cls.return_value = mock_telegram_bot
+            mock_twitter_client.search_recent_tweets.return_value = {
+                "data": [
+                    {"id": "2", "text": "from bob", "author_id": "20"},
+                    {"id": "1", "text": "from alice", "author_id": "10"},
+                ],
+                "includes": {"users": [{"id": "10", "username": "alice"}, {"id": "20", "username": "bob"}]},
+                "meta": {"newest_id": "2", "result_count": 2},
+            }
+
+            streamer_instance = streamer.Streamer(["alice", "bob"], poll_interval=0, batch_search=True)
+            streamer_instance.fetch_and_forward()
+
+            mock_twitter_client.search_recent_tweets.assert_called_once_with(
+                "from:alice OR from:bob", since_id=None, next_token=None, until_id=None
+            )
+            mock_twitter_client.get_user_ids.assert_not_called()
+            mock_telegram_bot.send_message.assert_any_call("New tweet from alice: from alice")
+            mock_telegram_bot.send_message.assert_any_call("New tweet from bob: from bob")
+            self.assertEqual(streamer_instance.last_tweet_ids, {"alice": "1", "bob": "2"})
+
+    def test_search_cut_short_by_max_pages_keeps_the_rest_as_a_gap(self):
+        def page(ids, next_token=None):
+            meta = {"newest_id": str(ids[0]), "result_count": len(ids)}
+            if next_token:
+                meta["next_token"] = next_token
+            return {"data": [{"id": str(i), "text": f"tweet {i}", "author_id": "10"} for i in ids],
+                    "includes": {"users": [{"id": "10", "username": "alice"}]}, "meta": meta}
+
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, patch('src.streamer.TelegramBot'):
+            mock_twitter_client = mock_twitter_client_cls.return_value
+            streamer_instance = streamer.Streamer(["alice"], poll_interval=0, batch_search=True,
+                                                  max_search_pages=2)
+            batch_id = streamer_instance.search_batcher.batch_ids()[0]
+            streamer_instance.search_batcher.set_since_id(batch_id, "100")
+            streamer_instance.last_tweet_ids["alice"] = "100"
+            mock_twitter_client.search_recent_tweets.side_effect = [
+                page([110, 109], "t1"), page([108, 107], "t2"),
+                page([106, 105, 104], "t3"), page([103, 102, 101]),
+                page([111])]
+
+            for _ in range(3):
+                streamer_instance.check_batch(batch_id)
+
+            calls = mock_twitter_client.search_recent_tweets.call_args_list
+            self.assertEqual([(call.kwargs["since_id"], call.kwargs["until_id"]) for call in calls],
+                             [("100", None), ("100", None), ("100", "107"), ("100", "107"), ("110", None)])
+            queued = sorted(int(item.text.split()[-1]) for items in streamer_instance.delivery_queue.pending.values()
+                            for item in items)
+            self.assertEqual(queued, list(range(101, 112)))
+            self.assertEqual(streamer_instance.last_tweet_ids["alice"], "111")
+
+    def test_removals_repack_search_batches_and_reschedule_them(self):
+        with patch('src.streamer.TwitterClient'), patch('src.streamer.TelegramBot'):
+            streamer_instance = streamer.Streamer(["alice", "bob", "carol"], poll_interval=0,
+                                                  batch_search=True, max_query_length=30)
+        old_ids = streamer_instance.search_batcher.batch_ids()
+        self.assertEqual(len(old_ids), 2)
+        streamer_instance.scheduler = MagicMock(running=True)
+
+        streamer_instance.remove_usernames(["bob"])
+
+        new_ids = streamer_instance.search_batcher.batch_ids()
+        self.assertEqual(len(new_ids), 1)
+        self.assertEqual(streamer_instance.search_batcher.members(new_ids[0]), ["alice", "carol"])
+        removed = {call.args[0] for call in streamer_instance.scheduler.remove.call_args_list}
+        self.assertEqual(removed, set(old_ids))
+        streamer_instance.scheduler.schedule.assert_called_once_with(new_ids[0])
+
+    def test_next_due_follows_account_activity(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot'):
+
+            mock_twitter_client = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_twitter_client.get_user_ids.side_effect = lambda names: {name: f"id_{name}" for name in names}
+            mock_twitter_client.iter_user_tweets.return_value = []
+
+            policy = AdaptivePollPolicy(min_interval=3, max_interval=60, half_life=300)
+            streamer_instance = streamer.Streamer(["busy", "dormant"], poll_interval=3, poll_policy=policy)
+            streamer_instance.last_tweet_ids = {"busy": "1", "dormant": "1"}
+            for now in range(60, 1200, 60):
+                policy.observe("busy", 10, now=now)
+                policy.observe("dormant", 0, now=now)
+
+            self.assertAlmostEqual(streamer_instance.next_due("busy") - time.time(), 3, delta=1)
+            self.assertAlmostEqual(streamer_instance.next_due("dormant") - time.time(), 60, delta=1)
+
+    def test_checkpoints_resume_watermarks_and_outbox(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot') as mock_telegram_bot_cls, \
+             tempfile.TemporaryDirectory() as tmp:
+
+            mock_twitter_client = MagicMock()
+            mock_telegram_bot = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_telegram_bot_cls.return_value = mock_telegram_bot
+            mock_twitter_client.get_user_ids.return_value = {"testuser": "12345"}
+            mock_twitter_client.iter_user_tweets.return_value = [{"id": "111", "text": "Hello World"}]
+            # Telegram is down for the first run.
+            mock_telegram_bot.send_message.side_effect = RuntimeError("telegram down")
+            path = os.path.join(tmp, "checkpoints.db")
+
+            first = streamer.Streamer(self.usernames, poll_interval=0, checkpoint_path=path)
+            first.delivery_queue.max_retries = 1
+            first.fetch_and_forward()
+            first.checkpoint_store.close()
+
+            mock_telegram_bot.send_message.side_effect = None
+            mock_twitter_client.iter_user_tweets.return_value = []
+            second = streamer.Streamer(self.usernames, poll_interval=0, checkpoint_path=path)
+            self.assertEqual(second.last_tweet_ids["testuser"], "111")
+            second.fetch_and_forward()
+
+            # No poll since the restart, so the account catches up with large pages.
+            mock_twitter_client.iter_user_tweets.assert_called_with("12345", since_id="111", page_size=100, max_pages=10)
+            mock_telegram_bot.send_message.assert_called_with("New tweet from testuser: Hello World")
+            self.assertEqual(second.checkpoint_store.load_outbox(), [])
+            second.checkpoint_store.close()
+
+    def test_readding_an_account_does_not_queue_its_outbox_twice(self):
+        with patch('src.streamer.TwitterClient'), patch('src.streamer.TelegramBot'), \
+             tempfile.TemporaryDirectory() as tmp:
+            store = CheckpointStore(os.path.join(tmp, "checkpoints.db"))
+            store.stage_poll("testuser", "111", [("111", "undelivered")])
+            store.flush()
+            store.close()
+            streamer_instance = streamer.Streamer(self.usernames, poll_interval=0,
+                                                  checkpoint_path=os.path.join(tmp, "checkpoints.db"))
+            self.assertEqual(streamer_instance.delivery_queue.queue_depth(), 1)
+
+            streamer_instance.remove_usernames(["testuser"])
+            streamer_instance.add_usernames(["testuser"])
+            self.assertEqual(streamer_instance.delivery_queue.queue_depth(), 1)
+
+            streamer_instance.delivery_queue.telegram_bot.send_message.return_value = {"ok": True}
+            streamer_instance.delivery_queue.process_next(timeout=0)
+            streamer_instance.checkpoint_store.flush()
+            streamer_instance.remove_usernames(["testuser"])
+            streamer_instance.add_usernames(["testuser"])
+            self.assertEqual(streamer_instance.delivery_queue.queue_depth(), 0)
+            streamer_instance.checkpoint_store.close()
+
+    def test_dedup_is_saved_only_after_the_checkpoints_it_covers(self):
+        with patch('src.streamer.TwitterClient'), patch('src.streamer.TelegramBot'), \
+             tempfile.TemporaryDirectory() as tmp:
+            dedup = DedupIndex(path=os.path.join(tmp, "dedup.json"), save_interval=0)
+            streamer_instance = streamer.Streamer(self.usernames, poll_interval=0, dedup_index=dedup,
+                                                  checkpoint_path=os.path.join(tmp, "checkpoints.db"))
+            store = streamer_instance.checkpoint_store
+            streamer_instance.forward("testuser", streamer_instance.record_tweets(
+                "testuser", [{"id": "111", "text": "Hello"}]))
+
+            with patch.object(store, "flush", return_value=False):
+                streamer_instance.save_dedup_if_due()
+            self.assertFalse(os.path.exists(dedup.path))
+
+            streamer_instance.save_dedup_if_due()
+            self.assertIn("111", DedupIndex(path=dedup.path))
+            self.assertEqual([entry.tweet_id for entry in store.load_outbox()], ["111"])
+            self.assertEqual(store.load_watermarks(), {"testuser": "111"})
+            store.close()
+
+    def test_tweets_are_forwarded_oldest_first_and_catch_up_after_full_poll(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot') as mock_telegram_bot_cls:
+
+            mock_twitter_client = MagicMock()
+            mock_telegram_bot = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_telegram_bot_cls.return_value = mock_telegram_bot
+            mock_twitter_client.get_user_ids.return_value = {"testuser": "12345"}
+            burst = [{"id": str(i), "text": f"tweet {i}"} for i in range(1, 16)]
+            # The regular poll fills every page; paging back below tweet 1 finds nothing older.
+            mock_twitter_client.iter_user_tweets.side_effect = [burst, []]
+
+            streamer_instance = streamer.Streamer(self.usernames, poll_interval=0)
+            streamer_instance.delivery_queue.coalesce = False
+            streamer_instance.delivery_queue.per_chat_interval = 0
+            streamer_instance.last_tweet_ids["testuser"] = "0"
+            streamer_instance.last_polled_at["testuser"] = time.time()
+            streamer_instance.check_username("testuser")
+            streamer_instance.delivery_queue.drain()
+
+            self.assertEqual(mock_twitter_client.iter_user_tweets.call_args_list[0],
+                             unittest.mock.call("12345", since_id="0", page_size=5, max_pages=3))
+            mock_twitter_client.iter_user_tweets.assert_called_with("12345", since_id="0", page_size=100,
+                                                                    max_pages=10, until_id="1")
+            sent = [call.args[0] for call in mock_telegram_bot.send_message.call_args_list]
+            self.assertEqual(sent, [f"New tweet from testuser: tweet {i}" for i in range(1, 16)])
+            self.assertEqual(streamer_instance.last_tweet_ids["testuser"], "15")
+
+            # Every page was full, so the next poll switches to catch-up mode.
+            mock_twitter_client.iter_user_tweets.side_effect = None
+            mock_twitter_client.iter_user_tweets.return_value = []
+            streamer_instance.check_username("testuser")
+            mock_twitter_client.iter_user_tweets.assert_called_with("12345", since_id="15", page_size=100, max_pages=10)
+            self.assertEqual(streamer_instance.fetch_options("testuser", "15"), (5, 3))
+
+    def test_gap_longer_than_one_poll_keeps_the_watermark_until_covered(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot') as mock_telegram_bot_cls:
+
+            mock_twitter_client = MagicMock()
+            mock_telegram_bot = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_telegram_bot_cls.return_value = mock_telegram_bot
+            mock_twitter_client.get_user_ids.return_value = {"testuser": "12345"}
+            tweets = lambda first, last: [{"id": str(i), "text": f"tweet {i}"} for i in range(first, last + 1)]
+            mock_twitter_client.iter_user_tweets.side_effect = [tweets(96, 100), tweets(91, 95), tweets(87, 90)]
+
+            streamer_instance = streamer.Streamer(self.usernames, poll_interval=0, page_size=5, max_pages=1,
+                                                  catchup_page_size=5, catchup_max_pages=1)
+            streamer_instance.delivery_queue.coalesce = False
+            streamer_instance.delivery_queue.per_chat_interval = 0
+            streamer_instance.last_tweet_ids["testuser"] = "80"
+            streamer_instance.last_polled_at["testuser"] = time.time()
+
+            # Neither the regular pages nor one catch-up run reach tweet 80.
+            streamer_instance.check_username("testuser")
+            self.assertEqual(streamer_instance.last_tweet_ids["testuser"], "80")
+            self.assertEqual(streamer_instance.gaps["testuser"], ("91", "100"))
+
+            # The next poll continues below tweet 91 and closes the gap.
+            streamer_instance.check_username("testuser")
+            mock_twitter_client.iter_user_tweets.assert_called_with("12345", since_id="80", page_size=5,
+                                                                    max_pages=1, until_id="91")
+            self.assertEqual(streamer_instance.last_tweet_ids["testuser"], "100")
+            self.assertNotIn("testuser", streamer_instance.gaps)
+            streamer_instance.delivery_queue.drain()
+            sent = {call.args[0] for call in mock_telegram_bot.send_message.call_args_list}
+            self.assertEqual(sent, {f"New tweet from testuser: tweet {i}" for i in range(87, 101)})
+
+    def test_duplicate_retweets_across_accounts_are_sent_once(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot') as mock_telegram_bot_cls:
+
+            mock_twitter_client = MagicMock()
+            mock_telegram_bot = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_telegram_bot_cls.return_value = mock_telegram_bot
+            mock_twitter_client.get_user_ids.side_effect = lambda names: {name: f"id_{name}" for name in names}
+            mock_twitter_client.iter_user_tweets.side_effect = lambda user_id, **kwargs: [{
+                "id": f"rt_{user_id}", "text": "RT @someone: news",
+                "referenced_tweets": [{"type": "retweeted", "id": "42"}]
+            }]
+
+            streamer_instance = streamer.Streamer(["alice", "bob"], poll_interval=0)
+            streamer_instance.fetch_and_forward()
+
+            self.assertEqual(mock_telegram_bot.send_message.call_count, 1)
+            self.assertEqual(streamer_instance.last_tweet_ids, {"alice": "rt_id_alice", "bob": "rt_id_bob"})
+
+    def test_filtered_stream_forwards_tweets_and_falls_back_to_polling(self):
+        with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, \
+             patch('src.streamer.TelegramBot') as mock_telegram_bot_cls, \
+             patch('src.streamer.FilteredStream') as mock_filtered_stream_cls:
+
+            mock_twitter_client = MagicMock()
+            mock_telegram_bot = MagicMock()
+            mock_twitter_client_cls.return_value = mock_twitter_client
+            mock_telegram_bot_cls.return_value = mock_telegram_bot
+            mock_twitter_client.get_user_ids.return_value = {"testuser": "12345"}
+            mock_filtered_stream_cls.return_value.run.side_effect = streamer.StreamUnavailableError("HTTP 403")
+
+            streamer_instance = streamer.Streamer(self.usernames, poll_interval=0, use_filtered_stream=True)
+            streamer_instance.handle_stream_tweet("testuser", {"id": "7", "text": "pushed"})
+            streamer_instance.handle_stream_tweet("stranger", {"id": "8", "text": "ignored"})
+            streamer_instance.delivery_queue.drain()
+
+            mock_telegram_bot.send_message.assert_called_once_with("New tweet from testuser: pushed")
+            self.assertEqual(streamer_instance.last_tweet_ids["testuser"], "7")
+            self.assertFalse(streamer_instance.run_filtered_stream())
+            self.assertIsNone(streamer_instance.filtered_stream)
+
 if __name__ == '__main__':
     unittest.main()
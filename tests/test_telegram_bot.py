@@ -3,26 +3,39 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 import unittest
-from unittest.mock import patch, Mock
 from src import telegram_bot
+from tests.fake_transport import FakeTransport
 
 class TestTelegramBot(unittest.TestCase):
     def setUp(self):
         os.environ["TELEGRAM_BOT_TOKEN"] = "TEST_TELEGRAM_BOT_TOKEN"
         os.environ["TELEGRAM_CHAT_ID"] = "123456789"
-        self.bot = telegram_bot.TelegramBot()
+        self.transport = FakeTransport()
+        self.bot = telegram_bot.TelegramBot(transport=self.transport)
 
-    @patch('src.telegram_bot.requests.post')
-    def test_send_message_success(self, mock_post):
+    def test_send_message_success(self):
         expected_response = {"ok": True, "result": {"message_id": 1}}
-        mock_resp = Mock()
-        mock_resp.raise_for_status.return_value = None
-        mock_resp.json.return_value = expected_response
-        mock_post.return_value = mock_resp
+        self.transport.add_response("POST", "https://api.telegram.org/", json_data=expected_response)
 
         result = self.bot.send_message("Hello Telegram")
         self.assertEqual(result, expected_response)
-        mock_post.assert_called_once()
+        self.assertEqual(len(self.transport.calls), 1)
+        method, url, kwargs = self.transport.calls[0]
+        self.assertEqual(url, "https://api.telegram.org/botTEST_TELEGRAM_BOT_TOKEN/sendMessage")
+        self.assertEqual(kwargs["data"], {"chat_id": "123456789", "text": "Hello Telegram"})
+
+    def test_send_message_to_other_chat(self):
+        self.transport.add_response("POST", "https://api.telegram.org/", json_data={"ok": True})
+        self.bot.send_message("Hello group", chat_id="-100")
+        self.assertEqual(self.transport.calls[0][2]["data"]["chat_id"], "-100")
+
+    def test_flood_control_raises_retry_after(self):
+        self.transport.add_response("POST", "https://api.telegram.org/", status_code=429, json_data={
+            "ok": False, "error_code": 429, "parameters": {"retry_after": 7}
+        })
+        with self.assertRaises(telegram_bot.TelegramRateLimitError) as ctx:
+            self.bot.send_message("Hello Telegram")
+        self.assertEqual(ctx.exception.retry_after, 7)
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,18 +2,23 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+import time
 import unittest
-from unittest.mock import patch, Mock
 from src import twitter_client
+from src.rate_limiter import RateLimitError
+from tests.fake_transport import FakeTransport
+from src.metrics import REQUESTS_TOTAL, REQUEST_ERRORS_TOTAL
+from src.credential_pool import CredentialPool
+from src.models import Tweet
 
 class TestTwitterClient(unittest.TestCase):
     def setUp(self):
         # Ensure a dummy bearer token is set for testing purposes
         os.environ["TWITTER_BEARER_TOKEN"] = "TEST_BEARER_TOKEN"
-        self.client = twitter_client.TwitterClient()
+        self.transport = FakeTransport()
+        self.client = twitter_client.TwitterClient(transport=self.transport)
 
-    @patch('src.twitter_client.requests.get')
-    def test_get_user_id_success(self, mock_get):
+    def test_get_user_id_success(self):
         expected_id = "12345"
         response_data = {
             "data": {
@@ -22,31 +27,146 @@ class TestTwitterClient(unittest.TestCase):
                 "username": "testuser"
             }
         }
-        mock_resp = Mock()
-        mock_resp.raise_for_status.return_value = None
-        mock_resp.json.return_value = response_data
-        mock_get.return_value = mock_resp
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/by/username/testuser",
+                                    json_data=response_data)
 
         user_id = self.client.get_user_id("testuser")
         self.assertEqual(user_id, expected_id)
-        mock_get.assert_called_once()
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertEqual(self.transport.calls[0][2]["headers"],
+                         {"Authorization": "Bearer TEST_BEARER_TOKEN"})
 
-    @patch('src.twitter_client.requests.get')
-    def test_get_user_tweets_success(self, mock_get):
+    def test_get_user_tweets_success(self):
         user_id = "12345"
         tweets_data = {
             "data": [
                 {"id": "1", "text": "Hello World"}
             ]
         }
-        mock_resp = Mock()
-        mock_resp.raise_for_status.return_value = None
-        mock_resp.json.return_value = tweets_data
-        mock_get.return_value = mock_resp
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/12345/tweets",
+                                    json_data=tweets_data)
 
         result = self.client.get_user_tweets(user_id)
         self.assertEqual(result, tweets_data)
-        mock_get.assert_called_once()
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_iter_user_tweets_follows_pages_oldest_first(self):
+        prefix = "https://api.twitter.com/2/users/12345/tweets"
+        self.transport.add_response("GET", prefix, json_data={
+            "data": [{"id": "6", "text": "f"}, {"id": "5", "text": "e"}], "meta": {"next_token": "p2"}})
+        self.transport.add_response("GET", prefix, json_data={
+            "data": [{"id": "4", "text": "d"}, {"id": "3", "text": "c"}], "meta": {"next_token": "p3"}})
+        self.transport.add_response("GET", prefix, json_data={
+            "data": [{"id": "2", "text": "b"}], "meta": {}})
+
+        tweets = list(self.client.iter_user_tweets("12345", since_id="1", page_size=2, max_pages=5))
+        self.assertEqual([tweet["id"] for tweet in tweets], ["2", "3", "4", "5", "6"])
+        self.assertIsInstance(tweets[0], Tweet)
+        tokens = [call[2]["params"].get("pagination_token") for call in self.transport.calls]
+        self.assertEqual(tokens, [None, "p2", "p3"])
+
+    def test_iter_user_tweets_respects_page_limit(self):
+        prefix = "https://api.twitter.com/2/users/12345/tweets"
+        self.transport.add_response("GET", prefix, json_data={
+            "data": [{"id": "9", "text": "x"}], "meta": {"next_token": "more"}})
+
+        tweets = list(self.client.iter_user_tweets("12345", since_id="1", page_size=5, max_pages=2))
+        self.assertEqual(len(self.transport.calls), 2)
+        self.assertEqual(len(tweets), 2)
+
+    def test_get_user_ids_success(self):
+        response_data = {
+            "data": [
+                {"id": "1", "username": "alice"},
+                {"id": "2", "username": "bob"}
+            ],
+            "errors": [{"value": "ghost", "detail": "Could not find user with usernames: [ghost]."}]
+        }
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/by", json_data=response_data)
+
+        result = self.client.get_user_ids(["alice", "@bob", "ghost"])
+        self.assertEqual(result, {"alice": "1", "bob": "2"})
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertEqual(self.transport.calls[0][2]["params"], {"usernames": "alice,bob,ghost"})
+
+    def test_search_recent_tweets_expands_authors(self):
+        self.transport.add_response("GET", "https://api.twitter.com/2/tweets/search/recent",
+                                    json_data={"data": [], "meta": {"result_count": 0}})
+
+        self.client.search_recent_tweets("from:a OR from:b", since_id="10")
+        params = self.transport.calls[0][2]["params"]
+        self.assertEqual(params["query"], "from:a OR from:b")
+        self.assertEqual(params["since_id"], "10")
+        self.assertEqual(params["expansions"], "author_id")
+
+    def test_include_media_expands_attachments(self):
+        self.transport.add_response("GET", "https://api.twitter.com/2/tweets/search/recent",
+                                    json_data={"data": [], "meta": {"result_count": 0}})
+        self.client.include_media = True
+
+        self.client.search_recent_tweets("from:a")
+        params = self.transport.calls[0][2]["params"]
+        self.assertEqual(params["expansions"], "author_id,attachments.media_keys")
+        self.assertIn("attachments", params["tweet.fields"])
+        self.assertIn("variants", params["media.fields"])
+
+    def test_http_error_is_raised(self):
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/by/username/",
+                                    status_code=404, json_data={"title": "Not Found"})
+        with self.assertRaises(Exception):
+            self.client.get_user_id("missing")
+
+    def test_rate_limit_response_raises_with_reset(self):
+        reset_at = int(time.time()) + 90
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/12345/tweets", status_code=429,
+                                    json_data={"title": "Too Many Requests"},
+                                    headers={"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset_at)})
+
+        with self.assertRaises(RateLimitError) as ctx:
+            self.client.get_user_tweets("12345")
+        self.assertEqual(ctx.exception.reset_at, reset_at)
+        # The next call is refused locally instead of hitting the API again.
+        with self.assertRaises(RateLimitError):
+            self.client.get_user_tweets("12345")
+        self.assertEqual(len(self.transport.calls), 1)
+
+    def test_requests_are_counted_by_status(self):
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/by/username/",
+                                    status_code=404, json_data={"title": "Not Found"})
+        labels = {"service": "twitter", "endpoint": "users/by/username", "status": "404"}
+        before = REQUESTS_TOTAL.value(**labels), REQUEST_ERRORS_TOTAL.value(**labels)
+
+        with self.assertRaises(Exception):
+            self.client.get_user_id("missing")
+
+        self.assertEqual((REQUESTS_TOTAL.value(**labels), REQUEST_ERRORS_TOTAL.value(**labels)),
+                         (before[0] + 1, before[1] + 1))
+
+    def test_rate_limited_token_fails_over_to_next_token(self):
+        client = twitter_client.TwitterClient(transport=self.transport,
+                                              credentials=CredentialPool(["token-a", "token-b"]))
+        reset_at = int(time.time()) + 90
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/12345/tweets", status_code=429,
+                                    headers={"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset_at)})
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/12345/tweets",
+                                    json_data={"data": [{"id": "1", "text": "hi"}]})
+
+        self.assertEqual(client.get_user_tweets("12345")["data"][0]["id"], "1")
+        used = [kwargs["headers"]["Authorization"] for _, _, kwargs in self.transport.calls]
+        self.assertEqual(len(set(used)), 2)
+        # The blocked token stays out of rotation for this endpoint.
+        client.get_user_tweets("12345")
+        self.assertEqual(self.transport.calls[-1][2]["headers"]["Authorization"], used[1])
+
+    def test_revoked_token_is_dropped(self):
+        client = twitter_client.TwitterClient(transport=self.transport,
+                                              credentials=CredentialPool(["token-a", "token-b"]))
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/12345/tweets", status_code=401)
+        self.transport.add_response("GET", "https://api.twitter.com/2/users/12345/tweets", json_data={"data": []})
+
+        client.get_user_tweets("12345")
+
+        self.assertEqual(len(client.credentials), 1)
 
 if __name__ == '__main__':
     unittest.main()
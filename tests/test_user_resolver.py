@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from src import user_resolver
+
+
+class TestUserResolver(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_user_ids.side_effect = lambda names: {name: f"id_{name}" for name in names}
+
+    def test_resolve_many_uses_cache(self):
+        resolver = user_resolver.UserResolver(self.client)
+        result = resolver.resolve_many(["alice", "@Bob"])
+        self.assertEqual(result, {"alice": "id_alice", "@Bob": "id_bob"})
+        self.client.get_user_ids.assert_called_once_with(["alice", "bob"])
+
+        self.assertEqual(resolver.resolve("ALICE"), "id_alice")
+        self.assertEqual(self.client.get_user_ids.call_count, 1)
+
+    def test_resolve_many_batches_by_100(self):
+        resolver = user_resolver.UserResolver(self.client)
+        names = [f"user{i}" for i in range(250)]
+        result = resolver.resolve_many(names)
+        self.assertEqual(len(result), 250)
+        batch_sizes = [len(call.args[0]) for call in self.client.get_user_ids.call_args_list]
+        self.assertEqual(batch_sizes, [100, 100, 50])
+
+    def test_expired_entries_are_refetched(self):
+        resolver = user_resolver.UserResolver(self.client, ttl=10)
+        with patch('src.user_resolver.time.time', return_value=1000):
+            resolver.resolve("alice")
+        with patch('src.user_resolver.time.time', return_value=1011):
+            resolver.resolve("alice")
+        self.assertEqual(self.client.get_user_ids.call_count, 2)
+
+    def test_lru_eviction(self):
+        resolver = user_resolver.UserResolver(self.client, max_size=2)
+        resolver.resolve_many(["a", "b"])
+        resolver.resolve("a")
+        resolver.resolve("c")
+        self.assertEqual(list(resolver.cache), ["a", "c"])
+
+    def test_unknown_usernames_are_omitted(self):
+        self.client.get_user_ids.side_effect = lambda names: {}
+        resolver = user_resolver.UserResolver(self.client)
+        self.assertIsNone(resolver.resolve("ghost"))
+
+    def test_cache_persists_to_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "user_ids.json")
+            user_resolver.UserResolver(self.client, cache_path=path).resolve_many(["alice", "bob"])
+
+            warm_client = MagicMock()
+            warm = user_resolver.UserResolver(warm_client, cache_path=path)
+            self.assertEqual(warm.resolve_many(["alice", "bob"]), {"alice": "id_alice", "bob": "id_bob"})
+            warm_client.get_user_ids.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import MagicMock, patch
+from src import streamer
+from src.watchlist import ControlServer, WatchlistFile, parse_watchlist
+
+
+def make_streamer(usernames):
+    with patch('src.streamer.TwitterClient') as mock_twitter_client_cls, patch('src.streamer.TelegramBot'):
+        mock_twitter_client = MagicMock()
+        mock_twitter_client_cls.return_value = mock_twitter_client
+        mock_twitter_client.get_user_ids.side_effect = lambda names: {name: f"id_{name}" for name in names}
+        return streamer.Streamer(usernames, poll_interval=0)
+
+
+class TestParseWatchlist(unittest.TestCase):
+    def test_accepts_lines_commas_comments_and_at_signs(self):
+        text = "# news\n@alice, bob\n\ncarol  # weekends only\nAlice\n"
+
+        self.assertEqual(parse_watchlist(text), ["alice", "bob", "carol"])
+
+
+class TestWatchlistFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "watchlist.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, text, mtime):
+        with open(self.path, "w") as f:
+            f.write(text)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_reloads_only_when_the_file_changes(self):
+        on_change = MagicMock()
+        watchlist = WatchlistFile(self.path, on_change)
+        self.write("alice\nbob\n", 1000)
+
+        self.assertTrue(watchlist.check())
+        self.assertFalse(watchlist.check())
+        self.write("alice\ncarol\n", 2000)
+        self.assertTrue(watchlist.check())
+
+        self.assertEqual(on_change.call_args_list[0].args, (["alice", "bob"],))
+        self.assertEqual(on_change.call_args_list[1].args, (["alice", "carol"],))
+
+    def test_missing_file_keeps_the_current_watchlist(self):
+        on_change = MagicMock()
+
+        self.assertFalse(WatchlistFile(self.path, on_change).check())
+        on_change.assert_not_called()
+
+    def test_empty_file_is_refused_unless_allowed(self):
+        on_change = MagicMock()
+        self.write("# truncated mid-save\n", 1000)
+
+        self.assertFalse(WatchlistFile(self.path, on_change).check())
+        on_change.assert_not_called()
+        self.assertTrue(WatchlistFile(self.path, on_change, allow_empty=True).check())
+        on_change.assert_called_once_with([])
+
+
+class TestStreamerWatchlist(unittest.TestCase):
+    def test_set_usernames_applies_only_the_diff(self):
+        streamer_instance = make_streamer(["alice", "bob"])
+        streamer_instance.last_tweet_ids["alice"] = "100"
+        snapshot = streamer_instance.usernames
+
+        added, removed = streamer_instance.set_usernames(["alice", "carol"])
+
+        self.assertEqual(added, ["carol"])
+        self.assertEqual(removed, ["bob"])
+        self.assertEqual(streamer_instance.usernames, ("alice", "carol"))
+        self.assertEqual(streamer_instance.last_tweet_ids, {"alice": "100", "carol": None})
+        # Readers holding the old snapshot are unaffected.
+        self.assertEqual(snapshot, ("alice", "bob"))
+
+    def test_case_only_change_keeps_state(self):
+        streamer_instance = make_streamer(["alice", "bob"])
+        streamer_instance.last_tweet_ids["alice"] = "100"
+
+        added, removed = streamer_instance.set_usernames(["Alice", "bob"])
+
+        self.assertEqual((added, removed), ([], []))
+        self.assertEqual(streamer_instance.usernames, ("alice", "bob"))
+        self.assertEqual(streamer_instance.last_tweet_ids["alice"], "100")
+        self.assertEqual(streamer_instance.remove_usernames(["BOB"]), ["bob"])
+
+    def test_poll_in_flight_for_removed_account_leaves_no_state(self):
+        streamer_instance = make_streamer(["alice"])
+        streamer_instance.remove_username("alice")
+
+        streamer_instance.record_tweets("alice", [{"id": "5"}])
+        streamer_instance.note_poll("alice", 1, 5)
+
+        self.assertNotIn("alice", streamer_instance.last_tweet_ids)
+        self.assertNotIn("alice", streamer_instance.last_polled_at)
+
+
+class TestControlServer(unittest.TestCase):
+    def setUp(self):
+        self.streamer = make_streamer(["alice", "bob"])
+        self.server = ControlServer(self.streamer, port=0).start()
+        self.url = f"http://127.0.0.1:{self.server.port}/watchlist"
+
+    def tearDown(self):
+        self.server.stop()
+
+    def request(self, method, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.url, data=data, method=method)
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.loads(response.read())
+
+    def test_get_put_and_post(self):
+        self.assertEqual(self.request("GET"), {"usernames": ["alice", "bob"]})
+
+        result = self.request("PUT", {"usernames": ["bob", "carol"]})
+        self.assertEqual(result, {"added": ["carol"], "removed": ["alice"], "count": 2})
+
+        result = self.request("POST", {"add": ["@dave"], "remove": ["bob"]})
+        self.assertEqual(result, {"added": ["dave"], "removed": ["bob"], "count": 2})
+        self.assertEqual(self.streamer.usernames, ("carol", "dave"))
+
+    def test_put_without_usernames_is_rejected(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.request("PUT", {"add": ["carol"]})
+
+        self.assertEqual(context.exception.code, 400)
+        self.assertEqual(self.streamer.usernames, ("alice", "bob"))
+
+
+if __name__ == '__main__':
+    unittest.main()